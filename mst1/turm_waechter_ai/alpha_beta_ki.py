@@ -3,19 +3,127 @@
 Alpha-Beta AI for Turm & Wächter.
 
 Usage:
-    python intelligent_ki.py "FEN_STRING"
+    python alpha_beta_ki.py "FEN_STRING" [--depth N] [--movetime MS] [--algorithm NAME] [--threads N] [--verbose]
+                            [--trace FILE] [--profile [PREFIX]]
+    python alpha_beta_ki.py bench [--depth N] [--algorithm NAME]
+
+With --movetime the search deepens iteratively until the time is used up
+and plays the best move of the last completed iteration.
+
+Two search algorithms are available:
+    alphabeta  Red-centric minimax with alpha-beta pruning
+    pvs        Negamax principal variation search with aspiration windows
+
+With --threads N > 1 the root moves are searched in parallel by N worker
+processes (see parallel_search.py), always with pvs.
+
+--verbose prints a line per iteration and the search statistics (nodes,
+cutoffs, table hits, ...). --trace FILE writes every searched node to FILE
+(see search_trace.py); it cannot be combined with --threads. --profile runs the
+search under cProfile and writes PREFIX.pstats and PREFIX.folded (see
+profiling.py); with --threads only the main process is profiled.
+
+`bench` searches a fixed set of positions to a fixed depth and prints the
+nodes searched, the nodes per second and a signature of the node counts.
+A change to search or evaluation that should not change the search
+(e.g. a speed-up) must keep the signature.
 """
 
-import sys
+import argparse
+import time
+import zlib
 from copy import deepcopy
+from typing import List, Optional, TextIO, Tuple
 from core.fen import FenParser
-from core.bitboard_rules import BitboardRules
+from array import array
+from core.bitboard_rules import BitboardRules, CENTER_SQUARE, attack_map
+from core.move import MAX_PLY, MOVE_CAPTURE, MOVE_GUARDIAN, move_to_str, new_move_buffers
 from core.piece import PieceType
-from evaluate import evaluate
+from evaluate import evaluate_board, w_win, w_center, w_danger, w_Md, w_E, w_diff, w_Eh
+from transposition_table import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
 MAX_DEPTH = 3  # Adjust search depth here
+MAX_ITERATION_DEPTH = 64  # Deepest iteration of a time-limited search
+TT_SIZE_MB = 16  # Memory budget of the transposition table
+TIME_CHECK_NODES = 1023  # Check the clock every TIME_CHECK_NODES + 1 nodes
+BENCH_DEPTH = 4  # Depth of the bench searches
+
+# Positions of the bench command, from all game phases (see benchmarks/positions.txt)
+BENCH_POSITIONS = [
+    "r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r",
+    "r1r11RG1r1r1/3r13/4r22/7/3b1b12/1b1b14/b12BG2b2 r",
+    "r1r1RG1r11r1/2r14/4r22/3b13/7/1b13b11/b1b11BG1b1b1 b",
+    "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b",
+    "r1r11RG2r1/3r11r1r1/3r13/2b24/3b13/4b12/2b1BG2b2 r",
+    "2RG3r1/1r11r13/1r12r22/r16/1b15/2b21BG1b1/b23b12 b",
+    "2RG2r21/1r15/7/b16/7/6BG/1b25 b",
+    "3r13/3r23/2RG4/7/3r22b1/2BG1b12/6b1 b",
+    "2RG3r1/7/2r11r22/7/7/r1b15/2BG3r1 b",
+]
+
+# Search algorithms AlphaBetaSearch can use
+ALGORITHMS = ('alphabeta', 'pvs')
+DEFAULT_ALGORITHM = 'alphabeta'
+
+INFINITY = w_win + 1  # Bound beyond every score (pvs works on int scores)
+# Half width of the first aspiration window. Scores of successive iterations often
+# differ by a Guardian threat, so narrower windows mostly cause re-searches.
+ASPIRATION_WINDOW = 2 * w_danger
+ASPIRATION_MIN_DEPTH = 3  # Shallower iterations search the full window
+
+# Move ordering scores, highest first
+ORDER_FIRST = 1 << 30     # PV or hash move
+ORDER_WIN = 1 << 29       # Guardian capture or Guardian to the center
+ORDER_CAPTURE = 1 << 28   # Plus victim height * 8 minus moving height (MVV/LVA)
+ORDER_KILLER = 1 << 27    # Plus 1 for the most recent killer
+HISTORY_MAX = 1 << 20     # History scores are halved when one gets this large
+
+# Quiescence search: what a capture adds to the evaluation (one enemy stack fewer,
+# possibly out of our half), and how much the threat and center terms may add on top
+CAPTURE_GAIN = w_E + w_diff + w_Eh
+DELTA_MARGIN = w_center + w_danger + 4 * w_Md
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget is used up"""
+
+
+class SearchParams:
+    """
+    Pruning and reduction settings of the principal variation search.
+
+    Null-move pruning: at a node of a null-window search, let the opponent move twice
+    in a row and search depth - 1 - null_move_reduction plies. If that still fails
+    high, the node is cut off without searching any real move. Not used while the
+    side's Guardian is attacked or when the side has nothing but its Guardian.
 
+    Late move reductions: quiet moves from the lmr_min_moves-th move on are searched
+    lmr_reduction plies shallower, and searched again at full depth if they beat alpha.
 
+    The evaluation swings a lot between odd and even depths, so reductions should be
+    even: a search reduced by one ply comes out too optimistic and mostly gets repeated.
+    """
 
+    def __init__(self, null_move: bool = True, null_move_reduction: int = 2, null_move_min_depth: int = 3,
+                 lmr: bool = True, lmr_reduction: int = 2, lmr_min_depth: int = 3, lmr_min_moves: int = 4):
+        self.null_move = null_move
+        self.null_move_reduction = null_move_reduction
+        self.null_move_min_depth = null_move_min_depth
+        self.lmr = lmr
+        self.lmr_reduction = lmr_reduction
+        self.lmr_min_depth = lmr_min_depth
+        self.lmr_min_moves = lmr_min_moves
+
+
+def parse_move(move: str) -> Tuple[Tuple[int, int], Tuple[int, int], int]:
+    """
+    Convert a move in algebraic notation (e.g. 'A7-B7-1') to ((fx, fy), (tx, ty), height).
+    """
+    from_str, to_str, height_str = move.split("-")
+    fx = ord(from_str[0]) - ord("A")
+    fy = 7 - int(from_str[1])
+    tx = ord(to_str[0]) - ord("A")
+    ty = 7 - int(to_str[1])
+    return (fx, fy), (tx, ty), int(height_str)
 
 
 def simulate_move(fen_str: str, move: str) -> str:
@@ -30,12 +138,7 @@ def simulate_move(fen_str: str, move: str) -> str:
     rules = BitboardRules(board_copy)
     rules.current_player = current_player
 
-    from_str, to_str, height_str = move.split("-")
-    fx = ord(from_str[0]) - ord("A")
-    fy = 7 - int(from_str[1])
-    tx = ord(to_str[0]) - ord("A")
-    ty = 7 - int(to_str[1])
-    height = int(height_str)
+    (fx, fy), (tx, ty), height = parse_move(move)
 
     if not rules.make_move((fx, fy), (tx, ty), height):
         raise ValueError(f"Invalid move attempted: {move}")
@@ -48,103 +151,816 @@ def is_terminal(fen_str: str) -> bool:
     return len(parser.get_move_descriptions(fen_str)) == 0
 
 
-def alpha_beta(fen_str: str, depth: int, alpha: float, beta: float, maximizing: bool, indent=0) -> float:
-    parser = FenParser()
-    current_player = 1 if fen_str.strip().split()[1] == 'r' else 2
-    legal_moves = parser.get_move_descriptions(fen_str)
+class SearchStats:
+    """
+    Counters and timings of one search, see AlphaBetaSearch.stats.
+
+    nodes counts every node including the quiescence nodes (qnodes). leaf_evals
+    counts the calls of evaluate_board, movegen_calls the move generator calls.
+    tt_hits counts probes that found an entry, whether or not it cut the node off.
+    depth_times holds (depth, seconds) for every completed iteration, and time
+    the whole search time including an iteration cut short by the clock.
+    """
+    __slots__ = ('nodes', 'qnodes', 'leaf_evals', 'beta_cutoffs', 'first_move_cutoffs', 'tt_probes', 'tt_hits',
+                 'movegen_calls', 'aspiration_researches', 'null_move_cutoffs', 'lmr_researches',
+                 'depth_times', 'time')
+
+    def __init__(self, **counters):
+        for name in self.__slots__:
+            setattr(self, name, counters.get(name, [] if name == 'depth_times' else 0))
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def tt_hit_rate(self) -> float:
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.time if self.time > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __str__(self):
+        lines = [
+            f"Nodes: {self.nodes} ({self.qnodes} quiescence), {self.nps:.0f} nodes/s",
+            f"Leaf evaluations: {self.leaf_evals}, move generator calls: {self.movegen_calls}",
+            f"Beta cutoffs: {self.beta_cutoffs} ({self.first_move_cutoff_rate:.1%} by the first move)",
+            f"TT probes: {self.tt_probes} ({self.tt_hit_rate:.1%} hits)",
+            f"Aspiration re-searches: {self.aspiration_researches}, null-move cutoffs: {self.null_move_cutoffs}, "
+            f"LMR re-searches: {self.lmr_researches}",
+            f"Time: {self.time:.3f}s (" + ", ".join(f"depth {d}: {t:.3f}s" for d, t in self.depth_times) + ")",
+        ]
+        return "\n".join(lines)
+
+
+class AlphaBetaSearch:
+    """
+    Minimax search with alpha-beta pruning and a transposition table.
 
-    prefix = "  " * indent
+    Moves are packed ints (see core/move.py) generated into one preallocated
+    buffer per ply, and are played in place with rules.make_encoded/rules.unmake,
+    so the board is left exactly as it was found after every search.
 
-    if depth == 0 or not legal_moves:
-        score = evaluate(fen_str)
-        # Flip score if Blue to move, because evaluate is Red-centric
-        if current_player == 2:
+    iterative_deepening searches depth 1, 2, ... until a time budget runs out.
+    The principal variation of each completed iteration is searched first in
+    the next one.
+
+    Moves are ordered PV/hash move first, then winning Guardian moves, captures
+    (most valuable victim, least valuable attacker), two killer moves per ply
+    and finally quiet moves by their history score.
+
+    At depth 0 a quiescence search plays out captures and Guardian moves onto
+    the center until the position is quiet (unless quiescence=False).
+
+    With algorithm='pvs' the iterations use the negamax principal variation
+    search instead of alpha_beta, inside an aspiration window around the score
+    of the previous iteration, with null-move pruning and late move reductions
+    as set by params (see SearchParams).
+    """
+
+    def __init__(self, rules: BitboardRules, tt: Optional[TranspositionTable] = None, verbose: bool = False,
+                 quiescence: bool = True, algorithm: str = DEFAULT_ALGORITHM, params: Optional[SearchParams] = None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown search algorithm '{algorithm}', expected one of {ALGORITHMS}")
+        self.rules = rules
+        self.quiescence = quiescence
+        self.algorithm = algorithm
+        self.params = params if params is not None else SearchParams()
+        self.tt = tt if tt is not None else TranspositionTable(TT_SIZE_MB)
+        self.verbose = verbose  # Print a line for every completed iteration
+        self.move_buffers = new_move_buffers(MAX_PLY)
+        self.nodes = 0
+        self.qnodes = 0
+        self.leaf_evals = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.movegen_calls = 0
+        self.depth_times = []  # (depth, seconds) of every completed root search
+        self.search_time = 0.0
+        self.deadline = None  # perf_counter() value at which the search aborts
+        self.pv = []  # Principal variation of the last completed iteration
+        self.follow_pv = False  # Still on the previous PV, so its next move goes first
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]  # Quiet moves that caused a cutoff, per ply
+        self.history = array('l', [0]) * 4096  # Cutoff score of quiet moves, indexed by from | to << 6
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0  # Cutoffs by the first move searched
+        self.aspiration_researches = 0  # Root searches repeated after failing outside the window
+        self.null_move_cutoffs = 0
+        self.lmr_researches = 0  # Reduced moves searched again at full depth
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """Share of cutoffs caused by the first move, a measure of the move ordering"""
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def stats(self) -> SearchStats:
+        """Snapshot of the counters of all searches run so far"""
+        return SearchStats(nodes=self.nodes, qnodes=self.qnodes, leaf_evals=self.leaf_evals,
+                           beta_cutoffs=self.beta_cutoffs, first_move_cutoffs=self.first_move_cutoffs,
+                           tt_probes=self.tt_probes, tt_hits=self.tt_hits, movegen_calls=self.movegen_calls,
+                           aspiration_researches=self.aspiration_researches,
+                           null_move_cutoffs=self.null_move_cutoffs, lmr_researches=self.lmr_researches,
+                           depth_times=list(self.depth_times), time=self.search_time)
+
+    def _generate(self, ply: int, hash_move: int) -> int:
+        """Generate the moves of the current position into the ply's buffer, PV or hash move first"""
+        buffer = self.move_buffers[ply]
+        count = self.rules.generate_moves(self.rules.current_player, buffer)
+        self.movegen_calls += 1
+        first_move = hash_move
+        if self.follow_pv:
+            if ply < len(self.pv):
+                first_move = self.pv[ply]
+            else:
+                self.follow_pv = False
+        if first_move and first_move not in buffer[:count]:
+            first_move = 0
+            self.follow_pv = False
+        if count > 1:
+            self._order(buffer, count, ply, first_move)
+        return count
+
+    def _order(self, buffer: array, count: int, ply: int, first_move: int) -> None:
+        """Sort the first count moves of buffer, best candidates first"""
+        board = self.rules.board
+        enemy_guardian = board.blue_guardian if self.rules.current_player == 1 else board.red_guardian
+        killer_1, killer_2 = self.killers[ply]
+        history = self.history
+        scored = []
+        for i in range(count):
+            move = buffer[i]
+            to_sq = (move >> 6) & 0x3F
+            if move == first_move:
+                score = ORDER_FIRST
+            elif move & MOVE_GUARDIAN and to_sq == CENTER_SQUARE or enemy_guardian >> to_sq & 1:
+                score = ORDER_WIN
+            elif move & MOVE_CAPTURE:
+                score = ORDER_CAPTURE + 8 * board._piece_at(to_sq)[1] - ((move >> 12) & 0x7)
+            elif move == killer_1:
+                score = ORDER_KILLER + 1
+            elif move == killer_2:
+                score = ORDER_KILLER
+            else:
+                score = history[move & 0xFFF]
+            scored.append((score, move))
+        scored.sort(reverse=True)
+        for i in range(count):
+            buffer[i] = scored[i][1]
+
+    def _cutoff(self, move: int, index: int, depth: int, ply: int) -> None:
+        """Record a beta cutoff and remember the move for ordering if it is quiet"""
+        self.beta_cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if move & MOVE_CAPTURE:
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history
+        i = move & 0xFFF
+        history[i] += depth * depth
+        if history[i] >= HISTORY_MAX:
+            for j in range(len(history)):
+                history[j] >>= 1
+
+    def _probe(self, depth: int, alpha: float, beta: float) -> Tuple[Optional[float], int]:
+        """
+        Look up the current position.
+
+        Returns (score, hash_move), where score is a Red-centric score that can be returned
+        directly (or None) and hash_move is the stored best move (or 0).
+        """
+        entry = self.tt.probe(self.rules.board.hash)
+        self.tt_probes += 1
+        if entry is None:
+            return None, 0
+        self.tt_hits += 1
+        tt_depth, tt_score, bound, hash_move = entry
+        if tt_depth >= depth:
+            # The table stores scores from the side to move's point of view
+            if self.rules.current_player == 2:
+                tt_score = -tt_score
+                bound = {BOUND_LOWER: BOUND_UPPER, BOUND_UPPER: BOUND_LOWER}.get(bound, bound)
+            if (bound == BOUND_EXACT or
+                    (bound == BOUND_LOWER and tt_score >= beta) or
+                    (bound == BOUND_UPPER and tt_score <= alpha)):
+                return tt_score, hash_move
+        return None, hash_move
+
+    def _store(self, depth: int, score: float, alpha: float, beta: float, best_move: int) -> None:
+        """Store a Red-centric search result for the current position."""
+        if score <= alpha:
+            bound = BOUND_UPPER
+        elif score >= beta:
+            bound = BOUND_LOWER
+        else:
+            bound = BOUND_EXACT
+        if self.rules.current_player == 2:
             score = -score
-        print(f"{prefix}Eval at depth {depth}, player {'Red' if current_player == 1 else 'Blue'}: score={score}")
-        return score
-
-    if maximizing:
-        max_eval = float("-inf")
-        print(f"{prefix}Maximizing at depth {depth}, player {'Red' if current_player == 1 else 'Blue'}, moves: {len(legal_moves)}")
-        for move in legal_moves:
-            print(f"{prefix}Trying move {move}")
-            next_fen = simulate_move(fen_str, move)
-            eval = alpha_beta(next_fen, depth - 1, alpha, beta, False, indent + 1)
-            max_eval = max(max_eval, eval)
-            alpha = max(alpha, eval)
-            print(f"{prefix}Move {move} eval={eval}, alpha={alpha}, beta={beta}")
-            if beta <= alpha:
-                print(f"{prefix}Beta cutoff")
+            bound = {BOUND_LOWER: BOUND_UPPER, BOUND_UPPER: BOUND_LOWER}.get(bound, bound)
+        self.tt.store(self.rules.board.hash, depth, score, bound, best_move)
+
+    def alpha_beta(self, depth: int, alpha: float, beta: float, maximizing: bool, ply=0) -> float:
+        """
+        Minimax search with alpha-beta pruning. Scores are Red-centric.
+        """
+        rules = self.rules
+        current_player = rules.current_player
+
+        self.nodes += 1
+        if not self.nodes & TIME_CHECK_NODES and self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        # A captured or centered Watcher ends the game
+        if rules.game_over:
+            return w_win if rules.winner == 1 else -w_win
+
+        tt_score, hash_move = self._probe(depth, alpha, beta)
+        if tt_score is not None:
+            return tt_score
+
+        if depth <= 0 and self.quiescence:
+            if current_player == 1:
+                score = self.quiesce(alpha, beta, ply)
+            else:
+                score = -self.quiesce(-beta, -alpha, ply)
+            self._store(0, score, alpha, beta, 0)
+            return score
+
+        count = self._generate(ply, hash_move)
+
+        if depth == 0 or not count:
+            score = evaluate_board(rules.board, current_player)
+            self.leaf_evals += 1
+            # Flip score if Blue to move, because evaluate is Red-centric
+            if current_player == 2:
+                score = -score
+            self.tt.store(rules.board.hash, depth, score if current_player == 1 else -score, BOUND_EXACT)
+            return score
+
+        alpha_orig, beta_orig = alpha, beta
+        best_move = 0
+        buffer = self.move_buffers[ply]
+
+        if maximizing:
+            max_eval = float("-inf")
+            for i in range(count):
+                move = buffer[i]
+                undo = rules.make_encoded(move)
+                eval = self.alpha_beta(depth - 1, alpha, beta, False, ply + 1)
+                rules.unmake(undo)
+                self.follow_pv = False
+                if eval > max_eval:
+                    max_eval = eval
+                    best_move = move
+                alpha = max(alpha, eval)
+                if beta <= alpha:
+                    self._cutoff(move, i, depth, ply)
+                    break
+            self._store(depth, max_eval, alpha_orig, beta_orig, best_move)
+            return max_eval
+        else:
+            min_eval = float("inf")
+            for i in range(count):
+                move = buffer[i]
+                undo = rules.make_encoded(move)
+                eval = self.alpha_beta(depth - 1, alpha, beta, True, ply + 1)
+                rules.unmake(undo)
+                self.follow_pv = False
+                if eval < min_eval:
+                    min_eval = eval
+                    best_move = move
+                beta = min(beta, eval)
+                if beta <= alpha:
+                    self._cutoff(move, i, depth, ply)
+                    break
+            self._store(depth, min_eval, alpha_orig, beta_orig, best_move)
+            return min_eval
+
+    def pvs(self, depth: int, alpha: int, beta: int, ply: int = 0, allow_null: bool = True) -> int:
+        """
+        Negamax principal variation search. Scores are from the side to move's point of view.
+
+        The first (best ordered) move is searched with the full window, every other move
+        with a null window around alpha that only proves it is not better. A move that
+        does turn out better is searched again with the full window.
+
+        allow_null is False right after a null move, so there are never two in a row.
+        """
+        rules = self.rules
+
+        self.nodes += 1
+        if not self.nodes & TIME_CHECK_NODES and self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        # The previous move won the game
+        if rules.game_over:
+            return -w_win
+
+        key = rules.board.hash
+        hash_move = 0
+        entry = self.tt.probe(key)
+        self.tt_probes += 1
+        if entry is not None:
+            self.tt_hits += 1
+            tt_depth, tt_score, bound, hash_move = entry
+            if tt_depth >= depth and (bound == BOUND_EXACT or
+                                      (bound == BOUND_LOWER and tt_score >= beta) or
+                                      (bound == BOUND_UPPER and tt_score <= alpha)):
+                return tt_score
+
+        if depth <= 0:
+            if not self.quiescence:
+                self.leaf_evals += 1
+                return evaluate_board(rules.board, rules.current_player)
+            score = self.quiesce(alpha, beta, ply)
+            bound = BOUND_UPPER if score <= alpha else BOUND_LOWER if score >= beta else BOUND_EXACT
+            self.tt.store(key, 0, score, bound)
+            return score
+
+        params = self.params
+        player = rules.current_player
+        board = rules.board
+        null_window = beta - alpha == 1
+        try_null = (params.null_move and allow_null and null_window and not self.follow_pv
+                    and depth >= params.null_move_min_depth and board.stack_count[player] > 1)
+        reduce = params.lmr and depth >= params.lmr_min_depth
+        in_danger = False
+        if try_null or reduce:
+            guardian = board.red_guardian if player == 1 else board.blue_guardian
+            in_danger = bool(attack_map(board, 3 - player).captures & guardian)
+
+        if try_null and not in_danger:
+            undo = rules.make_null()
+            score = -self.pvs(depth - 1 - params.null_move_reduction, -beta, -beta + 1, ply + 1, False)
+            rules.unmake(undo)
+            if score >= beta:
+                self.null_move_cutoffs += 1
+                # Passing proves no win, so do not return one
+                return beta if score >= w_win else score
+
+        count = self._generate(ply, hash_move)
+        if not count:
+            self.leaf_evals += 1
+            return evaluate_board(board, player)
+
+        alpha_orig = alpha
+        best = -INFINITY
+        best_move = 0
+        buffer = self.move_buffers[ply]
+        killers = self.killers[ply]
+        reduce = reduce and not in_danger
+        for i in range(count):
+            move = buffer[i]
+            undo = rules.make_encoded(move)
+            if i == 0:
+                score = -self.pvs(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                if (reduce and i >= params.lmr_min_moves and not move & MOVE_CAPTURE
+                        and not rules.game_over and move != killers[0] and move != killers[1]):
+                    score = -self.pvs(depth - 1 - params.lmr_reduction, -alpha - 1, -alpha, ply + 1)
+                    if score > alpha:
+                        self.lmr_researches += 1
+                        score = -self.pvs(depth - 1, -alpha - 1, -alpha, ply + 1)
+                else:
+                    score = -self.pvs(depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.pvs(depth - 1, -beta, -alpha, ply + 1)
+            rules.unmake(undo)
+            self.follow_pv = False
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    if score >= beta:
+                        self._cutoff(move, i, depth, ply)
+                        break
+                    alpha = score
+
+        if best <= alpha_orig:
+            bound = BOUND_UPPER
+        elif best >= beta:
+            bound = BOUND_LOWER
+        else:
+            bound = BOUND_EXACT
+        self.tt.store(key, depth, best, bound, best_move)
+        return best
+
+    def pvs_root(self, depth: int, alpha: int = -INFINITY, beta: int = INFINITY) -> Tuple[Optional[int], int]:
+        """
+        Principal variation search of the root position.
+
+        Returns:
+            (best packed move or None if there are no legal moves, score for the side to move)
+            If the score is outside (alpha, beta) it is only a bound and the move is not reliable.
+        """
+        rules = self.rules
+        entry = self.tt.probe(rules.board.hash)
+        self.tt_probes += 1
+        self.tt_hits += entry is not None
+        count = self._generate(0, entry[3] if entry is not None else 0)
+        if not count:
+            self.leaf_evals += 1
+            return None, evaluate_board(rules.board, rules.current_player)
+        # The children search from ply 1 on, so the root buffer stays untouched
+        root_moves = self.move_buffers[0]
+
+        alpha_orig = alpha
+        best_move = None
+        best = -INFINITY
+        for i in range(count):
+            move = root_moves[i]
+            undo = rules.make_encoded(move)
+            if i == 0:
+                score = -self.pvs(depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self.pvs(depth - 1, -alpha - 1, -alpha, 1)
+                if alpha < score < beta:
+                    score = -self.pvs(depth - 1, -beta, -alpha, 1)
+            rules.unmake(undo)
+            self.follow_pv = False
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    if score >= beta:
+                        break
+                    alpha = score
+
+        if alpha_orig < best < beta:
+            self.tt.store(rules.board.hash, depth, best, BOUND_EXACT, best_move)
+        return best_move, best
+
+    def choose_move_pvs(self, depth: int = MAX_DEPTH, previous_score: Optional[float] = None) -> Tuple[Optional[int], float]:
+        """
+        Like choose_move, using the principal variation search.
+
+        With the Red-centric score of a previous search, the search starts with an
+        aspiration window around it and widens the window whenever the score falls outside.
+        """
+        rules = self.rules
+        start = time.perf_counter()
+        sign = 1 if rules.current_player == 1 else -1
+        pv_follow = self.follow_pv
+
+        if previous_score is None or depth < ASPIRATION_MIN_DEPTH or abs(previous_score) >= w_win:
+            alpha, beta = -INFINITY, INFINITY
+        else:
+            previous_score = int(sign * previous_score)
+            alpha = max(previous_score - ASPIRATION_WINDOW, -INFINITY)
+            beta = min(previous_score + ASPIRATION_WINDOW, INFINITY)
+
+        delta = ASPIRATION_WINDOW
+        while True:
+            self.follow_pv = pv_follow
+            move, score = self.pvs_root(depth, alpha, beta)
+            if score <= alpha and alpha > -INFINITY:
+                alpha = max(score - delta, -INFINITY)
+            elif score >= beta and beta < INFINITY:
+                beta = min(score + delta, INFINITY)
+            else:
                 break
-        print(f"{prefix}Maximizing returns {max_eval}")
-        return max_eval
-    else:
-        min_eval = float("inf")
-        print(f"{prefix}Minimizing at depth {depth}, player {'Red' if current_player == 1 else 'Blue'}, moves: {len(legal_moves)}")
-        for move in legal_moves:
-            print(f"{prefix}Trying move {move}")
-            next_fen = simulate_move(fen_str, move)
-            eval = alpha_beta(next_fen, depth - 1, alpha, beta, True, indent + 1)
-            min_eval = min(min_eval, eval)
-            beta = min(beta, eval)
-            print(f"{prefix}Move {move} eval={eval}, alpha={alpha}, beta={beta}")
-            if beta <= alpha:
-                print(f"{prefix}Alpha cutoff")
+            self.aspiration_researches += 1
+            delta *= 2
+            if self.verbose:
+                print(f"Aspiration window failed at depth {depth}, searching ({alpha}, {beta})")
+
+        self._record_time(depth, start)
+        return move, sign * score
+
+    def quiesce(self, alpha: float, beta: float, ply: int) -> float:
+        """
+        Search captures and Guardian moves onto the center until the position is quiet.
+
+        Negamax form: scores are from the side to move's point of view. The side to
+        move may always stand pat on the static evaluation instead of capturing, and
+        captures that cannot lift the score to alpha even with a generous margin
+        (delta pruning) are skipped.
+        """
+        rules = self.rules
+
+        self.nodes += 1
+        self.qnodes += 1
+        if not self.nodes & TIME_CHECK_NODES and self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        # The previous move won the game
+        if rules.game_over:
+            return -w_win
+
+        stand_pat = evaluate_board(rules.board, rules.current_player)
+        self.leaf_evals += 1
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        buffer = self.move_buffers[ply]
+        count = rules.generate_tactical(rules.current_player, buffer)
+        self.movegen_calls += 1
+        if count > 1:
+            self._order(buffer, count, ply, 0)
+
+        enemy_guardian = rules.board.blue_guardian if rules.current_player == 1 else rules.board.red_guardian
+        futile = alpha - CAPTURE_GAIN - DELTA_MARGIN
+        best = stand_pat
+        for i in range(count):
+            move = buffer[i]
+            # Delta pruning, except for the moves that win the game
+            to_sq = (move >> 6) & 0x3F
+            if (stand_pat <= futile and move & MOVE_CAPTURE and not enemy_guardian >> to_sq & 1
+                    and not (move & MOVE_GUARDIAN and to_sq == CENTER_SQUARE)):
+                continue
+            undo = rules.make_encoded(move)
+            score = -self.quiesce(-beta, -alpha, ply + 1)
+            rules.unmake(undo)
+            if score > best:
+                best = score
+                if score > alpha:
+                    if score >= beta:
+                        break
+                    alpha = score
+        return best
+
+    def choose_move(self, depth: int = MAX_DEPTH) -> Tuple[Optional[int], float]:
+        """
+        Search the root position to the given depth.
+
+        Returns:
+            (best packed move or None if there are no legal moves, Red-centric score)
+        """
+        rules = self.rules
+        start = time.perf_counter()
+        maximizing = rules.current_player == 1
+
+        self.tt.new_search()
+        _, hash_move = self._probe(depth, float("-inf"), float("inf"))
+        count = self._generate(0, hash_move)
+        # The children search from ply 1 on, so the root buffer stays untouched
+        root_moves = self.move_buffers[0]
+
+        best_move = None
+        best_score = float("-inf") if maximizing else float("inf")
+        if not count:
+            return best_move, best_score
+
+        for i in range(count):
+            move = root_moves[i]
+            undo = rules.make_encoded(move)
+            # Scores are Red-centric, so Red keeps the maximum and Blue the minimum.
+            # Only moves that beat the best one so far matter, which gives the children a bound.
+            if maximizing:
+                score = self.alpha_beta(depth - 1, best_score, float("inf"), False, ply=1)
+            else:
+                score = self.alpha_beta(depth - 1, float("-inf"), best_score, True, ply=1)
+            rules.unmake(undo)
+            self.follow_pv = False
+
+            if best_move is None or (maximizing and score > best_score) or (not maximizing and score < best_score):
+                best_score = score
+                best_move = move
+
+        self._store(depth, best_score, float("-inf"), float("inf"), best_move)
+        self._record_time(depth, start)
+        return best_move, best_score
+
+    def _record_time(self, depth: int, start: float) -> None:
+        """Add a completed root search that started at perf_counter() value start to the stats"""
+        elapsed = time.perf_counter() - start
+        self.depth_times.append((depth, elapsed))
+        self.search_time += elapsed
+
+    def principal_variation(self, max_length: int) -> List[int]:
+        """Follow the best moves stored in the transposition table from the current position"""
+        rules = self.rules
+        buffer = self.move_buffers[0]
+        pv = []
+        played = []
+        seen = set()
+        while len(pv) < max_length and not rules.game_over and rules.board.hash not in seen:
+            seen.add(rules.board.hash)
+            entry = self.tt.probe(rules.board.hash)
+            if entry is None or not entry[3]:
+                break
+            move = entry[3]
+            count = rules.generate_moves(rules.current_player, buffer)
+            if move not in buffer[:count]:
                 break
-        print(f"{prefix}Minimizing returns {min_eval}")
-        return min_eval
+            pv.append(move)
+            played.append(rules.make_encoded(move))
+        for undo in reversed(played):
+            rules.unmake(undo)
+        return pv
+
+    def iterative_deepening(self, max_depth: int = MAX_ITERATION_DEPTH,
+                            time_budget: Optional[float] = None) -> Tuple[Optional[int], float, int]:
+        """
+        Search depth 1, 2, ... up to max_depth, or until time_budget seconds have passed.
+
+        Depth 1 always completes, so there is a move whenever one exists. An iteration
+        that runs out of time is thrown away and the board is restored.
+
+        Returns:
+            (best move of the last completed iteration, its Red-centric score, its depth)
+        """
+        rules = self.rules
+        start = time.perf_counter()
+        base = len(rules.undo_stack)
+        self.pv = []
+        best_move, best_score, completed = None, 0.0, 0
+        if self.algorithm == 'pvs':
+            self.tt.new_search()
+
+        for depth in range(1, max_depth + 1):
+            if time_budget is not None and depth > 1:
+                elapsed = time.perf_counter() - start
+                # The next iteration takes several times as long as the last one
+                if elapsed >= time_budget / 2:
+                    break
+                self.deadline = start + time_budget
+            self.follow_pv = bool(self.pv)
+            iteration_start = time.perf_counter()
+            try:
+                if self.algorithm == 'pvs':
+                    move, score = self.choose_move_pvs(depth, best_score if completed else None)
+                else:
+                    move, score = self.choose_move(depth)
+            except SearchTimeout:
+                while len(rules.undo_stack) > base:
+                    rules.unmake(rules.undo_stack[-1])
+                self.search_time += time.perf_counter() - iteration_start
+                break
+            finally:
+                self.deadline = None
+                self.follow_pv = False
 
+            if move is None:
+                break
+            best_move, best_score, completed = move, score, depth
+            self.pv = self.principal_variation(depth)
+            if self.verbose:
+                print(f"Depth {depth}: score {score}, nodes {self.nodes}, "
+                      f"first-move cutoffs {self.first_move_cutoff_rate:.1%}, "
+                      f"time {time.perf_counter() - start:.3f}s, pv {' '.join(move_to_str(m) for m in self.pv)}")
+            # A won or lost game does not change with more depth
+            if abs(score) >= w_win:
+                break
 
-def choose_best_move(fen_str: str) -> str:
-    parser = FenParser()
-    legal_moves = parser.get_move_descriptions(fen_str)
+        return best_move, best_score, completed
 
-    if not legal_moves:
-        print("No legal moves available")
-        return "No legal moves available"
 
-    current_player = 1 if fen_str.strip().split()[1] == 'r' else 2
-    maximizing = current_player == 1
+def alpha_beta(rules: BitboardRules, depth: int, alpha: float, beta: float, maximizing: bool, ply: int = 0) -> float:
+    """
+    Minimax search with alpha-beta pruning on a fresh transposition table. Scores are Red-centric.
 
-    best_move = None
-    best_score = float("-inf") if maximizing else float("inf")
+    ply is the distance of the position from the root; it indexes the per-ply move buffers and killer moves.
+    """
+    return AlphaBetaSearch(rules).alpha_beta(depth, alpha, beta, maximizing, ply)
 
-    print(f"Choosing best move for player {'Red' if maximizing else 'Blue'} with {len(legal_moves)} moves")
 
-    for move in legal_moves:
-        print(f"Evaluating move {move}")
-        next_fen = simulate_move(fen_str, move)
-        score = alpha_beta(next_fen, MAX_DEPTH - 1, float("-inf"), float("inf"), not maximizing, indent=1)
+def search_position(fen_str: str, depth: Optional[int] = None, time_budget: Optional[float] = None,
+                    algorithm: str = DEFAULT_ALGORITHM, verbose: bool = False,
+                    trace: Optional[TextIO] = None) -> Tuple[Optional[int], float, SearchStats]:
+    """
+    Search a position the way choose_best_move does.
 
-        # Flip score if current player is Blue (since evaluate is Red-centric)
-        if current_player == 2:
-            score = -score
+    Args:
+        trace: Text file to write the search tree to as NDJSON (see search_trace.py), or None
 
-        print(f"Move {move} has score {score}")
+    Returns:
+        (best packed move or None if there are no legal moves, its Red-centric score, search statistics)
+    """
+    parser = FenParser()
+    board, current_player = parser.parse_fen(fen_str)
+    rules = BitboardRules(board)
+    rules.current_player = current_player
 
-        if maximizing and score > best_score:
-            best_score = score
-            best_move = move
-        elif not maximizing and score < best_score:
-            best_score = score
-            best_move = move
+    if trace is not None:
+        from search_trace import TracingSearch
+        search = TracingSearch(rules, trace, verbose=verbose, algorithm=algorithm)
+    else:
+        search = AlphaBetaSearch(rules, verbose=verbose, algorithm=algorithm)
+    if time_budget is None and algorithm == 'pvs':
+        best_move, score, _ = search.iterative_deepening(depth or MAX_DEPTH)
+    elif time_budget is None:
+        best_move, score = search.choose_move(depth or MAX_DEPTH)
+    else:
+        best_move, score, _ = search.iterative_deepening(depth or MAX_ITERATION_DEPTH, time_budget)
+    return best_move, score, search.stats
 
-        print(f"Current best move: {best_move} with score {best_score}")
 
-    print(f"Best move chosen: {best_move} with score {best_score}")
-    return best_move
+def choose_best_move(fen_str: str, verbose: bool = False, depth: Optional[int] = None,
+                     time_budget: Optional[float] = None, algorithm: str = DEFAULT_ALGORITHM,
+                     threads: int = 1, trace: Optional[TextIO] = None) -> str:
+    """
+    Pick a move for the side to move.
+
+    Without a time budget the search goes to a fixed depth (MAX_DEPTH by default).
+    With a time budget in seconds it deepens iteratively up to depth (or
+    MAX_ITERATION_DEPTH) until the time is used up. The pvs algorithm always
+    deepens iteratively, since its aspiration windows need the previous score.
+    With more than one thread the root moves are split across worker processes.
+    verbose prints the search statistics, and trace receives the search tree
+    (single-threaded searches only).
+    """
+    if threads > 1 and trace is not None:
+        raise ValueError("A search with more than one thread cannot be traced")
+    if threads > 1:
+        from parallel_search import ParallelSearch
+        max_depth = depth or (MAX_DEPTH if time_budget is None else MAX_ITERATION_DEPTH)
+        with ParallelSearch(threads, verbose=verbose) as search:
+            best_move, _, _ = search.search(fen_str, max_depth, time_budget)
+        return move_to_str(best_move) if best_move is not None else "No legal moves available"
+
+    best_move, _, stats = search_position(fen_str, depth, time_budget, algorithm, verbose, trace)
+    if verbose:
+        print(stats)
+    if best_move is None:
+        print("No legal moves available")
+        return "No legal moves available"
+    # Algebraic notation only at the command line boundary
+    return move_to_str(best_move)
 
 
+def bench(depth: int = BENCH_DEPTH, algorithm: str = DEFAULT_ALGORITHM,
+          positions: List[str] = BENCH_POSITIONS) -> Tuple[List[Tuple[Optional[int], int]], float, int]:
+    """
+    Search every position to a fixed depth like choose_best_move, without any output.
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python intelligent_ki.py \"FEN_STRING\"")
-        sys.exit(1)
+    Each search starts from an empty transposition table, so the node counts
+    only depend on the search and evaluation code. Any change to either that
+    visits other nodes changes the signature; a pure speed change only
+    changes the time.
 
-    fen_str = sys.argv[1]
-    move = choose_best_move(fen_str)
+    Returns:
+        ((best move, nodes) per position, search seconds, signature)
+    """
+    results = []
+    elapsed = 0.0
+    for fen_str in positions:
+        best_move, _, stats = search_position(fen_str, depth, algorithm=algorithm)
+        elapsed += stats.time
+        results.append((best_move, stats.nodes))
+    signature = zlib.crc32(" ".join(f"{move}:{nodes}" for move, nodes in results).encode())
+    return results, elapsed, signature
+
+
+def run(args: argparse.Namespace) -> None:
+    """Carry out the command line of main()"""
+    if args.fen == "bench":
+        results, elapsed, signature = bench(args.depth or BENCH_DEPTH, args.algorithm)
+        for fen_str, (move, nodes) in zip(BENCH_POSITIONS, results):
+            print(f"{fen_str}: {move_to_str(move) if move is not None else 'none'} {nodes}")
+        nodes = sum(nodes for _, nodes in results)
+        print(f"\nNodes searched: {nodes}")
+        print(f"Time: {elapsed:.3f}s")
+        print(f"Nodes/second: {nodes / elapsed if elapsed > 0 else 0:.0f}")
+        print(f"Signature: {signature:08x}")
+        return
+
+    time_budget = args.movetime / 1000 if args.movetime is not None else None
+    if args.trace:
+        with open(args.trace, "w", encoding="utf-8") as trace:
+            move = choose_best_move(args.fen, verbose=args.verbose, depth=args.depth, time_budget=time_budget,
+                                    algorithm=args.algorithm, threads=args.threads, trace=trace)
+    else:
+        move = choose_best_move(args.fen, verbose=args.verbose, depth=args.depth, time_budget=time_budget,
+                                algorithm=args.algorithm, threads=args.threads)
     print(move)
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Alpha-beta AI for Turm & Wächter")
+    parser.add_argument("fen", help="Position in FEN notation, or 'bench' to search the bench positions")
+    parser.add_argument("--depth", type=int, default=None,
+                        help=f"Search depth (default {MAX_DEPTH}, or the depth limit of --movetime)")
+    parser.add_argument("--movetime", type=int, default=None, metavar="MS",
+                        help="Time budget in milliseconds, searched with iterative deepening")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default=DEFAULT_ALGORITHM,
+                        help=f"Search algorithm (default {DEFAULT_ALGORITHM})")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Worker processes searching the root moves in parallel (default 1)")
+    parser.add_argument("--verbose", action="store_true", help="Print every iteration and the search statistics")
+    parser.add_argument("--trace", metavar="FILE", help="Write the search tree to FILE as NDJSON")
+    parser.add_argument("--profile", nargs="?", const="alpha_beta_ki", metavar="PREFIX",
+                        help="Profile the search and write PREFIX.pstats and PREFIX.folded (default alpha_beta_ki)")
+    args = parser.parse_args()
+    if args.trace and args.threads > 1:
+        parser.error("--trace cannot be combined with --threads greater than 1")
+
+    if args.profile:
+        from profiling import profile_call
+        profile_call(run, args, prefix=args.profile)
+    else:
+        run(args)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,130 +1,358 @@
 #!/usr/bin/env python3
 """
-Benchmark tests for Turm & Wächter.
-Tests the speed of the move generator on different positions:
-- Initial position (start of game)
-- Midgame position (some pieces captured)
-- Endgame position (few pieces left)
+Benchmark suite for Turm & Wächter.
 
-Runs 10k iterations to get reliable performance numbers.
+Measures the throughput of
+- move generation (generated moves per second),
+- evaluation (evaluate_board calls per second),
+- search (nodes per second of a fixed-depth pvs search)
+over a corpus of positions from all game phases (benchmarks/positions.txt).
+
+Every measurement is warmed up and then repeated for several trials, timed
+with perf_counter_ns. The report gives the median throughput, the
+interquartile range and a distribution-free 95% confidence interval of the
+median, so a real regression can be told apart from noise.
+
+Usage:
+    python benchmarks/benchmark.py [--trials N] [--warmup N] [--json results.json]
+    python benchmarks/benchmark.py --compare baseline.json [--threshold 0.05]
+    python benchmarks/benchmark.py --memory --json results.json
+    python benchmarks/benchmark.py --search-comparison
+
+--json writes the results as JSON. --compare measures, compares against a
+result file written earlier and exits with status 1 if any throughput
+dropped by more than the threshold (a fraction of the baseline median).
+--memory adds the memory measurements of memory_benchmark.py to the results,
+so memory use is compared against the baseline as well.
+--search-comparison prints node counts of the search algorithms and the
+depth reached with and without pruning instead.
 """
 
-import time
-import sys
+import argparse
+import gc
+import json
+import math
 import os
-from typing import List, Tuple
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
 # Add parent directory to sys.path to allow imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.bitboard import BitboardBoard
 from core.bitboard_rules import BitboardRules
 from core.fen import FenParser
+from core.move import new_move_buffer
+from alpha_beta_ki import AlphaBetaSearch, SearchParams, ALGORITHMS
+from evaluate import evaluate_board
+from transposition_table import TranspositionTable
 
 # Test positions (copied from the README)
 INIT_POS = "r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r"  # Initial
-MID_POS = "3RG1r11/3r333/r36/7/b32b33/7/3BG2b1 b"  # Midgame with some captures
+MID_POS = "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b"  # Midgame with some captures
 END_POS = "RGBG5/7/7/7/7/7/7 r"  # Endgame (just guardians left)
 
-# For detailed timing info
-DEBUG = False
+# Positions of all game phases the throughput is measured on
+POSITIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "positions.txt")
 
-# Number of iterations - more = more accurate but slower
-ITERATIONS = 10000
+# Version of the JSON result format
+RESULT_FORMAT = 1
 
-def time_it(func):
-    """Simple timing decorator - useful for detailed profiling"""
-    def wrapper(*args, **kwargs):
-        start = time.time()
-        result = func(*args, **kwargs)
-        end = time.time()
-        if DEBUG:
-            print(f"{func.__name__} took {(end - start)*1000:.2f}ms")
-        return result
-    return wrapper
+# Timed trials per measurement, and untimed runs before them
+TRIALS = 7
+WARMUP = 2
 
-def benchmark_position(fen: str, name: str, iters: int = ITERATIONS):
-    """
-    Run benchmark on a specific position
-    """
-    print(f"\nBenchmarking {name} position")
-    print(f"Position: {fen}")
-    
-    # Setup the board and rules
-    parser = FenParser()
-    board, player = parser.parse_fen(fen)
+# Passes over the corpus per trial for the fast measurements
+MOVEGEN_PASSES = 200
+EVAL_PASSES = 100
+
+# Depth of the search throughput measurement
+THROUGHPUT_DEPTH = 3
+
+# Largest tolerated throughput drop for --compare, as a fraction of the baseline
+REGRESSION_THRESHOLD = 0.05
+
+# Depth of the search algorithm comparison
+SEARCH_DEPTH = 5
+
+# Time per position for the pruning comparison (seconds)
+SEARCH_TIME = 2.0
+
+
+def load_positions(path: str = POSITIONS_FILE) -> List[Tuple[str, str]]:
+    """Read (phase, FEN) pairs; lines are '<phase> <FEN> <side>', '#' starts a comment"""
+    positions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                phase, fen = line.split(" ", 1)
+                positions.append((phase, fen))
+    return positions
+
+
+def rules_from_fen(fen: str) -> BitboardRules:
+    board, player = FenParser().parse_fen(fen)
     rules = BitboardRules(board)
     rules.current_player = player
-    
-    # Count legal moves first (for verification)
-    # This is outside the timing loop
-    moves = rules.get_legal_moves(player)
-    print(f"Legal moves: {len(moves)}")
-    
-    # Main benchmark
-    print(f"Running {iters} iterations...")
-    
-    # Timing code
-    start = time.time()
-    
-    # This is the hotspot where we spend all our time
-    for i in range(iters):
-        rules.get_legal_moves(player)
-        
-        # Progress indicator for slow runs
-        if DEBUG and i % 1000 == 0 and i > 0:
-            sys.stdout.write(".")
-            sys.stdout.flush()
-            
-    end = time.time()
-    
-    # Calculate stats
-    elapsed = end - start
-    ms_per_iter = elapsed * 1000 / iters
-    
-    print(f"Total time: {elapsed:.2f} seconds")
-    print(f"Average time: {ms_per_iter:.4f} ms per generation")
-    
-    return elapsed, ms_per_iter, len(moves)
-
-def run_benchmark_tests():
-    """Run benchmarks on all positions"""
-    print("\n========== Turm & Wächter Benchmark ==========")
-    print("Testing move generator performance")
-    
-    results = []
-    
-    # Test initial position (start of game)
-    init_time, init_avg, init_moves = benchmark_position(
-        INIT_POS, "Initial", ITERATIONS
-    )
-    results.append(("Initial", init_time, init_avg, init_moves))
-    
-    # Test midgame position
-    mid_time, mid_avg, mid_moves = benchmark_position(
-        MID_POS, "Midgame", ITERATIONS
-    )
-    results.append(("Midgame", mid_time, mid_avg, mid_moves))
-    
-    # Test endgame position (few pieces)
-    end_time, end_avg, end_moves = benchmark_position(
-        END_POS, "Endgame", ITERATIONS
+    return rules
+
+
+def time_trials(work: Callable[[], int], trials: int = TRIALS, warmup: int = WARMUP,
+                setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """
+    Run work() warmup times untimed, then trials times timed.
+
+    The garbage collector is off during the timed runs (like in timeit), so
+    its pauses do not land in random trials.
+
+    Args:
+        work: Does the measured work and returns how many units (moves, nodes, ...) it did
+        setup: Called untimed before every run, e.g. to clear tables
+
+    Returns:
+        Throughput of every timed trial in units per second
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        work()
+    samples = []
+    gc_enabled = gc.isenabled()
+    try:
+        for _ in range(trials):
+            if setup:
+                setup()
+            gc.collect()
+            gc.disable()
+            start = time.perf_counter_ns()
+            units = work()
+            elapsed = time.perf_counter_ns() - start
+            if gc_enabled:
+                gc.enable()
+            samples.append(units * 1e9 / max(elapsed, 1))
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return samples
+
+
+def summarize(samples: List[float], unit: str, higher_is_better: bool = True) -> Dict:
+    """Median, quartiles and a 95% confidence interval of the median of some trial results"""
+    values = sorted(samples)
+    n = len(values)
+    if n >= 2:
+        q1, _, q3 = statistics.quantiles(values, n=4, method="inclusive")
+    else:
+        q1 = q3 = values[0]
+    # Order statistics bracketing the median with 95% confidence (binomial, normal approximation)
+    spread = 1.96 * math.sqrt(n) / 2
+    low = max(int(math.floor(n / 2 - spread)), 1)
+    high = min(int(math.ceil(n / 2 + 1 + spread)), n)
+    return {
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+        "median": statistics.median(values),
+        "q1": q1,
+        "q3": q3,
+        "iqr": q3 - q1,
+        "ci_low": values[low - 1],
+        "ci_high": values[high - 1],
+        "samples": samples,
+    }
+
+
+def benchmark_movegen(positions: List[Tuple[str, str]], trials: int = TRIALS, warmup: int = WARMUP,
+                      passes: int = MOVEGEN_PASSES) -> Dict:
+    """Generated moves per second, generating into a reused buffer"""
+    setups = [(rules, rules.current_player) for rules in (rules_from_fen(fen) for _, fen in positions)]
+    buffer = new_move_buffer()
+
+    def work():
+        moves = 0
+        for _ in range(passes):
+            for rules, player in setups:
+                moves += rules.generate_moves(player, buffer)
+        return moves
+
+    return summarize(time_trials(work, trials, warmup), "moves/s")
+
+
+def benchmark_eval(positions: List[Tuple[str, str]], trials: int = TRIALS, warmup: int = WARMUP,
+                   passes: int = EVAL_PASSES) -> Dict:
+    """evaluate_board calls per second"""
+    setups = [(rules.board, rules.current_player) for rules in (rules_from_fen(fen) for _, fen in positions)]
+
+    def work():
+        for _ in range(passes):
+            for board, player in setups:
+                evaluate_board(board, player)
+        return passes * len(setups)
+
+    return summarize(time_trials(work, trials, warmup), "evals/s")
+
+
+def benchmark_search_nps(positions: List[Tuple[str, str]], trials: int = TRIALS, warmup: int = WARMUP,
+                         depth: int = THROUGHPUT_DEPTH) -> Dict:
+    """Nodes per second of a fixed-depth pvs search of every position, from an empty table each time"""
+    setups = [(rules_from_fen(fen), TranspositionTable(1)) for _, fen in positions]
+
+    def setup():
+        for _, tt in setups:
+            tt.clear()
+
+    def work():
+        nodes = 0
+        for rules, tt in setups:
+            search = AlphaBetaSearch(rules, tt, algorithm='pvs')
+            search.iterative_deepening(depth)
+            nodes += search.nodes
+        return nodes
+
+    return summarize(time_trials(work, trials, warmup, setup), "nodes/s")
+
+
+def run_suite(positions: List[Tuple[str, str]], trials: int = TRIALS, warmup: int = WARMUP) -> Dict:
+    """Run all throughput measurements; the result is what --json writes"""
+    return {
+        "format": RESULT_FORMAT,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "trials": trials,
+        "warmup": warmup,
+        "positions": len(positions),
+        "metrics": {
+            "movegen": benchmark_movegen(positions, trials, warmup),
+            "eval": benchmark_eval(positions, trials, warmup),
+            "search": benchmark_search_nps(positions, trials, warmup),
+        },
+    }
+
+
+def print_results(results: Dict) -> None:
+    print(f"\n=== Throughput ({results['positions']} positions, {results['trials']} trials) ===")
+    print(f"Metric              | Unit       | Median      | IQR         | 95% CI of median")
+    print(f"--------------------|------------|-------------|-------------|--------------------------")
+    for name, metric in results["metrics"].items():
+        print(f"{name:<19} | {metric['unit']:<10} | {metric['median']:<11.0f} | {metric['iqr']:<11.0f} | "
+              f"{metric['ci_low']:.0f} - {metric['ci_high']:.0f}")
+
+
+def compare_results(results: Dict, baseline: Dict,
+                    threshold: float = REGRESSION_THRESHOLD) -> List[Tuple[str, float, float, float, bool]]:
+    """
+    Compare the medians of every metric present in both results.
+
+    Returns:
+        (metric, baseline median, current median, relative change, regressed) per metric.
+        The change is positive for an improvement, whichever direction is better for the metric.
+    """
+    comparison = []
+    for name, metric in results["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if base is None or not base["median"]:
+            continue
+        if metric.get("higher_is_better", True):
+            change = (metric["median"] - base["median"]) / base["median"]
+        else:
+            change = (base["median"] - metric["median"]) / base["median"]
+        comparison.append((name, base["median"], metric["median"], change, change < -threshold))
+    return comparison
+
+
+def print_comparison(comparison: List[Tuple[str, float, float, float, bool]], threshold: float) -> None:
+    print(f"\n=== Comparison with baseline (threshold {threshold:.1%}) ===")
+    print(f"Metric              | Baseline        | Current         | Change")
+    print(f"--------------------|-----------------|-----------------|-----------------")
+    for name, base, current, change, regressed in comparison:
+        print(f"{name:<19} | {base:<15.0f} | {current:<15.0f} | {change:+.1%}{'  REGRESSION' if regressed else ''}")
+
+
+def benchmark_search(fen: str, algorithm: str, depth: int = SEARCH_DEPTH, time_budget: float = None,
+                     params: SearchParams = None):
+    """
+    Search a position with iterative deepening to a fixed depth (or until time_budget runs out)
+
+    Returns:
+        (nodes searched, elapsed seconds, best move, Red-centric score, depth reached)
+    """
+    rules = rules_from_fen(fen)
+    search = AlphaBetaSearch(rules, algorithm=algorithm, params=params)
+    start = time.perf_counter()
+    move, score, completed = search.iterative_deepening(depth, time_budget)
+    elapsed = time.perf_counter() - start
+    return search.nodes, elapsed, move, score, completed
+
+def compare_search_algorithms(depth: int = SEARCH_DEPTH):
+    """Print the node counts of all search algorithms on the benchmark positions"""
+    print(f"\n=== Search Algorithms (depth {depth}) ===")
+    print(f"Position   | Algorithm  | Nodes     | Time (s)  | Score")
+    print(f"-----------|------------|-----------|-----------|----------")
+
+    for name, fen in (("Initial", INIT_POS), ("Midgame", MID_POS), ("Endgame", END_POS)):
+        for algorithm in ALGORITHMS:
+            nodes, elapsed, _, score, _ = benchmark_search(fen, algorithm, depth)
+            print(f"{name:<10} | {algorithm:<10} | {nodes:<9} | {elapsed:<9.2f} | {score}")
+
+def compare_pruning(time_budget: float = SEARCH_TIME):
+    """Print the depth the pvs search reaches in the same time with and without null moves and LMR"""
+    settings = (
+        ("off", SearchParams(null_move=False, lmr=False)),
+        ("null move", SearchParams(lmr=False)),
+        ("lmr", SearchParams(null_move=False)),
+        ("both", SearchParams()),
     )
-    results.append(("Endgame", end_time, end_avg, end_moves))
-    
-    # Print a nice summary table
-    print("\n=== Results Summary ===")
-    print(f"Position   | Moves | Total Time (s)  | Avg (ms/move)")
-    print(f"-----------|-------|-----------------|------------------")
-    
-    for pos, total, avg, moves in results:
-        print(f"{pos:<10} | {moves:<5} | {total:<15.2f} | {avg:<15.4f}")
-    
-    print("\nDone! Benchmarks completed successfully.")
-    
-    if DEBUG:
-        print("\nNotes:")
-        print("- Run with DEBUG=True for more timing info")
-        print("- Increase ITERATIONS for more accurate results")
+    print(f"\n=== Pruning ({time_budget:.1f}s per position) ===")
+    print(f"Position   | Pruning    | Depth | Nodes")
+    print(f"-----------|------------|-------|-----------")
+
+    for name, fen in (("Initial", INIT_POS), ("Midgame", MID_POS)):
+        for label, params in settings:
+            nodes, _, _, _, depth = benchmark_search(fen, 'pvs', 64, time_budget, params)
+            print(f"{name:<10} | {label:<10} | {depth:<5} | {nodes}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmarks for Turm & Wächter")
+    parser.add_argument("--trials", type=int, default=TRIALS, help="Timed trials per measurement")
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="Untimed runs before the trials")
+    parser.add_argument("--positions", default=POSITIONS_FILE, help="Position corpus file")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="Fail if throughput regressed against this JSON file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Largest tolerated drop of a median, as a fraction (default 0.05)")
+    parser.add_argument("--memory", action="store_true", help="Also measure memory use (see memory_benchmark.py)")
+    parser.add_argument("--search-comparison", action="store_true",
+                        help="Compare search algorithms and pruning settings instead")
+    args = parser.parse_args()
+
+    if args.search_comparison:
+        compare_search_algorithms()
+        compare_pruning()
+        return
+
+    print("\n========== Turm & Wächter Benchmark ==========")
+    positions = load_positions(args.positions)
+    results = run_suite(positions, args.trials, args.warmup)
+    if args.memory:
+        from benchmarks.memory_benchmark import run_memory_suite
+        results["metrics"].update(run_memory_suite(positions))
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        comparison = compare_results(results, baseline, args.threshold)
+        print_comparison(comparison, args.threshold)
+        if any(regressed for *_, regressed in comparison):
+            print("\nThroughput regressed beyond the threshold.")
+            sys.exit(1)
 
 if __name__ == "__main__":
-    run_benchmark_tests() 
\ No newline at end of file
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for Turm & Wächter.
+
+Measures with tracemalloc, over the positions of benchmarks/positions.txt:
+- bytes per BitboardBoard,
+- bytes per generated move in a get_legal_moves list (tuples of tuples),
+- bytes per move buffer of packed moves (core.move.new_move_buffer),
+- bytes per BitboardRules instance,
+- the peak Python heap during a fixed search (alpha_beta_ki bench positions),
+and, where the resource module exists (Unix), the peak resident set size of
+a fresh interpreter running the same search, next to one that only imports
+the engine.
+
+The results use the format of benchmark.py (every metric is lower-is-better),
+so they can be saved with --json and checked against a baseline with
+--compare, alongside or merged into the speed results (benchmark.py --memory).
+
+Usage:
+    python benchmarks/memory_benchmark.py [--json memory.json] [--compare baseline.json] [--threshold 0.05]
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+# Add parent directory to sys.path to allow imports
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from core.bitboard_rules import BitboardRules
+from core.fen import FenParser
+from core.move import new_move_buffer
+from alpha_beta_ki import bench
+from benchmarks.benchmark import (POSITIONS_FILE, REGRESSION_THRESHOLD, RESULT_FORMAT, compare_results,
+                                  load_positions, print_comparison, summarize)
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Copies of every corpus position to average the per-object sizes over
+COPIES = 50
+
+# Depth of the searches whose peak memory is measured
+MEMORY_SEARCH_DEPTH = 3
+
+
+def _traced(build):
+    """Bytes still allocated after build() returned, and what build() returned"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0] - before, objects
+
+
+def measure_objects(positions: List[Tuple[str, str]], copies: int = COPIES) -> Dict[str, float]:
+    """Average bytes per board, move, move buffer and rules instance (tracemalloc must be tracing)"""
+    parser = FenParser()
+    fens = [fen for _, fen in positions] * copies
+    # Boards kept in a preallocated list, so only the boards themselves are counted
+    boards = [None] * len(fens)
+
+    def build_boards():
+        for i, fen in enumerate(fens):
+            boards[i] = parser.parse_fen(fen)[0]
+        return boards
+
+    board_bytes, _ = _traced(build_boards)
+
+    players = [parser.parse_fen(fen)[1] for fen in fens]
+    rules = [None] * len(boards)
+
+    def build_rules():
+        for i, board in enumerate(boards):
+            rules[i] = BitboardRules(board)
+        return rules
+
+    rules_bytes, _ = _traced(build_rules)
+
+    move_lists = [None] * len(rules)
+
+    def build_move_lists():
+        for i, (r, player) in enumerate(zip(rules, players)):
+            move_lists[i] = r.get_legal_moves(player)
+        return move_lists
+
+    move_bytes, _ = _traced(build_move_lists)
+    moves = sum(len(m) for m in move_lists)
+
+    buffer_bytes, _ = _traced(lambda: [new_move_buffer() for _ in range(copies)])
+
+    return {
+        "board_bytes": board_bytes / len(boards),
+        "rules_bytes": rules_bytes / len(rules),
+        "move_bytes": move_bytes / moves if moves else 0.0,
+        "move_buffer_bytes": buffer_bytes / copies,
+    }
+
+
+def measure_search_heap(depth: int = MEMORY_SEARCH_DEPTH) -> int:
+    """Peak bytes allocated during the bench searches (tracemalloc must be tracing)"""
+    gc.collect()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    bench(depth)
+    return tracemalloc.get_traced_memory()[1] - before
+
+
+# Printed by the child interpreter: its peak RSS in bytes. On Linux ru_maxrss keeps the
+# parent's peak across fork and exec, so the child's own high-water mark comes from /proc.
+_PRINT_PEAK_RSS = """
+import resource, sys
+try:
+    with open("/proc/self/status") as status:
+        peak = next(int(line.split()[1]) * 1024 for line in status if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak if sys.platform == "darwin" else peak * 1024  # Kilobytes except on macOS
+print(peak)
+"""
+
+
+def _child_max_rss(code: str) -> Optional[int]:
+    """Peak resident set size in bytes of a fresh interpreter running code, or None without resource"""
+    if resource is None:
+        return None
+    env = os.environ.copy()
+    env["PYTHONPATH"] = ROOT
+    output = subprocess.run([sys.executable, "-c", code + "\n" + _PRINT_PEAK_RSS], capture_output=True, text=True,
+                            env=env, cwd=ROOT, check=True).stdout
+    return int(output.split()[-1])
+
+
+def measure_search_rss(depth: int = MEMORY_SEARCH_DEPTH) -> Dict[str, int]:
+    """Peak RSS of an interpreter that runs the bench searches, and of one that only imports the engine"""
+    idle = _child_max_rss("import alpha_beta_ki")
+    if idle is None:
+        return {}
+    search = _child_max_rss(f"import alpha_beta_ki\nalpha_beta_ki.bench({depth})")
+    return {"rss_idle": idle, "rss_search_peak": search}
+
+
+def run_memory_suite(positions: List[Tuple[str, str]], copies: int = COPIES,
+                     depth: int = MEMORY_SEARCH_DEPTH) -> Dict[str, Dict]:
+    """All memory measurements as benchmark.py metrics"""
+    rss = measure_search_rss(depth)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        values = measure_objects(positions, copies)
+        values["search_heap_peak"] = measure_search_heap(depth)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    values.update(rss)
+    return {name: summarize([float(value)], "bytes", higher_is_better=False) for name, value in values.items()}
+
+
+def print_memory(metrics: Dict[str, Dict]) -> None:
+    print(f"\n=== Memory ===")
+    print(f"Metric              | Bytes")
+    print(f"--------------------|----------------")
+    for name, metric in metrics.items():
+        print(f"{name:<19} | {metric['median']:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory benchmarks for Turm & Wächter")
+    parser.add_argument("--positions", default=POSITIONS_FILE, help="Position corpus file")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="Fail if memory use grew against this JSON file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Largest tolerated growth, as a fraction (default 0.05)")
+    args = parser.parse_args()
+
+    positions = load_positions(args.positions)
+    results = {
+        "format": RESULT_FORMAT,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "positions": len(positions),
+        "metrics": run_memory_suite(positions),
+    }
+    print_memory(results["metrics"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        comparison = compare_results(results, baseline, args.threshold)
+        print_comparison(comparison, args.threshold)
+        if any(regressed for *_, regressed in comparison):
+            print("\nMemory use grew beyond the threshold.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,58 @@
 from typing import List, Tuple, Optional
 from .piece import PieceType
+from .zobrist import PIECE_KEYS, SIDE_KEY
+
+
+def _popcount_fallback(bitboard: int) -> int:
+    return bin(bitboard).count('1')
+
+
+# Number of set bits in a bitboard (int.bit_count needs Python 3.10+)
+popcount = getattr(int, 'bit_count', _popcount_fallback)
+
+# Each player's own half of the board: Red rows 0-2 (top), Blue rows 4-6 (bottom)
+_ROW = 0b1111111
+HALF_MASK = [
+    0,
+    _ROW | _ROW << 7 | _ROW << 14,
+    _ROW << 28 | _ROW << 35 | _ROW << 42,
+]
+
+# Manhattan distance of every square to the center square (3,3)
+CENTER_DISTANCE = [abs(sq % 7 - 3) + abs(sq // 7 - 3) for sq in range(49)]
+
+
+class UndoRecord:
+    """
+    Everything needed to take back one move made with BitboardBoard.make.
+
+    Piece codes: 0 is a Guardian (Wächter), 1-7 is a tower stack of that height.
+    The last three fields are filled in by BitboardRules.make.
+    """
+    __slots__ = (
+        'from_sq', 'to_sq', 'height', 'player', 'source_code',
+        'captured_player', 'captured_code', 'dest_height',
+        'game_over', 'winner', 'current_player',
+    )
+
+    def __init__(self, from_sq: int, to_sq: int, height: int, player: int, source_code: int,
+                 captured_player: Optional[int], captured_code: int, dest_height: int):
+        self.from_sq = from_sq
+        self.to_sq = to_sq
+        self.height = height                    # Number of pieces moved
+        self.player = player                    # Owner of the moved pieces
+        self.source_code = source_code          # Piece code on the source square before the move
+        self.captured_player = captured_player  # Owner of the captured stack, None if no capture
+        self.captured_code = captured_code      # Piece code of the captured stack
+        self.dest_height = dest_height          # Height of the own stack we merged onto (0 if none)
+        self.game_over = False
+        self.winner = None
+        self.current_player = player
+
+    def __repr__(self):
+        return (f"UndoRecord({self.from_sq}->{self.to_sq}, h={self.height}, player={self.player}, "
+                f"captured={self.captured_player}:{self.captured_code}, dest_height={self.dest_height})")
+
 
 class BitboardBoard:
     """
@@ -14,6 +67,19 @@ class BitboardBoard:
     
     For towers, we maintain up to 7 separate bitboards for each height,
     allowing efficient stack representation.
+    
+    The board also keeps a 64-bit Zobrist key of the position in `hash`. It is
+    updated incrementally by every piece change and includes SIDE_KEY when Blue
+    is to move (the side is tracked by whoever owns the board: FenParser and
+    BitboardRules).
+    
+    The material terms of the evaluation are kept the same way, indexed by player:
+    - stack_count: number of stacks (Guardian included)
+    - tower_height: sum of tower heights
+    - intruders: stacks standing in the opponent's half
+    - center_bonus: 6 minus the Guardian's distance to the center (0 without Guardian)
+    
+    All piece changes must go through _toggle to keep these in sync.
     """
     SIZE = 7
     
@@ -27,6 +93,14 @@ class BitboardBoard:
         self.red_towers = [0] * 8   # Red Tower positions by height
         self.blue_towers = [0] * 8  # Blue Tower positions by height
         
+        self.hash = 0  # Zobrist key of the position (see core/zobrist.py)
+        
+        # Incrementally updated evaluation terms, index 0 is unused
+        self.stack_count = [0, 0, 0]
+        self.tower_height = [0, 0, 0]
+        self.intruders = [0, 0, 0]
+        self.center_bonus = [0, 0, 0]
+        
         if setup_initial:
             self.setup_starting_position()
     
@@ -64,22 +138,27 @@ class BitboardBoard:
         self.blue_guardian = 0
         self.red_towers = [0] * 8
         self.blue_towers = [0] * 8
+        self.hash = 0
+        self.stack_count = [0, 0, 0]
+        self.tower_height = [0, 0, 0]
+        self.intruders = [0, 0, 0]
+        self.center_bonus = [0, 0, 0]
         
         # Place Red Guardian (Wächter) at D7
-        self.red_guardian = self._set_bit(self.red_guardian, 3, 0)
+        self._toggle(1, 0, self._pos_to_bitpos(3, 0))
         
         # Place Blue Guardian (Wächter) at D1
-        self.blue_guardian = self._set_bit(self.blue_guardian, 3, 6)
+        self._toggle(2, 0, self._pos_to_bitpos(3, 6))
         
         # Place Red Towers with height 1
         red_tower_positions = [(0, 0), (1, 0), (2, 1), (3, 2), (4, 1), (5, 0), (6, 0)]  # A7, B7, C6, D5, E6, F7, G7
         for x, y in red_tower_positions:
-            self.red_towers[1] = self._set_bit(self.red_towers[1], x, y)
+            self._toggle(1, 1, self._pos_to_bitpos(x, y))
         
         # Place Blue Towers with height 1
         blue_tower_positions = [(0, 6), (1, 6), (2, 5), (3, 4), (4, 5), (5, 6), (6, 6)]  # A1, B1, C2, D3, E2, F1, G1
         for x, y in blue_tower_positions:
-            self.blue_towers[1] = self._set_bit(self.blue_towers[1], x, y)
+            self._toggle(2, 1, self._pos_to_bitpos(x, y))
     
     def get_stack_height(self, x: int, y: int) -> int:
         """Get the height of the stack at position (x,y)"""
@@ -140,62 +219,36 @@ class BitboardBoard:
         if owner is None or piece_type is None or stack_height < height:
             raise ValueError("Invalid move: source stack cannot be moved")
         
+        from_sq = self._pos_to_bitpos(from_x, from_y)
+        to_sq = self._pos_to_bitpos(to_x, to_y)
+        
         # Handle guardian moves
         if piece_type == PieceType.WAECHTER:
-            if owner == 1:  # Red guardian
-                # Clear old position
-                self.red_guardian = self._clear_bit(self.red_guardian, from_x, from_y)
-                # Set new position
-                self.red_guardian = self._set_bit(self.red_guardian, to_x, to_y)
-            else:  # Blue guardian
-                # Clear old position
-                self.blue_guardian = self._clear_bit(self.blue_guardian, from_x, from_y)
-                # Set new position
-                self.blue_guardian = self._set_bit(self.blue_guardian, to_x, to_y)
+            # Clear old position and set new position
+            self._toggle(owner, 0, from_sq)
+            self._toggle(owner, 0, to_sq)
             return
         
         # Handle tower moves
-        # We need to update the tower bitboards for the source and destination
-        if owner == 1:  # Red towers
-            # Clear the source position in the original height bitboard
-            self.red_towers[stack_height] = self._clear_bit(self.red_towers[stack_height], from_x, from_y)
-            
-            # If not moving all pieces, update the source with remaining pieces
-            if height < stack_height:
-                self.red_towers[stack_height - height] = self._set_bit(self.red_towers[stack_height - height], from_x, from_y)
-            
-            # Calculate new height at destination
-            dest_height = self.get_stack_height(to_x, to_y)
-            new_height = height
-            
-            # If destination already has pieces of the same player, add heights
-            if dest_height > 0 and self.get_stack_owner(to_x, to_y) == 1:
-                new_height += dest_height
-                # Clear the destination's old height
-                self.red_towers[dest_height] = self._clear_bit(self.red_towers[dest_height], to_x, to_y)
-            
-            # Set the new height at destination
-            self.red_towers[new_height] = self._set_bit(self.red_towers[new_height], to_x, to_y)
-        else:  # Blue towers
-            # Clear the source position in the original height bitboard
-            self.blue_towers[stack_height] = self._clear_bit(self.blue_towers[stack_height], from_x, from_y)
-            
-            # If not moving all pieces, update the source with remaining pieces
-            if height < stack_height:
-                self.blue_towers[stack_height - height] = self._set_bit(self.blue_towers[stack_height - height], from_x, from_y)
-            
-            # Calculate new height at destination
-            dest_height = self.get_stack_height(to_x, to_y)
-            new_height = height
-            
-            # If destination already has pieces of the same player, add heights
-            if dest_height > 0 and self.get_stack_owner(to_x, to_y) == 2:
-                new_height += dest_height
-                # Clear the destination's old height
-                self.blue_towers[dest_height] = self._clear_bit(self.blue_towers[dest_height], to_x, to_y)
-            
-            # Set the new height at destination
-            self.blue_towers[new_height] = self._set_bit(self.blue_towers[new_height], to_x, to_y)
+        # Clear the source position in the original height bitboard
+        self._toggle(owner, stack_height, from_sq)
+        
+        # If not moving all pieces, update the source with remaining pieces
+        if height < stack_height:
+            self._toggle(owner, stack_height - height, from_sq)
+        
+        # Calculate new height at destination
+        dest_height = self.get_stack_height(to_x, to_y)
+        new_height = height
+        
+        # If destination already has pieces of the same player, add heights
+        if dest_height > 0 and self.get_stack_owner(to_x, to_y) == owner:
+            new_height += dest_height
+            # Clear the destination's old height
+            self._toggle(owner, dest_height, to_sq)
+        
+        # Set the new height at destination
+        self._toggle(owner, new_height, to_sq)
     
     def capture_piece(self, pos: Tuple[int, int]) -> None:
         """Remove a piece at the given position (for captures)"""
@@ -207,17 +260,142 @@ class BitboardBoard:
             return  # Nothing to capture
         
         if piece_type == PieceType.WAECHTER:
-            if owner == 1:  # Red guardian
-                self.red_guardian = self._clear_bit(self.red_guardian, x, y)
-            else:  # Blue guardian
-                self.blue_guardian = self._clear_bit(self.blue_guardian, x, y)
+            self._toggle(owner, 0, self._pos_to_bitpos(x, y))
         else:  # Tower
             height = self.get_stack_height(x, y)
-            if owner == 1:  # Red tower
-                self.red_towers[height] = self._clear_bit(self.red_towers[height], x, y)
-            else:  # Blue tower
-                self.blue_towers[height] = self._clear_bit(self.blue_towers[height], x, y)
-    
+            self._toggle(owner, height, self._pos_to_bitpos(x, y))
+
+    def occupied(self) -> int:
+        """Bitboard of all occupied squares"""
+        red = self.red_towers
+        blue = self.blue_towers
+        return (self.red_guardian | self.blue_guardian
+                | red[1] | red[2] | red[3] | red[4] | red[5] | red[6] | red[7]
+                | blue[1] | blue[2] | blue[3] | blue[4] | blue[5] | blue[6] | blue[7])
+
+    def _toggle(self, player: int, code: int, sq: int) -> None:
+        """Flip one piece code on bit position sq (code 0 = Guardian, 1-7 = tower height)"""
+        bit = 1 << sq
+        self.hash ^= PIECE_KEYS[player][code][sq]
+        if code == 0:
+            if player == 1:
+                self.red_guardian ^= bit
+                added = self.red_guardian & bit
+            else:
+                self.blue_guardian ^= bit
+                added = self.blue_guardian & bit
+            self.center_bonus[player] = 6 - CENTER_DISTANCE[sq] if added else 0
+        else:
+            towers = self.red_towers if player == 1 else self.blue_towers
+            towers[code] ^= bit
+            added = towers[code] & bit
+            self.tower_height[player] += code if added else -code
+        
+        sign = 1 if added else -1
+        self.stack_count[player] += sign
+        if bit & HALF_MASK[3 - player]:
+            self.intruders[player] += sign
+
+    def compute_hash(self, current_player: int) -> int:
+        """Recompute the Zobrist key from scratch (for checking the incremental key)"""
+        key = SIDE_KEY if current_player == 2 else 0
+        for sq in range(self.SIZE * self.SIZE):
+            owner, code = self._piece_at(sq)
+            if owner is not None:
+                key ^= PIECE_KEYS[owner][code][sq]
+        return key
+
+    def compute_eval_terms(self) -> Tuple[List[int], List[int], List[int], List[int]]:
+        """
+        Recompute (stack_count, tower_height, intruders, center_bonus) from scratch
+        (for checking the incrementally updated values)
+        """
+        stack_count = [0, 0, 0]
+        tower_height = [0, 0, 0]
+        intruders = [0, 0, 0]
+        center_bonus = [0, 0, 0]
+        for player, guardian, towers in ((1, self.red_guardian, self.red_towers),
+                                         (2, self.blue_guardian, self.blue_towers)):
+            pieces = guardian
+            for h in range(1, 8):
+                pieces |= towers[h]
+                tower_height[player] += h * popcount(towers[h])
+            stack_count[player] = popcount(pieces)
+            intruders[player] = popcount(pieces & HALF_MASK[3 - player])
+            if guardian:
+                center_bonus[player] = 6 - CENTER_DISTANCE[guardian.bit_length() - 1]
+        return stack_count, tower_height, intruders, center_bonus
+
+    def _piece_at(self, sq: int) -> Tuple[Optional[int], int]:
+        """Return (owner, piece code) on bit position sq, or (None, 0) if the square is empty"""
+        bit = 1 << sq
+        if self.red_guardian & bit:
+            return 1, 0
+        if self.blue_guardian & bit:
+            return 2, 0
+        red_towers = self.red_towers
+        blue_towers = self.blue_towers
+        for h in range(1, 8):
+            if red_towers[h] & bit:
+                return 1, h
+            if blue_towers[h] & bit:
+                return 2, h
+        return None, 0
+
+    def make(self, from_sq: int, to_sq: int, height: int) -> UndoRecord:
+        """
+        Play a move given as bit positions and return the record needed to take it back.
+
+        Unlike move_stack, this also removes a captured enemy stack on the destination.
+        The move itself is not validated - it is meant for moves from the move generator.
+        """
+        player, source_code = self._piece_at(from_sq)
+        if player is None or (source_code and source_code < height):
+            raise ValueError("Invalid move: source stack cannot be moved")
+        target_player, target_code = self._piece_at(to_sq)
+
+        if target_player is None:
+            undo = UndoRecord(from_sq, to_sq, height, player, source_code, None, 0, 0)
+        elif target_player != player:
+            undo = UndoRecord(from_sq, to_sq, height, player, source_code, target_player, target_code, 0)
+            self._toggle(target_player, target_code, to_sq)
+        else:
+            undo = UndoRecord(from_sq, to_sq, height, player, source_code, None, 0, target_code)
+
+        # Lift the pieces off the source square, leaving the rest of a split stack behind
+        self._toggle(player, source_code, from_sq)
+        if source_code > height:
+            self._toggle(player, source_code - height, from_sq)
+
+        # Put them down on the destination, merging with an own stack if there is one
+        if source_code == 0:
+            self._toggle(player, 0, to_sq)
+        else:
+            if undo.dest_height:
+                self._toggle(player, undo.dest_height, to_sq)
+            self._toggle(player, undo.dest_height + height, to_sq)
+        return undo
+
+    def unmake(self, undo: UndoRecord) -> None:
+        """Take back a move played with make, restoring the board exactly"""
+        player = undo.player
+        from_sq = undo.from_sq
+        to_sq = undo.to_sq
+
+        if undo.source_code == 0:
+            self._toggle(player, 0, to_sq)
+        else:
+            self._toggle(player, undo.dest_height + undo.height, to_sq)
+            if undo.dest_height:
+                self._toggle(player, undo.dest_height, to_sq)
+
+        if undo.source_code > undo.height:
+            self._toggle(player, undo.source_code - undo.height, from_sq)
+        self._toggle(player, undo.source_code, from_sq)
+
+        if undo.captured_player is not None:
+            self._toggle(undo.captured_player, undo.captured_code, to_sq)
+
     def print_board(self) -> None:
         """Print a text representation of the board"""
         print("  A B C D E F G")
@@ -288,29 +466,4 @@ class BitboardBoard:
         """Create a BitboardBoard from a FEN string and return it with the current player"""
         from core.fen import FenParser
         parser = FenParser()
-        board, current_player = parser.parse_fen(fen_str)
-        
-        # Convert the regular board to a bitboard
-        bitboard = cls(setup_initial=False)
-        
-        for y in range(bitboard.SIZE):
-            for x in range(bitboard.SIZE):
-                stack = board.get_stack(x, y)
-                if not stack:
-                    continue
-                
-                top_piece = stack[-1]
-                height = len(stack)
-                
-                if top_piece.piece_type == PieceType.WAECHTER:
-                    if top_piece.player == 1:  # Red guardian
-                        bitboard.red_guardian = bitboard._set_bit(bitboard.red_guardian, x, y)
-                    else:  # Blue guardian
-                        bitboard.blue_guardian = bitboard._set_bit(bitboard.blue_guardian, x, y)
-                else:  # Tower
-                    if top_piece.player == 1:  # Red tower
-                        bitboard.red_towers[height] = bitboard._set_bit(bitboard.red_towers[height], x, y)
-                    else:  # Blue tower
-                        bitboard.blue_towers[height] = bitboard._set_bit(bitboard.blue_towers[height], x, y)
-        
-        return bitboard, current_player 
\ No newline at end of file
+        return parser.parse_fen(fen_str) 
\ No newline at end of file
@@ -1,76 +1,91 @@
 from typing import List, Tuple, Optional
 from .piece import PieceType
-from .bitboard import BitboardBoard
+from .bitboard import BitboardBoard, UndoRecord, popcount
+from .zobrist import SIDE_KEY
+from .move import MOVE_CAPTURE, MOVE_STACK, MOVE_GUARDIAN, new_move_buffer
+
+# Recompute the Zobrist key after every make/unmake and compare (slow, for debugging)
+DEBUG_HASH = False
+
+BOARD_SIZE = 7
+NUM_SQUARES = BOARD_SIZE * BOARD_SIZE
+CENTER_SQUARE = (BOARD_SIZE // 2) * BOARD_SIZE + BOARD_SIZE // 2  # D4, where a Guardian wins
+
+# Vectors for moving in 4 directions
+# Note: I'm using clockwise order because it's easier to remember
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]  # Down, Right, Up, Left
+
+
+def _build_lookup_tables():
+    """
+    Build the move and path tables once per process.
+
+    Squares are bit positions (y * 7 + x) and all masks are plain ints, so a
+    path check is a single `occupied & BETWEEN[from_sq][to_sq]`.
+    """
+    # BETWEEN[from_sq][to_sq]: squares strictly between two squares on a line, 0 otherwise
+    between = [[0] * NUM_SQUARES for _ in range(NUM_SQUARES)]
+    # DEST_MASKS[sq][dist][dir]: bit of the square dist steps away in direction dir, 0 if off the board
+    dest_masks = [[[0] * len(DIRECTIONS) for _ in range(8)] for _ in range(NUM_SQUARES)]
+    # MOVE_TARGETS[sq][dist]: (to_sq, between mask) for every on-board destination dist steps away
+    move_targets = [[[] for _ in range(8)] for _ in range(NUM_SQUARES)]
+
+    for y in range(BOARD_SIZE):
+        for x in range(BOARD_SIZE):
+            sq = y * BOARD_SIZE + x
+            for d, (dx, dy) in enumerate(DIRECTIONS):
+                path = 0
+                for dist in range(1, 8):
+                    nx, ny = x + dx * dist, y + dy * dist
+                    if not (0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE):
+                        break
+                    to_sq = ny * BOARD_SIZE + nx
+                    between[sq][to_sq] = path
+                    dest_masks[sq][dist][d] = 1 << to_sq
+                    move_targets[sq][dist].append((to_sq, path))
+                    path |= 1 << to_sq
+
+    return between, dest_masks, move_targets
+
+
+BETWEEN, DEST_MASKS, MOVE_TARGETS = _build_lookup_tables()
+
+# (x, y) coordinates of every bit position, shared by all generated moves
+SQUARE_POS = [(sq % BOARD_SIZE, sq // BOARD_SIZE) for sq in range(NUM_SQUARES)]
+
+# Masks for shifting whole bitboards by one step. Shifting left/right moves bits across
+# the edge of a row, so the squares that would only be reached by wrapping are masked off.
+FULL_BOARD = (1 << NUM_SQUARES) - 1
+FILE_A = sum(1 << (y * BOARD_SIZE) for y in range(BOARD_SIZE))
+FILE_G = FILE_A << (BOARD_SIZE - 1)
+# (bit offset of one step, mask of valid landing squares) in DIRECTIONS order
+DIRECTION_SHIFTS = [
+    (BOARD_SIZE, FULL_BOARD),       # Down
+    (1, FULL_BOARD & ~FILE_A),      # Right
+    (-BOARD_SIZE, FULL_BOARD),      # Up
+    (-1, FULL_BOARD & ~FILE_G),     # Left
+]
+
+# Squares a Guardian can step onto the center from
+CENTER_NEIGHBORS = sum((1 << (CENTER_SQUARE + offset)) & landing_mask for offset, landing_mask in DIRECTION_SHIFTS)
+
+# Move generators BitboardRules can use for get_legal_moves
+MOVE_GENERATORS = ('turbo', 'bitparallel')
+DEFAULT_GENERATOR = 'bitparallel'
+
 
 class BitboardRules:
     """Rules implementation for Turm & Wächter game using bitboard representation."""
     
-    def __init__(self, board: BitboardBoard):
+    def __init__(self, board: BitboardBoard, generator: str = DEFAULT_GENERATOR):
+        if generator not in MOVE_GENERATORS:
+            raise ValueError(f"Unknown move generator '{generator}', expected one of {MOVE_GENERATORS}")
         self.board = board
+        self.generator = generator  # Which implementation get_legal_moves uses
         self.current_player = 1  # Red starts by default
         self.game_over = False
         self.winner = None
-        
-        self._init_lookup_tables()
-    
-    def _init_lookup_tables(self):
-        """Initialize lookup tables for fast move generation."""
-        BOARD_SIZE = 7  # Board size
-        
-        # Create lookup tables for moves and paths
-        self._move_lookup = {}
-        
-        # Vectors for moving in 4 directions
-        # Note: I'm using clockwise order because it's easier to remember
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]  # Down, Right, Up, Left
-        
-        # For each position on the board
-        for y in range(BOARD_SIZE):
-            for x in range(BOARD_SIZE):
-                start_pos = (x, y)
-                self._move_lookup[start_pos] = {}
-                
-                # For each possible distance
-                for dist in range(1, 8):
-                    self._move_lookup[start_pos][dist] = []
-                    
-                    # Try all directions
-                    for dx, dy in directions:
-                        nx, ny = x + dx * dist, y + dy * dist
-                        
-                        # Check if valid position
-                        if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
-                            self._move_lookup[start_pos][dist].append((nx, ny))
-        
-        # Paths between positions (for checking if a move jumps over pieces)
-        # This is kind of expensive but saves time during move generation
-        self._path_lookup = {}
-        
-        for y1 in range(BOARD_SIZE):
-            for x1 in range(BOARD_SIZE):
-                from_pos = (x1, y1)
-                self._path_lookup[from_pos] = {}
-                
-                for y2 in range(BOARD_SIZE):
-                    for x2 in range(BOARD_SIZE):
-                        to_pos = (x2, y2)
-                        
-                        # Skip if same pos or diagonal (not orthogonal)
-                        if from_pos == to_pos or (x1 != x2 and y1 != y2):
-                            continue
-                        
-                        path = []
-                        dx = 0 if x1 == x2 else (1 if x2 > x1 else -1)
-                        dy = 0 if y1 == y2 else (1 if y2 > y1 else -1)
-                        
-                        # Find squares in the path
-                        cx, cy = x1 + dx, y1 + dy
-                        while (cx, cy) != to_pos:
-                            path.append((cx, cy))
-                            cx += dx
-                            cy += dy
-                        
-                        self._path_lookup[from_pos][to_pos] = path
+        self.undo_stack: List[UndoRecord] = []  # Records of moves played with make()
     
     # Helper function for checking valid moves
     def is_valid_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], height: int) -> bool:
@@ -105,20 +120,11 @@ class BitboardRules:
         if move_distance != height:
             return False
         
-        # Check for obstacles in the path
-        step_x = 0 if dx == 0 else (1 if dx > 0 else -1)
-        step_y = 0 if dy == 0 else (1 if dy > 0 else -1)
-        
-        # Start checking from one step away from the origin
-        current_x, current_y = from_x + step_x, from_y + step_y
-        
-        # Check each square in the path except the destination
-        while (current_x, current_y) != (to_x, to_y):
-            if self.board.get_stack_height(current_x, current_y) > 0:
-                # Found an obstacle in the path
-                return False
-            current_x += step_x
-            current_y += step_y
+        # Check for obstacles in the path (every square except the destination)
+        from_sq = from_y * BOARD_SIZE + from_x
+        to_sq = to_y * BOARD_SIZE + to_x
+        if self.board.occupied() & BETWEEN[from_sq][to_sq]:
+            return False
         
         return True
     
@@ -189,9 +195,10 @@ class BitboardRules:
         return True
     
     def get_legal_moves(self, player: int) -> List[Tuple[Tuple[int, int], Tuple[int, int], int]]:
-        """Get all legal moves for a player using the fastest available algorithm."""
-        # Use the implementation below
-        return self.get_legal_moves_turbo(player)
+        """Get all legal moves for a player using the selected move generator."""
+        if self.generator == 'turbo':
+            return self.get_legal_moves_turbo(player)
+        return self.get_legal_moves_bitparallel(player)
     
     def get_legal_moves_turbo(self, player: int) -> List[Tuple[Tuple[int, int], Tuple[int, int], int]]:
         """Fast move generator using precomputed lookup tables and bitwise ops"""
@@ -209,16 +216,7 @@ class BitboardRules:
         enemy_towers = board.blue_towers if player == 1 else board.red_towers
         
         # Combine all occupied squares into a single bitboard
-        occupied = 0
-        occupied |= board.red_guardian | board.blue_guardian
-        # Add tower positions for heights 1-4
-        occupied |= board.red_towers[1] | board.blue_towers[1]
-        occupied |= board.red_towers[2] | board.blue_towers[2]
-        occupied |= board.red_towers[3] | board.blue_towers[3]
-        occupied |= board.red_towers[4] | board.blue_towers[4]
-        # Higher heights are less common but still need to be included
-        for h in range(5, 8):
-            occupied |= board.red_towers[h] | board.blue_towers[h]
+        occupied = board.occupied()
         
         # First handle guardian - they're special since they always move 1 square
         if my_guardian:  # If guardian exists
@@ -229,7 +227,7 @@ class BitboardRules:
                         pos = (x, y)
                         
                         # Try each direction (up/right/down/left)
-                        for dx, dy in [(0, -1), (1, 0), (0, 1), (-1, 0)]:  # Different order than _init_lookup_tables
+                        for dx, dy in [(0, -1), (1, 0), (0, 1), (-1, 0)]:  # Different order than DIRECTIONS
                             nx, ny = x + dx, y + dy
                             
                             # Make sure we're on the board
@@ -269,41 +267,21 @@ class BitboardRules:
                         continue
                     
                     start = (x, y)
+                    start_sq = y * boardSize + x
                     
                     # Try each possible height (can move 1 to h squares)
                     for move_h in range(1, h + 1):
-                        # Where can we go?
-                        for end in self._move_lookup[start][move_h]:
-                            tx, ty = end
-                            
+                        # Where can we go? Each target comes with the squares we'd pass over
+                        for end_sq, path in MOVE_TARGETS[start_sq][move_h]:
                             # Check for obstacles (can't jump over pieces)
-                            path = self._path_lookup[start][end]
-                            blocked = False
-                            
-                            # Special case for short paths
-                            if len(path) == 1:
-                                # Just one square in between
-                                square = path[0]
-                                px, py = square
-                                pidx = py * boardSize + px
-                                if occupied & (1 << pidx):
-                                    blocked = True
-                            elif len(path) > 1:
-                                # Multiple squares to check
-                                for mid_x, mid_y in path:
-                                    mid_idx = mid_y * boardSize + mid_x
-                                    if occupied & (1 << mid_idx):
-                                        blocked = True
-                                        break
-                            
-                            if blocked:
+                            if occupied & path:
                                 continue
                             
-                            # Check destination
-                            dest_idx = ty * boardSize + tx
+                            tx, ty = end_sq % boardSize, end_sq // boardSize
+                            end = (tx, ty)
                             
                             # Empty square - free to move
-                            if not (occupied & (1 << dest_idx)):
+                            if not (occupied & (1 << end_sq)):
                                 result.append((start, end, move_h))
                                 continue
                             
@@ -328,56 +306,258 @@ class BitboardRules:
         
         return result
     
-    def make_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], height: int) -> bool:
-        """Execute a move if valid and check win conditions."""
-        if not self.is_valid_move(from_pos, to_pos, height):
-            return False
-        
-        from_x, from_y = from_pos
-        to_x, to_y = to_pos
+    def get_legal_moves_bitparallel(self, player: int) -> List[Tuple[Tuple[int, int], Tuple[int, int], int]]:
+        """Bit-parallel move generator (see generate_moves), returning moves as coordinate tuples."""
+        buffer = new_move_buffer()
+        count = self.generate_moves(player, buffer)
+        return [(SQUARE_POS[m & 0x3F], SQUARE_POS[(m >> 6) & 0x3F], (m >> 12) & 0x7) for m in buffer[:count]]
+    
+    def generate_moves(self, player: int, buffer) -> int:
+        """
+        Move generator working on whole bitboards at once.
         
-        target_owner = self.board.get_stack_owner(to_x, to_y)
-        moving_piece_type = self.board.get_top_piece_type(from_x, from_y)
+        For every tower height, direction and distance, the destinations of all towers
+        of that height are found with one masked shift of their bitboard. Squares are
+        only turned into moves at the very end.
         
-        # Handle capture
-        if target_owner is not None and target_owner != self.current_player:
-            target_piece_type = self.board.get_top_piece_type(to_x, to_y)
-            
-            # Check if capturing opponent's Watcher (win condition)
-            if target_piece_type == PieceType.WAECHTER:
-                self.game_over = True
-                self.winner = self.current_player
+        Args:
+            player: Player to generate moves for
+            buffer: Preallocated move buffer (core.move.new_move_buffer) that receives packed moves
             
-            # Remove the captured piece
-            self.board.capture_piece(to_pos)
-            
-            # Execute the move
-            self.board.move_stack(from_pos, to_pos, height)
+        Returns:
+            Number of moves written to the buffer
+        """
+        return self._generate(player, buffer, True, True)
+    
+    def generate_captures(self, player: int, buffer) -> int:
+        """Like generate_moves, but only moves that capture an enemy piece."""
+        return self._generate(player, buffer, True, False)
+    
+    def generate_quiets(self, player: int, buffer) -> int:
+        """Like generate_moves, but only moves to empty squares and onto own towers."""
+        return self._generate(player, buffer, False, True)
+    
+    def generate_tactical(self, player: int, buffer) -> int:
+        """
+        Like generate_captures, plus the Guardian stepping onto an empty center square.
+        
+        These are the moves that change material or end the game, as searched by
+        the quiescence search.
+        """
+        n = self._generate(player, buffer, True, False)
+        board = self.board
+        guardian = board.red_guardian if player == 1 else board.blue_guardian
+        if guardian & CENTER_NEIGHBORS and not board.occupied() >> CENTER_SQUARE & 1:
+            sources = guardian & CENTER_NEIGHBORS
+            while sources:
+                bit = sources & -sources
+                sources ^= bit
+                buffer[n] = (bit.bit_length() - 1) | CENTER_SQUARE << 6 | 1 << 12 | MOVE_GUARDIAN
+                n += 1
+        return n
+    
+    def count_moves(self, player: int) -> int:
+        """
+        Number of moves generate_moves would produce, without writing any of them.
         
-        # Handle stacking (move to friendly tower)
-        elif target_owner == self.current_player:
-            # Execute the move (will handle stacking)
-            self.board.move_stack(from_pos, to_pos, height)
+        Uses the same masked shifts, but only counts the destination bits, which is
+        all a perft needs at the last ply.
+        """
+        board = self.board
+        if player == 1:
+            my_guardian, my_towers = board.red_guardian, board.red_towers
+            enemy_guardian, enemy_towers = board.blue_guardian, board.blue_towers
+        else:
+            my_guardian, my_towers = board.blue_guardian, board.blue_towers
+            enemy_guardian, enemy_towers = board.red_guardian, board.red_towers
+        
+        my_stacks = (my_towers[1] | my_towers[2] | my_towers[3] | my_towers[4]
+                     | my_towers[5] | my_towers[6] | my_towers[7])
+        capturable = [enemy_guardian] * 8
+        for s in range(1, 8):
+            capturable[s] = capturable[s - 1] | enemy_towers[s]
+        empty = ~(my_guardian | my_stacks | capturable[7]) & FULL_BOARD
+        
+        n = 0
+        if my_guardian:
+            guardian_targets = empty | capturable[7]
+            for offset, landing_mask in DIRECTION_SHIFTS:
+                n += popcount((my_guardian << offset if offset > 0 else my_guardian >> -offset)
+                              & landing_mask & guardian_targets)
+        
+        for h in range(1, 8):
+            towers = my_towers[h]
+            if not towers:
+                continue
+            for offset, landing_mask in DIRECTION_SHIFTS:
+                front = towers
+                for s in range(1, h + 1):
+                    front = (front << offset if offset > 0 else front >> -offset) & landing_mask
+                    if not front:
+                        break
+                    n += popcount(front & (empty | capturable[s] | my_stacks))
+                    front &= empty
+        
+        return n
+    
+    def _generate(self, player: int, buffer, captures: bool, quiets: bool) -> int:
+        """Shared implementation of the generate_* methods."""
+        board = self.board
+        n = 0
         
-        # Handle normal move to empty space
+        if player == 1:
+            my_guardian, my_towers = board.red_guardian, board.red_towers
+            enemy_guardian, enemy_towers = board.blue_guardian, board.blue_towers
         else:
-            # Execute the move
-            self.board.move_stack(from_pos, to_pos, height)
+            my_guardian, my_towers = board.blue_guardian, board.blue_towers
+            enemy_guardian, enemy_towers = board.red_guardian, board.red_towers
+        
+        my_stacks = (my_towers[1] | my_towers[2] | my_towers[3] | my_towers[4]
+                     | my_towers[5] | my_towers[6] | my_towers[7])
+        
+        # capturable[s]: enemy pieces a tower moving s pieces may land on
+        # (the guardian and every enemy tower of height <= s)
+        capturable = [enemy_guardian] * 8
+        for s in range(1, 8):
+            capturable[s] = capturable[s - 1] | enemy_towers[s]
+        enemy = capturable[7]
+        empty = ~(my_guardian | my_stacks | enemy) & FULL_BOARD
+        
+        # Captures are driven by the enemy occupancy, so without enemy pieces there are none
+        if not enemy:
+            captures = False
+            if not quiets:
+                return 0
+        
+        # The guardian moves one square onto empty squares or any enemy piece. A board
+        # from a FEN may have more than one, so every guardian bit is moved, like the towers.
+        if my_guardian:
+            guardian_targets = (empty if quiets else 0) | (enemy if captures else 0)
+            for offset, landing_mask in DIRECTION_SHIFTS:
+                dests = (my_guardian << offset if offset > 0 else my_guardian >> -offset) & landing_mask & guardian_targets
+                while dests:
+                    bit = dests & -dests
+                    dests ^= bit
+                    to_sq = bit.bit_length() - 1
+                    buffer[n] = ((to_sq - offset) | to_sq << 6 | 1 << 12 | MOVE_GUARDIAN
+                                 | (MOVE_CAPTURE if bit & enemy else 0))
+                    n += 1
+        
+        # Towers land on empty squares, capturable enemy pieces or their own towers
+        for h in range(1, 8):
+            towers = my_towers[h]
+            if not towers:
+                continue
+            for offset, landing_mask in DIRECTION_SHIFTS:
+                front = towers
+                for s in range(1, h + 1):
+                    # Advance every tower that still has a clear path by one step
+                    front = (front << offset if offset > 0 else front >> -offset) & landing_mask
+                    if not front:
+                        break
+                    back = offset * s
+                    if quiets and captures:
+                        targets = ((front & empty, 0),
+                                   (front & capturable[s], MOVE_CAPTURE),
+                                   (front & my_stacks, MOVE_STACK))
+                    elif captures:
+                        targets = ((front & capturable[s], MOVE_CAPTURE),)
+                    else:
+                        targets = ((front & empty, 0),
+                                   (front & my_stacks, MOVE_STACK))
+                    for dests, flags in targets:
+                        while dests:
+                            bit = dests & -dests
+                            dests ^= bit
+                            to_sq = bit.bit_length() - 1
+                            buffer[n] = (to_sq - back) | to_sq << 6 | s << 12 | flags
+                            n += 1
+                    # Only towers that moved onto an empty square can go further
+                    front &= empty
+        
+        return n
+    
+    def make_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], height: int) -> bool:
+        """Execute a move if valid and check win conditions."""
+        if not self.is_valid_move(from_pos, to_pos, height):
+            return False
+        
+        # Captures, stacking and the win conditions are all handled by make()
+        self.make(from_pos, to_pos, height)
+        
+        return True
+    
+    def make(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], height: int) -> UndoRecord:
+        """
+        Play a generated move without validating it and return its undo record.
+        
+        The record is also pushed on undo_stack; pass it to unmake() to take the move back.
+        This is the in-place alternative to copying the board for every searched move.
+        """
+        size = self.board.SIZE
+        return self._make(from_pos[1] * size + from_pos[0], to_pos[1] * size + to_pos[0], height)
+    
+    def make_encoded(self, move: int) -> UndoRecord:
+        """Like make(), for a packed move from generate_moves (see core/move.py)."""
+        return self._make(move & 0x3F, (move >> 6) & 0x3F, (move >> 12) & 0x7)
+    
+    def _make(self, from_sq: int, to_sq: int, height: int) -> UndoRecord:
+        board = self.board
+        undo = board.make(from_sq, to_sq, height)
         
-        # Check center field win condition
-        center_x, center_y = self.board.SIZE // 2, self.board.SIZE // 2
-        center_owner = self.board.get_stack_owner(center_x, center_y)
-        center_piece_type = self.board.get_top_piece_type(center_x, center_y)
+        # Remember the game state so unmake can restore it
+        undo.game_over = self.game_over
+        undo.winner = self.winner
+        undo.current_player = self.current_player
         
-        if (center_owner == self.current_player and 
-            center_piece_type == PieceType.WAECHTER):
+        # Capturing the opponent's Watcher wins, and so does moving your own Watcher to the center
+        if ((undo.captured_player is not None and undo.captured_code == 0) or
+                (undo.source_code == 0 and undo.to_sq == CENTER_SQUARE)):
             self.game_over = True
-            self.winner = self.current_player
+            self.winner = undo.player
         
         # Switch player
         self.current_player = 3 - self.current_player  # Toggle between 1 and 2
+        board.hash ^= SIDE_KEY
+        self.undo_stack.append(undo)
         
-        return True
+        if DEBUG_HASH:
+            assert self.verify_hash(), f"Zobrist key out of sync after {undo}"
+        return undo
+    
+    def make_null(self) -> UndoRecord:
+        """
+        Pass the turn without moving a piece (a null move, used for pruning in the search).
+        
+        The record goes on undo_stack like any other move and is taken back with unmake().
+        """
+        undo = UndoRecord(-1, -1, 0, self.current_player, -1, None, 0, 0)
+        undo.game_over = self.game_over
+        undo.winner = self.winner
+        undo.current_player = self.current_player
+        self.current_player = 3 - self.current_player
+        self.board.hash ^= SIDE_KEY
+        self.undo_stack.append(undo)
+        return undo
+    
+    def unmake(self, undo: UndoRecord) -> None:
+        """Take back the last move played with make() or make_null()."""
+        if not self.undo_stack or self.undo_stack[-1] is not undo:
+            raise ValueError("Can only unmake the most recent move")
+        self.undo_stack.pop()
+        if undo.height:
+            self.board.unmake(undo)
+        self.board.hash ^= SIDE_KEY
+        self.game_over = undo.game_over
+        self.winner = undo.winner
+        self.current_player = undo.current_player
+        
+        if DEBUG_HASH:
+            assert self.verify_hash(), f"Zobrist key out of sync after undoing {undo}"
+    
+    def verify_hash(self) -> bool:
+        """Check the incrementally updated Zobrist key against a full recomputation."""
+        return self.board.hash == self.board.compute_hash(self.current_player)
     
     def is_game_over(self) -> bool:
         """Check if the game is over."""
@@ -385,4 +565,79 @@ class BitboardRules:
     
     def get_winner(self) -> Optional[int]:
         """Get the winner if the game is over."""
-        return self.winner if self.game_over else None 
\ No newline at end of file
+        return self.winner if self.game_over else None 
+
+class AttackMap:
+    """
+    Squares one side can attack, computed for the whole board at once by attack_map().
+    
+    Attributes:
+        guardian: Squares the side's Guardian can step on
+        reach: reach[h] holds the squares a tower move of at least h pieces can arrive
+               on over a clear path (reach[1] is every square any tower move reaches)
+        captures: Enemy pieces that can be captured right now
+    """
+    __slots__ = ('guardian', 'reach', 'captures')
+    
+    def __init__(self, guardian: int, reach: List[int], captures: int):
+        self.guardian = guardian
+        self.reach = reach
+        self.captures = captures
+    
+    def max_height(self, sq: int) -> int:
+        """Largest number of tower pieces that can arrive on bit position sq (0 if none)"""
+        bit = 1 << sq
+        for h in range(7, 0, -1):
+            if self.reach[h] & bit:
+                return h
+        return 0
+
+
+def attack_map(board: BitboardBoard, player: int) -> AttackMap:
+    """
+    Compute everything `player` attacks in one pass over the board.
+    
+    A tower of height t can move s <= t pieces exactly s squares, so the towers of
+    each height are shifted step by step like in the bit-parallel move generator.
+    A capture of an enemy tower of height e needs a move of at least e pieces,
+    which makes it a mask comparison: enemy_towers[e] & reach[e].
+    """
+    if player == 1:
+        my_guardian, my_towers = board.red_guardian, board.red_towers
+        enemy_guardian, enemy_towers = board.blue_guardian, board.blue_towers
+    else:
+        my_guardian, my_towers = board.blue_guardian, board.blue_towers
+        enemy_guardian, enemy_towers = board.red_guardian, board.red_towers
+    
+    empty = ~board.occupied() & FULL_BOARD
+    
+    # arrivals[s]: squares reached by moving exactly s pieces
+    arrivals = [0] * 8
+    guardian = 0
+    for offset, landing_mask in DIRECTION_SHIFTS:
+        if my_guardian:
+            guardian |= (my_guardian << offset if offset > 0 else my_guardian >> -offset) & landing_mask
+        for h in range(1, 8):
+            front = my_towers[h]
+            for s in range(1, h + 1):
+                if not front:
+                    break
+                front = (front << offset if offset > 0 else front >> -offset) & landing_mask
+                arrivals[s] |= front
+                front &= empty
+    
+    # reach[h]: squares reached by moving at least h pieces
+    reach = [0] * 9
+    for h in range(7, 0, -1):
+        reach[h] = reach[h + 1] | arrivals[h]
+    del reach[8]
+    
+    enemy = enemy_guardian
+    captures = enemy_guardian & reach[1]
+    for e in range(1, 8):
+        enemy |= enemy_towers[e]
+        captures |= enemy_towers[e] & reach[e]
+    # The Guardian captures anything next to it
+    captures |= guardian & enemy
+    
+    return AttackMap(guardian, reach, captures)
@@ -1,6 +1,7 @@
 from typing import List, Tuple, Dict, Optional
 from .piece import PieceType
 from .bitboard import BitboardBoard
+from .zobrist import SIDE_KEY
 
 class FenParser:
     """Parser for Turm & Wächter FEN notation.
@@ -41,12 +42,12 @@ class FenParser:
             while i < len(row) and x < board.SIZE:
                 # Check for RG (Red Guard)
                 if i + 1 < len(row) and row[i:i+2] == "RG":
-                    board.red_guardian = board._set_bit(board.red_guardian, x, y)
+                    board._toggle(1, 0, board._pos_to_bitpos(x, y))
                     i += 2
                     x += 1
                 # Check for BG (Blue Guard)
                 elif i + 1 < len(row) and row[i:i+2] == "BG":
-                    board.blue_guardian = board._set_bit(board.blue_guardian, x, y)
+                    board._toggle(2, 0, board._pos_to_bitpos(x, y))
                     i += 2
                     x += 1
                 # Check for tower pieces (r1-r7, b1-b7)
@@ -56,10 +57,7 @@ class FenParser:
                     
                     # Tower height should be between 1 and 7
                     if 1 <= height <= 7:
-                        if player == 1:  # Red tower
-                            board.red_towers[height] = board._set_bit(board.red_towers[height], x, y)
-                        else:  # Blue tower
-                            board.blue_towers[height] = board._set_bit(board.blue_towers[height], x, y)
+                        board._toggle(player, height, board._pos_to_bitpos(x, y))
                     
                     i += 2
                     x += 1
@@ -71,6 +69,10 @@ class FenParser:
                 else:
                     # Skip other characters
                     i += 1
+        
+        # The Zobrist key includes the side to move
+        if current_player == 2:
+            board.hash ^= SIDE_KEY
                     
         return board, current_player
         
@@ -0,0 +1,77 @@
+"""
+Compact integer move encoding for Turm & Wächter.
+
+A move is a plain int:
+    bits 0-5    from-square (bit position y * 7 + x)
+    bits 6-11   to-square
+    bits 12-14  number of pieces moved (1-7)
+    bit 15      MOVE_CAPTURE - lands on an enemy piece
+    bit 16      MOVE_STACK - lands on an own tower
+    bit 17      MOVE_GUARDIAN - the moving piece is a Guardian (Wächter)
+
+Moves need 18 bits, so move buffers use the unsigned 32-bit array type 'I'
+(array('H') would only hold 16). Algebraic notation ("A7-B7-1") is only
+produced at the edges, e.g. for command line output.
+"""
+from array import array
+from typing import List, Tuple
+
+MOVE_CAPTURE = 1 << 15
+MOVE_STACK = 1 << 16
+MOVE_GUARDIAN = 1 << 17
+
+# Upper bound on the number of legal moves in any position the FEN parser accepts.
+# A game never has more than 32 (a Guardian has 4, and the at most 7 tower pieces
+# of one side make at most 4 moves per piece), but a FEN may put a tower on every
+# square, and a square reaches at most the 12 others in its row and column.
+MAX_MOVES = 49 * 12
+
+# Maximum search depth buffers are allocated for
+MAX_PLY = 128
+
+SIZE = 7
+
+
+def encode_move(from_sq: int, to_sq: int, height: int, flags: int = 0) -> int:
+    """Pack a move into an int"""
+    return from_sq | (to_sq << 6) | (height << 12) | flags
+
+
+def move_from(move: int) -> int:
+    """From-square of a packed move"""
+    return move & 0x3F
+
+
+def move_to(move: int) -> int:
+    """To-square of a packed move"""
+    return (move >> 6) & 0x3F
+
+
+def move_height(move: int) -> int:
+    """Number of pieces moved by a packed move"""
+    return (move >> 12) & 0x7
+
+
+def move_to_tuple(move: int) -> Tuple[Tuple[int, int], Tuple[int, int], int]:
+    """Convert a packed move to ((from_x, from_y), (to_x, to_y), height)"""
+    from_sq = move & 0x3F
+    to_sq = (move >> 6) & 0x3F
+    return (from_sq % SIZE, from_sq // SIZE), (to_sq % SIZE, to_sq // SIZE), (move >> 12) & 0x7
+
+
+def move_to_str(move: int) -> str:
+    """Convert a packed move to algebraic notation, e.g. 'A7-B7-1'"""
+    from_sq = move & 0x3F
+    to_sq = (move >> 6) & 0x3F
+    return (f"{chr(ord('A') + from_sq % SIZE)}{SIZE - from_sq // SIZE}-"
+            f"{chr(ord('A') + to_sq % SIZE)}{SIZE - to_sq // SIZE}-{(move >> 12) & 0x7}")
+
+
+def new_move_buffer() -> array:
+    """A preallocated buffer large enough for the moves of any position"""
+    return array('I', [0]) * MAX_MOVES
+
+
+def new_move_buffers(max_ply: int = MAX_PLY) -> List[array]:
+    """One reusable move buffer per search ply"""
+    return [new_move_buffer() for _ in range(max_ply)]
@@ -0,0 +1,27 @@
+"""
+Zobrist keys for Turm & Wächter positions.
+
+Every (player, piece code, square) combination gets a random 64-bit number,
+and a position's key is the XOR of the numbers of all pieces on the board,
+plus SIDE_KEY when Blue is to move. Because XOR is its own inverse, a move
+only has to XOR out the pieces it removes and XOR in the pieces it places.
+
+Piece codes follow BitboardBoard: 0 is a Guardian (Wächter), 1-7 is a tower
+stack of that height.
+"""
+import random
+
+NUM_SQUARES = 49
+NUM_CODES = 8  # Guardian + tower heights 1-7
+
+# Fixed seed so keys (and anything derived from them) are identical between runs
+_rng = random.Random(0x7A5D_2E11)
+
+# PIECE_KEYS[player][code][square], index 0 for player is unused
+PIECE_KEYS = [
+    [[_rng.getrandbits(64) for _ in range(NUM_SQUARES)] for _ in range(NUM_CODES)]
+    for _ in range(3)
+]
+
+# XORed into the key when Blue (player 2) is to move
+SIDE_KEY = _rng.getrandbits(64)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Long-running engine process for Turm & Wächter with a UCI-style line protocol.
+
+Instead of starting an interpreter and parsing a FEN for every move, one
+engine process reads commands on stdin and answers on stdout. The
+transposition table and the current position stay in memory between
+moves, and a `position` command that only appends moves to the previous
+one just plays the new moves.
+
+Commands:
+    isready                                 -> readyok
+    ucinewgame                              Forget everything learned so far
+    setoption name Hash value MB            Transposition table size
+    setoption name Algorithm value NAME     alphabeta or pvs
+    position startpos [moves M1 M2 ...]
+    position fen FEN SIDE [moves M1 M2 ...]
+    go [movetime MS] [depth N]              -> info ... / bestmove MOVE (or "bestmove none"), N at most 64
+    legalmoves                              -> legalmoves M1 M2 ...
+    fen                                     -> fen FEN SIDE
+    result                                  -> result red|blue|none (none while the game goes on)
+    quit
+
+Moves are in algebraic notation, e.g. A7-B7-1.
+
+Usage:
+    python engine.py
+
+EngineClient runs the engine as a subprocess and wraps the protocol for
+demos and match tools.
+"""
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional, TextIO
+
+from core.bitboard_rules import BitboardRules
+from core.fen import FenParser
+from core.move import move_to_str, new_move_buffer
+from alpha_beta_ki import (AlphaBetaSearch, ALGORITHMS, DEFAULT_ALGORITHM, MAX_DEPTH, MAX_ITERATION_DEPTH,
+                           TT_SIZE_MB, parse_move)
+from transposition_table import TranspositionTable
+
+START_FEN = "r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r"
+
+
+class Engine:
+    """Engine state and command handling, independent of where the lines come from"""
+
+    def __init__(self, out: TextIO = sys.stdout):
+        self.out = out
+        self.parser = FenParser()
+        self.tt = TranspositionTable(TT_SIZE_MB)
+        self.algorithm = DEFAULT_ALGORITHM
+        self.move_buffer = new_move_buffer()
+        self.base_fen = None
+        self.moves = []
+        self.rules = None
+        self._set_position(START_FEN, [])
+
+    def _send(self, line: str) -> None:
+        self.out.write(line + "\n")
+        self.out.flush()
+
+    def handle(self, line: str) -> bool:
+        """Execute one command line. Returns False once the engine should stop."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == "quit":
+            return False
+        if command == "isready":
+            self._send("readyok")
+        elif command == "ucinewgame":
+            self.tt.clear()
+        elif command == "setoption":
+            self._setoption(args)
+        elif command == "position":
+            self._position(args)
+        elif command == "go":
+            self._go(args)
+        elif command == "legalmoves":
+            count = self.rules.generate_moves(self.rules.current_player, self.move_buffer)
+            moves = sorted(move_to_str(m) for m in self.move_buffer[:count]) if not self.rules.game_over else []
+            self._send(" ".join(["legalmoves"] + moves))
+        elif command == "fen":
+            self._send(f"fen {self.rules.board.to_fen(self.rules.current_player)}")
+        elif command == "result":
+            winner = {1: "red", 2: "blue"}.get(self.rules.get_winner(), "none")
+            self._send(f"result {winner}")
+        else:
+            self._send(f"info string unknown command: {line.strip()}")
+        return True
+
+    def _setoption(self, args: List[str]) -> None:
+        # setoption name NAME value VALUE
+        if len(args) != 4 or args[0] != "name" or args[2] != "value":
+            self._send("info string usage: setoption name NAME value VALUE")
+            return
+        name, value = args[1].lower(), args[3]
+        if name == "hash":
+            try:
+                size_mb = float(value)
+                if not 0 < size_mb < float("inf"):
+                    raise ValueError(value)
+            except ValueError:
+                self._send(f"info string Hash must be a positive number of megabytes: {value}")
+                return
+            # The old table stays if the new one cannot be made
+            try:
+                self.tt = TranspositionTable(size_mb)
+            except ValueError as e:
+                self._send(f"info string {e}")
+            except (OverflowError, MemoryError):
+                self._send(f"info string Hash too large: {value}")
+        elif name == "algorithm" and value in ALGORITHMS:
+            self.algorithm = value
+        else:
+            self._send(f"info string unsupported option: {args[1]} {value}")
+
+    def _position(self, args: List[str]) -> None:
+        if "moves" in args:
+            split = args.index("moves")
+            spec, moves = args[:split], args[split + 1:]
+        else:
+            spec, moves = args, []
+
+        if spec == ["startpos"]:
+            fen_str = START_FEN
+        elif len(spec) == 3 and spec[0] == "fen":
+            fen_str = f"{spec[1]} {spec[2]}"
+        else:
+            self._send("info string usage: position startpos|fen FEN SIDE [moves ...]")
+            return
+
+        # Only play the new moves if this continues the previous position
+        if fen_str == self.base_fen and moves[:len(self.moves)] == self.moves:
+            new_moves = moves[len(self.moves):]
+        else:
+            self._set_position(fen_str, [])
+            new_moves = moves
+
+        for move in new_moves:
+            try:
+                from_pos, to_pos, height = parse_move(move)
+            except (ValueError, IndexError):
+                from_pos = None
+            if from_pos is None or self.rules.game_over or not self.rules.make_move(from_pos, to_pos, height):
+                self._send(f"info string illegal move: {move}")
+                return
+            self.moves.append(move)
+
+    def _set_position(self, fen_str: str, moves: List[str]) -> None:
+        board, current_player = self.parser.parse_fen(fen_str)
+        self.rules = BitboardRules(board)
+        self.rules.current_player = current_player
+        self.base_fen = fen_str
+        self.moves = list(moves)
+
+    def _go(self, args: List[str]) -> None:
+        options = dict(zip(args[::2], args[1::2]))
+        try:
+            movetime = int(options["movetime"]) if "movetime" in options else None
+            depth = int(options["depth"]) if "depth" in options else None
+            # The search keeps per-ply buffers, so the depth is capped like an iterative search
+            if (movetime is not None and movetime < 1) or (depth is not None and not 1 <= depth <= MAX_ITERATION_DEPTH):
+                raise ValueError(args)
+        except ValueError:
+            self._send(f"info string usage: go [depth 1-{MAX_ITERATION_DEPTH}] [movetime MS] with positive integers")
+            return
+        time_budget = movetime / 1000 if movetime is not None else None
+        if depth is None:
+            depth = MAX_DEPTH if time_budget is None else MAX_ITERATION_DEPTH
+
+        if self.rules.game_over:
+            self._send("bestmove none")
+            return
+
+        start = time.perf_counter()
+        search = AlphaBetaSearch(self.rules, self.tt, algorithm=self.algorithm)
+        move, score, completed = search.iterative_deepening(depth, time_budget)
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        if move is None:
+            self._send("bestmove none")
+            return
+        self._send(f"info depth {completed} score {score} nodes {search.nodes} time {elapsed_ms}")
+        self._send(f"bestmove {move_to_str(move)}")
+
+    def run(self, lines: TextIO = sys.stdin) -> None:
+        """Answer commands until quit or end of input"""
+        for line in lines:
+            if not self.handle(line):
+                break
+
+
+class EngineClient:
+    """
+    Runs engine.py as a subprocess and talks to it.
+
+    One client is one engine process for any number of moves and games,
+    so the interpreter starts once.
+    """
+
+    def __init__(self, python: str = sys.executable):
+        engine_path = os.path.abspath(__file__)
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.path.dirname(engine_path)
+        self.process = subprocess.Popen([python, engine_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True, bufsize=1, env=env)
+        self._command("isready")
+        self._read_until("readyok")
+
+    def _command(self, line: str) -> None:
+        self.process.stdin.write(line + "\n")
+        self.process.stdin.flush()
+
+    def _read_until(self, prefix: str) -> str:
+        """Read answer lines up to the one starting with prefix"""
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("Engine process ended unexpectedly")
+            line = line.rstrip("\n")
+            if line.startswith("info string"):
+                raise ValueError(line[len("info string "):])
+            if line.split(" ", 1)[0] == prefix:
+                return line
+
+    def _sync(self) -> None:
+        """Wait for the engine to process everything sent so far (raises on errors)"""
+        self._command("isready")
+        self._read_until("readyok")
+
+    def new_game(self) -> None:
+        self._command("ucinewgame")
+
+    def set_option(self, name: str, value) -> None:
+        self._command(f"setoption name {name} value {value}")
+        self._sync()
+
+    def position(self, fen_str: Optional[str] = None, moves: Optional[List[str]] = None) -> None:
+        """Set the position to fen_str (default: starting position) followed by moves"""
+        line = f"position fen {fen_str}" if fen_str else "position startpos"
+        if moves:
+            line += " moves " + " ".join(moves)
+        self._command(line)
+        self._sync()
+
+    def go(self, movetime: Optional[int] = None, depth: Optional[int] = None) -> Optional[str]:
+        """Search the current position; movetime is in milliseconds. Returns the move or None."""
+        line = "go"
+        if movetime is not None:
+            line += f" movetime {movetime}"
+        if depth is not None:
+            line += f" depth {depth}"
+        self._command(line)
+        move = self._read_until("bestmove").split()[1]
+        return None if move == "none" else move
+
+    def legal_moves(self) -> List[str]:
+        self._command("legalmoves")
+        return self._read_until("legalmoves").split()[1:]
+
+    def fen(self) -> str:
+        self._command("fen")
+        return self._read_until("fen").split(" ", 1)[1]
+
+    def result(self) -> Optional[str]:
+        """'red' or 'blue' once the game is won, None while it goes on"""
+        self._command("result")
+        winner = self._read_until("result").split()[1]
+        return None if winner == "none" else winner
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self._command("quit")
+            self.process.wait()
+
+    def __enter__(self) -> 'EngineClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main():
+    Engine().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,14 +13,8 @@ Weights:
     w_Eh      =      15     # penalty per enemy in your half
 """
 from core.fen import FenParser
-from core.bitboard_rules import BitboardRules
-from core.bitboard import BitboardBoard
-
-# Import utility functions (ensure these are available in your project)
-from threat_test import is_threatened
-from distance_test import distance_to_opponent_start
-from piece_count_test import count_pieces, count_enemy_pieces, diff_of_pieces, count_enemy_pieces_in_half
-from average_tower_height import average_tower_height
+from core.bitboard_rules import attack_map
+from core.bitboard import BitboardBoard, popcount
 
 # Evaluation weights
 w_win     = 1_000_000
@@ -32,67 +26,50 @@ w_H       = 10
 w_diff    = 30
 w_Eh      = 15
 
-
-def evaluate(fen_str: str) -> float:
+def evaluate_board(board: BitboardBoard, player: int) -> float:
     """
-    Compute evaluation score from the perspective of the side to move.
+    Compute evaluation score of a board from the perspective of `player` (the side to move).
     Positive values favor the current player; negative values favor the opponent.
+
+    The material terms (stack counts, tower heights, stacks in the other half, Guardian
+    distance to the center) are kept up to date by the board on every piece change,
+    so only the attack map has to be computed here.
     """
-    # Parse board and current player
-    parser = FenParser()
-    board, player = parser.parse_fen(fen_str)
+    enemy = 3 - player
+    if player == 1:
+        guard_bb, enemy_guard_bb = board.red_guardian, board.blue_guardian
+    else:
+        guard_bb, enemy_guard_bb = board.blue_guardian, board.red_guardian
+
+    # Terminal outcome: a side without its guardian has lost
+    if not guard_bb:
+        return -w_win
+    if not enemy_guard_bb:
+        return w_win
+
+    # Distance of the guardian to the center
+    F_center = board.center_bonus[player]
 
-    # Initialize rules engine for terminal detection
-    rules = BitboardRules(board)
-    rules.current_player = player
-
-    # Terminal outcome
-    if rules.is_game_over():
-        winner = rules.get_winner()
-        return w_win if winner == player else -w_win
-
-    # Find guardian position and center proximity
-    # Center square is (3,3)
-    guard_bb = board.red_guardian if player == 1 else board.blue_guardian
-    # Locate guardian bit
-    guard_pos = None
-    for bitpos in range(board.SIZE * board.SIZE):
-        if guard_bb & (1 << bitpos):
-            x = bitpos % board.SIZE
-            y = bitpos // board.SIZE
-            guard_pos = (x, y)
-            break
-
-    # Distance to center
-    d_center = abs(guard_pos[0] - 3) + abs(guard_pos[1] - 3)
-    F_center = 6 - d_center
+    # Everything the opponent can capture, computed once for the whole board
+    threatened = attack_map(board, enemy).captures
 
     # Threat to guardian
-    F_danger = 1 if is_threatened(board, guard_pos, player) else 0
+    F_danger = 1 if threatened & guard_bb else 0
 
     # Count own pieces in danger
-    F_Md = 0
-    for bitpos in range(board.SIZE * board.SIZE):
-        x = bitpos % board.SIZE
-        y = bitpos // board.SIZE
-        if board.get_stack_owner(x, y) == player:
-            if is_threatened(board, (x, y), player):
-                F_Md += 1
-
-    # Enemy stack count
-    F_E = count_enemy_pieces(fen_str)
+    F_Md = popcount(threatened)
 
     # Own tower height sum
-    F_H = 0
-    for h in range(1, 8):
-        tower_bb = board.red_towers[h] if player == 1 else board.blue_towers[h]
-        F_H += h * bin(tower_bb).count('1')
+    F_H = board.tower_height[player]
+
+    # Enemy stack count
+    F_E = board.stack_count[enemy]
 
     # Piece-count difference
-    F_diff = diff_of_pieces(fen_str)
+    F_diff = board.stack_count[player] - F_E
 
     # Enemy in your half
-    F_Eh = count_enemy_pieces_in_half(fen_str)
+    F_Eh = board.intruders[enemy]
 
     # Final evaluation
     score = (
@@ -108,6 +85,16 @@ def evaluate(fen_str: str) -> float:
     return score
 
 
+def evaluate(fen_str: str) -> float:
+    """
+    Compute evaluation score from the perspective of the side to move.
+    Positive values favor the current player; negative values favor the opponent.
+    """
+    parser = FenParser()
+    board, player = parser.parse_fen(fen_str)
+    return evaluate_board(board, player)
+
+
 if __name__ == "__main__":
     # Simple REPL for testing
     import sys
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Self-play match runner for Turm & Wächter engine development.
+
+Plays engine A against engine B in-process on a pool of worker processes.
+Every game starts from a random opening (a few random plies from the
+initial position), and every opening is played twice with the colors
+swapped. A game ends when a Guardian is captured or reaches D4, when the
+side to move has no legal moves (counted as a draw), or after a move limit
+(also a draw).
+
+After every game the running result, the Elo difference with its 95%
+error margin and, with --sprt, the log-likelihood ratio of a sequential
+probability ratio test are printed. The SPRT stops the match as soon as
+it accepts H0 (A is not elo1 stronger than B, but at most elo0) or H1.
+
+Usage:
+    python match_runner.py --games 200 --concurrency 8 --depth-a 4 --depth-b 3 --sprt
+"""
+import argparse
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+from core.bitboard import BitboardBoard
+from core.bitboard_rules import BitboardRules, CENTER_SQUARE
+from core.move import MOVE_CAPTURE, MOVE_GUARDIAN, new_move_buffer
+from alpha_beta_ki import (AlphaBetaSearch, SearchParams, ALGORITHMS, DEFAULT_ALGORITHM, MAX_DEPTH,
+                           MAX_ITERATION_DEPTH)
+from transposition_table import TranspositionTable
+
+MAX_GAME_MOVES = 200  # Plies before a game is adjudicated a draw
+OPENING_PLIES = 4     # Random plies before the engines take over
+MATCH_TT_SIZE_MB = 4  # Per engine and game, so many games fit into memory
+
+
+class EngineConfig:
+    """Search settings of one side of a match"""
+
+    def __init__(self, name: str, algorithm: str = DEFAULT_ALGORITHM, depth: Optional[int] = None,
+                 movetime: Optional[int] = None, params: Optional[SearchParams] = None,
+                 tt_size_mb: float = MATCH_TT_SIZE_MB):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown search algorithm '{algorithm}', expected one of {ALGORITHMS}")
+        self.name = name
+        self.algorithm = algorithm
+        # Without a movetime the depth defaults to MAX_DEPTH, with one it only caps the iterations
+        self.depth = MAX_DEPTH if depth is None and movetime is None else depth
+        self.movetime = movetime  # Milliseconds per move, None for a fixed depth
+        self.params = params
+        self.tt_size_mb = tt_size_mb
+
+    def __repr__(self):
+        limits = []
+        if self.movetime is not None:
+            limits.append(f"movetime {self.movetime}")
+        if self.depth is not None:
+            limits.append(f"depth {self.depth}")
+        limit = ", ".join(limits)
+        return f"{self.name} ({self.algorithm}, {limit})"
+
+
+def random_opening(seed: int, plies: int = OPENING_PLIES) -> List[int]:
+    """Random packed moves from the initial position that do not end the game"""
+    rng = random.Random(seed)
+    rules = BitboardRules(BitboardBoard())
+    buffer = new_move_buffer()
+    opening = []
+    for _ in range(plies):
+        count = rules.generate_moves(rules.current_player, buffer)
+        enemy_guardian = rules.board.blue_guardian if rules.current_player == 1 else rules.board.red_guardian
+        moves = [m for m in buffer[:count]
+                 if not (m & MOVE_CAPTURE and enemy_guardian >> ((m >> 6) & 0x3F) & 1)
+                 and not (m & MOVE_GUARDIAN and (m >> 6) & 0x3F == CENTER_SQUARE)]
+        if not moves:
+            break
+        move = rng.choice(moves)
+        rules.make_encoded(move)
+        opening.append(move)
+    return opening
+
+
+def play_game(red: EngineConfig, blue: EngineConfig, opening: List[int],
+              max_moves: int = MAX_GAME_MOVES) -> Tuple[int, int]:
+    """
+    Play one game.
+
+    Returns:
+        (result, plies played): result is 1 if Red won, -1 if Blue won, 0 for a draw
+    """
+    rules = BitboardRules(BitboardBoard())
+    for move in opening:
+        rules.make_encoded(move)
+
+    engines = {1: red, 2: blue}
+    tables = {1: TranspositionTable(red.tt_size_mb), 2: TranspositionTable(blue.tt_size_mb)}
+    plies = len(opening)
+    while plies < max_moves and not rules.game_over:
+        player = rules.current_player
+        config = engines[player]
+        search = AlphaBetaSearch(rules, tables[player], algorithm=config.algorithm, params=config.params)
+        if config.movetime is not None:
+            move, _, _ = search.iterative_deepening(config.depth or MAX_ITERATION_DEPTH, config.movetime / 1000)
+        else:
+            move, _, _ = search.iterative_deepening(config.depth)
+        if move is None:
+            return 0, plies
+        rules.make_encoded(move)
+        plies += 1
+
+    if rules.game_over:
+        return (1 if rules.winner == 1 else -1), plies
+    return 0, plies
+
+
+def _play_match_game(engine_a: EngineConfig, engine_b: EngineConfig, opening: List[int], a_is_red: bool,
+                     max_moves: int) -> Tuple[float, int]:
+    """Worker task: play one game and return engine A's score (1, 0.5 or 0) and the plies played"""
+    if a_is_red:
+        result, plies = play_game(engine_a, engine_b, opening, max_moves)
+    else:
+        result, plies = play_game(engine_b, engine_a, opening, max_moves)
+        result = -result
+    return (result + 1) / 2, plies
+
+
+def elo_from_score(score: float) -> float:
+    """Elo difference corresponding to an expected score"""
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return 400 * math.log10(score / (1 - score))
+
+
+def elo_estimate(wins: int, draws: int, losses: int) -> Tuple[float, float]:
+    """Elo difference and its 95% error margin from a game result"""
+    n = wins + draws + losses
+    if not n:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    margin = 1.96 * math.sqrt(variance / n)
+    elo = elo_from_score(score)
+    if margin == 0 or score - margin <= 0 or score + margin >= 1:
+        return elo, math.inf
+    low, high = elo_from_score(score - margin), elo_from_score(score + margin)
+    return elo, (high - low) / 2
+
+
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    """
+    Log-likelihood ratio of H1 (Elo difference elo1) against H0 (elo0).
+
+    Uses the normal approximation of the trinomial game results (as in the
+    common GSPRT implementations of engine testing frameworks).
+    """
+    n = wins + draws + losses
+    if not wins + losses or not n:
+        return 0.0
+    score = (wins + draws / 2) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    if variance <= 0:
+        return 0.0
+    s0 = 1 / (1 + 10 ** (-elo0 / 400))
+    s1 = 1 / (1 + 10 ** (-elo1 / 400))
+    return n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+
+def sprt_bounds(alpha: float, beta: float) -> Tuple[float, float]:
+    """LLR below the first bound accepts H0, above the second accepts H1"""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+class MatchResult:
+    """Running result of a match from engine A's point of view"""
+
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.plies = 0
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def add(self, score: float, plies: int) -> None:
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        self.plies += plies
+
+    def __str__(self):
+        elo, margin = elo_estimate(self.wins, self.draws, self.losses)
+        score = (self.wins + self.draws / 2) / self.games if self.games else 0.0
+        return (f"Games {self.games}: +{self.wins} ={self.draws} -{self.losses}, "
+                f"score {score:.1%}, Elo {elo:+.1f} +/- {margin:.1f}")
+
+
+def run_match(engine_a: EngineConfig, engine_b: EngineConfig, games: int, concurrency: int = 1,
+              opening_plies: int = OPENING_PLIES, max_moves: int = MAX_GAME_MOVES, seed: int = 0,
+              sprt: Optional[Tuple[float, float, float, float]] = None, verbose: bool = True) -> MatchResult:
+    """
+    Play a match of games (rounded up to pairs with swapped colors) between two engines.
+
+    Args:
+        sprt: (elo0, elo1, alpha, beta) to stop as soon as the SPRT decides, or None
+    """
+    result = MatchResult()
+    pairs = (games + 1) // 2
+    if sprt is not None:
+        elo0, elo1, alpha, beta = sprt
+        lower, upper = sprt_bounds(alpha, beta)
+
+    with ProcessPoolExecutor(max_workers=concurrency) as executor:
+        futures = []
+        for pair in range(pairs):
+            opening = random_opening(seed + pair, opening_plies)
+            for a_is_red in (True, False):
+                futures.append(executor.submit(_play_match_game, engine_a, engine_b, opening, a_is_red, max_moves))
+
+        for future in as_completed(futures):
+            score, plies = future.result()
+            result.add(score, plies)
+            line = str(result)
+            decided = None
+            if sprt is not None:
+                llr = sprt_llr(result.wins, result.draws, result.losses, elo0, elo1)
+                line += f", LLR {llr:.2f} ({lower:.2f}, {upper:.2f})"
+                if llr <= lower:
+                    decided = "H0 accepted"
+                elif llr >= upper:
+                    decided = "H1 accepted"
+            if verbose:
+                print(line, flush=True)
+            if decided:
+                if verbose:
+                    print(f"SPRT: {decided}")
+                for pending in futures:
+                    pending.cancel()
+                break
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play matches between two engine configurations")
+    parser.add_argument("--games", type=int, default=100, help="Number of games (rounded up to color-swapped pairs)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Games played in parallel")
+    for side in ("a", "b"):
+        parser.add_argument(f"--algorithm-{side}", choices=ALGORITHMS, default=DEFAULT_ALGORITHM)
+        parser.add_argument(f"--depth-{side}", type=int, default=None,
+                            help=f"Search depth (default {MAX_DEPTH}; with a movetime, a cap on the depth)")
+        parser.add_argument(f"--movetime-{side}", type=int, default=None, metavar="MS")
+    parser.add_argument("--opening-plies", type=int, default=OPENING_PLIES)
+    parser.add_argument("--max-moves", type=int, default=MAX_GAME_MOVES, help="Plies before a game is a draw")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random openings")
+    parser.add_argument("--sprt", action="store_true", help="Stop early once the SPRT decides")
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=20.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+
+    engine_a = EngineConfig("A", args.algorithm_a, args.depth_a, args.movetime_a)
+    engine_b = EngineConfig("B", args.algorithm_b, args.depth_b, args.movetime_b)
+    print(f"{engine_a} vs {engine_b}")
+    sprt = (args.elo0, args.elo1, args.alpha, args.beta) if args.sprt else None
+
+    start = time.time()
+    result = run_match(engine_a, engine_b, args.games, args.concurrency, args.opening_plies, args.max_moves,
+                       args.seed, sprt)
+    elapsed = time.time() - start
+    print(f"Final: {result}")
+    print(f"{result.games} games, {result.plies} plies in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Root-parallel search for Turm & Wächter.
+
+Each iteration of the iterative deepening splits the root moves across a
+pool of worker processes. Every worker searches one root move at a time
+with the principal variation search of alpha_beta_ki, and the best root
+score found so far (alpha) is shared between the workers through a
+multiprocessing.Value: a worker reads it before searching its move, so
+moves that cannot beat it are refuted with a narrow window, and publishes
+its own score when it raises it. A refuted move only gets an upper bound,
+so the best move is picked from the exact scores; a bound that reaches the
+best exact score is searched again with a full window.
+
+All workers read and write one SharedTranspositionTable, so a position
+searched by one worker is known to the others, and the memory budget is
+spent once rather than per worker. The workers are started once and the
+table is kept between moves and iterations. With one thread the ordinary
+sequential search is used, so results are deterministic.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Value
+from typing import List, Optional, Tuple
+
+from core.fen import FenParser
+from core.bitboard_rules import BitboardRules
+from core.move import new_move_buffer
+from alpha_beta_ki import (AlphaBetaSearch, SearchParams, SearchTimeout, INFINITY, MAX_ITERATION_DEPTH,
+                           TT_SIZE_MB)
+from evaluate import w_win
+from transposition_table import TranspositionTable, SharedTranspositionTable
+
+# State of a worker process, set up once by _init_worker
+_shared_alpha = None
+_tt = None
+_params = None
+
+
+def _init_worker(shared_alpha, tt_name: str, tt_buckets: int, params: Optional[SearchParams]) -> None:
+    """Process pool initializer: keep the shared bound and attach to the shared table"""
+    global _shared_alpha, _tt, _params
+    _shared_alpha = shared_alpha
+    _tt = SharedTranspositionTable(name=tt_name, num_buckets=tt_buckets)
+    _params = params
+
+
+def _search_root_move(fen_str: str, move: int, depth: int, deadline: Optional[float],
+                      generation: int, full_window: bool = False) -> Optional[Tuple[int, bool, int]]:
+    """
+    Search one root move in a worker.
+
+    Args:
+        deadline: time.time() value at which to give up, or None
+        generation: Search generation of the shared table
+        full_window: Ignore the shared alpha, so the score is exact
+
+    Returns:
+        (score for the side to move at the root, whether the score is exact, nodes searched),
+        or None if the deadline passed. A score at or below the shared alpha read at the
+        start is only an upper bound.
+    """
+    parser = FenParser()
+    board, current_player = parser.parse_fen(fen_str)
+    rules = BitboardRules(board)
+    rules.current_player = current_player
+    _tt.generation = generation
+    search = AlphaBetaSearch(rules, _tt, algorithm='pvs', params=_params)
+    if deadline is not None:
+        # time.time() is comparable between processes, perf_counter() is not
+        search.deadline = time.perf_counter() + (deadline - time.time())
+
+    alpha = -INFINITY if full_window else _shared_alpha.value
+    rules.make_encoded(move)
+    try:
+        score = -search.pvs(depth - 1, -INFINITY, -alpha, 1)
+    except SearchTimeout:
+        return None
+
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return score, score > alpha, search.nodes
+
+
+class ParallelSearch:
+    """
+    Root-parallel iterative deepening over a process pool.
+
+    Use as a context manager, or call close() when done, to stop the workers.
+    """
+
+    def __init__(self, threads: int, tt_size_mb: float = TT_SIZE_MB, params: Optional[SearchParams] = None,
+                 verbose: bool = False):
+        if threads < 1:
+            raise ValueError(f"Need at least one thread, got {threads}")
+        self.threads = threads
+        self.tt_size_mb = tt_size_mb
+        self.params = params
+        self.verbose = verbose
+        self.nodes = 0
+        self._shared_alpha = Value('q', 0)
+        self._executor = None
+        self.tt = None
+        if threads > 1:
+            self.tt = SharedTranspositionTable(tt_size_mb)
+            self._executor = ProcessPoolExecutor(max_workers=threads, initializer=_init_worker,
+                                                 initargs=(self._shared_alpha, self.tt.name, self.tt.num_buckets, params))
+
+    def close(self) -> None:
+        """Shut the worker processes down and free the shared table"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self.tt is not None:
+            self.tt.close()
+            self.tt = None
+
+    def __enter__(self) -> 'ParallelSearch':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def search(self, fen_str: str, max_depth: int = MAX_ITERATION_DEPTH,
+               time_budget: Optional[float] = None) -> Tuple[Optional[int], float, int]:
+        """
+        Search a position with iterative deepening, like AlphaBetaSearch.iterative_deepening.
+
+        Returns:
+            (best move of the last completed iteration, its Red-centric score, its depth)
+        """
+        parser = FenParser()
+        board, current_player = parser.parse_fen(fen_str)
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+
+        if self._executor is None:
+            search = AlphaBetaSearch(rules, TranspositionTable(self.tt_size_mb), verbose=self.verbose,
+                                     algorithm='pvs', params=self.params)
+            result = search.iterative_deepening(max_depth, time_budget)
+            self.nodes = search.nodes
+            return result
+
+        buffer = new_move_buffer()
+        count = rules.generate_moves(current_player, buffer)
+        root_moves = list(buffer[:count])
+        sign = 1 if current_player == 1 else -1
+        self.nodes = 0
+        best_move, best_score, completed = None, 0.0, 0
+        if not root_moves:
+            return best_move, best_score, completed
+
+        self.tt.new_search()
+        start = time.time()
+        for depth in range(1, max_depth + 1):
+            deadline = None
+            if time_budget is not None and depth > 1:
+                # The next iteration takes several times as long as the last one
+                if time.time() - start >= time_budget / 2:
+                    break
+                deadline = start + time_budget
+
+            self._shared_alpha.value = -INFINITY
+            results = self._search_moves(fen_str, root_moves, depth, deadline)
+            if results is None:
+                break
+            scores = [score for score, _, _ in results]
+            exact = [is_exact for _, is_exact, _ in results]
+
+            # An upper bound that reaches the best exact score may hide a better move
+            timed_out = False
+            while True:
+                best_exact = max((scores[i] for i in range(len(root_moves)) if exact[i]), default=-INFINITY)
+                retry = [i for i in range(len(root_moves)) if not exact[i] and scores[i] >= best_exact]
+                if not retry:
+                    break
+                results = self._search_moves(fen_str, [root_moves[i] for i in retry], depth, deadline, True)
+                if results is None:
+                    timed_out = True
+                    break
+                for i, (score, _, _) in zip(retry, results):
+                    scores[i], exact[i] = score, True
+            if timed_out:
+                break
+
+            best = max((i for i in range(len(root_moves)) if exact[i]), key=lambda i: scores[i])
+            best_move, best_score, completed = root_moves[best], sign * scores[best], depth
+            if self.verbose:
+                print(f"Depth {depth}: score {best_score}, nodes {self.nodes}, time {time.time() - start:.3f}s")
+
+            # Search the best moves of this iteration first in the next one, exact scores before bounds
+            order = sorted(range(len(root_moves)), key=lambda i: (not exact[i], -scores[i]))
+            root_moves = [root_moves[i] for i in order]
+
+            # A won or lost game does not change with more depth
+            if abs(best_score) >= w_win:
+                break
+
+        return best_move, best_score, completed
+
+    def _search_moves(self, fen_str: str, moves, depth: int, deadline: Optional[float],
+                      full_window: bool = False) -> Optional[List[Tuple[int, bool, int]]]:
+        """Search root moves in the workers. Returns their results in order, or None if the deadline passed."""
+        futures = [self._executor.submit(_search_root_move, fen_str, move, depth, deadline, self.tt.generation,
+                                         full_window)
+                   for move in moves]
+        results = []
+        for future in futures:
+            result = future.result()
+            if result is None:
+                for pending in futures:
+                    pending.cancel()
+                return None
+            results.append(result)
+        self.nodes += sum(nodes for _, _, nodes in results)
+        return results
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Perft (performance test) node counter for Turm & Wächter.
+
+Counts the leaf nodes of the game tree to a fixed depth, playing every move
+with make/unmake. The counts check the move generator deep in the tree
+against known values, and the nodes per second measure raw move
+generation and make/unmake speed. A won position has no children, so its
+subtree ends early.
+
+At the last ply the moves are only counted (BitboardRules.count_moves),
+not generated and played; --no-bulk plays them too.
+
+Usage:
+    python perft.py "r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r" 4
+    python perft.py "r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r" 4 --divide
+"""
+import argparse
+import sys
+import os
+import time
+from typing import List, Tuple
+
+# Add parent directory to sys.path to allow imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from core.bitboard_rules import BitboardRules
+from core.fen import FenParser
+from core.move import move_to_str, new_move_buffers
+
+
+def perft(rules: BitboardRules, depth: int, bulk: bool = True) -> int:
+    """Number of leaf nodes depth plies below the current position of rules"""
+    return _perft(rules, depth, 0, new_move_buffers(max(depth, 1)), bulk)
+
+
+def _perft(rules: BitboardRules, depth: int, ply: int, buffers, bulk: bool) -> int:
+    if depth == 0:
+        return 1
+    if rules.game_over:
+        return 0
+    if depth == 1 and bulk:
+        return rules.count_moves(rules.current_player)
+
+    buffer = buffers[ply]
+    count = rules.generate_moves(rules.current_player, buffer)
+    nodes = 0
+    for i in range(count):
+        undo = rules.make_encoded(buffer[i])
+        nodes += _perft(rules, depth - 1, ply + 1, buffers, bulk)
+        rules.unmake(undo)
+    return nodes
+
+
+def divide(rules: BitboardRules, depth: int, bulk: bool = True) -> List[Tuple[str, int]]:
+    """Leaf counts below each root move, as (move in algebraic notation, nodes), sorted by move"""
+    if depth < 1 or rules.game_over:
+        return []
+    buffers = new_move_buffers(depth)
+    count = rules.generate_moves(rules.current_player, buffers[0])
+    result = []
+    for i in range(count):
+        move = buffers[0][i]
+        undo = rules.make_encoded(move)
+        result.append((move_to_str(move), _perft(rules, depth - 1, 1, buffers, bulk)))
+        rules.unmake(undo)
+    return sorted(result)
+
+
+def rules_from_fen(fen_str: str) -> BitboardRules:
+    board, current_player = FenParser().parse_fen(fen_str)
+    rules = BitboardRules(board)
+    rules.current_player = current_player
+    return rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the leaf nodes of the game tree to a fixed depth")
+    parser.add_argument("fen", help="Position as FEN string, e.g. \"b36/3b12r3/7/7/1r2RG4/2/BG4/6r1 b\"")
+    parser.add_argument("depth", type=int, help="Depth in plies")
+    parser.add_argument("--divide", action="store_true", help="Print the leaf count below every root move")
+    parser.add_argument("--no-bulk", action="store_true", help="Play the moves of the last ply instead of counting them")
+    args = parser.parse_args()
+
+    try:
+        rules = rules_from_fen(args.fen)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    bulk = not args.no_bulk
+    start = time.perf_counter()
+    if args.divide:
+        moves = divide(rules, args.depth, bulk)
+        for move, nodes in moves:
+            print(f"{move}: {nodes}")
+        nodes = sum(n for _, n in moves)
+        print(f"\nMoves: {len(moves)}")
+    else:
+        nodes = perft(rules, args.depth, bulk)
+    elapsed = time.perf_counter() - start
+
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.3f}s")
+    print(f"Nodes/second: {nodes / elapsed if elapsed > 0 else 0:.0f}")
+
+
+if __name__ == "__main__":
+    main()
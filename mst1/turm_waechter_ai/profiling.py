@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Profiling support for the command line tools of Turm & Wächter.
+
+profile_call runs a function under cProfile and leaves two files behind:
+    PREFIX.pstats  cProfile statistics, e.g. for `python -m pstats PREFIX.pstats` or snakeviz
+    PREFIX.folded  collapsed stacks ("main;search;evaluate 1234" in microseconds),
+                   the input format of flamegraph.pl, speedscope and inferno
+It also prints the functions with the most own time.
+
+cProfile only records which function called which, not whole stacks, so the
+collapsed stacks are rebuilt from the call graph: the time of a function is
+split between its callers in proportion to the time spent in it from each
+caller. Recursive calls are folded into the outermost call.
+"""
+import cProfile
+import os
+import pstats
+import sys
+from collections import defaultdict
+from typing import Callable, Dict, TextIO, Tuple
+
+PROFILE_PREFIX = "profile"  # Default file name prefix of the profile files
+PROFILE_TOP = 20  # Functions listed in the summary
+MIN_STACK_TIME = 1e-6  # Stacks with less time (seconds) are left out of the collapsed file
+
+
+def _label(func: Tuple[str, int, str]) -> str:
+    """Frame name of a pstats function key (filename, line, name)"""
+    filename, line, name = func
+    if filename == "~":
+        label = name  # Built-in functions, e.g. "<built-in method builtins.len>"
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+    return label.replace(";", ",")
+
+
+def collapsed_stacks(stats: pstats.Stats) -> Dict[str, float]:
+    """Own time in seconds of every call stack, keyed by the ';'-joined frame names"""
+    entries = stats.stats
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, caller_stats in callers.items():
+            # caller_stats[3]: cumulative time of func in calls from caller
+            callees[caller].append((func, caller_stats[3]))
+
+    stacks = defaultdict(float)
+
+    def walk(func, path, share):
+        # share: the part of func's total time that was spent on this path
+        _, _, own_time, total_time, _ = entries[func]
+        path = path + (func,)
+        if own_time * share >= MIN_STACK_TIME:
+            stacks[";".join(_label(f) for f in path)] += own_time * share
+        for callee, edge_time in callees[func]:
+            callee_total = entries[callee][3]
+            if callee in path or callee_total <= 0 or edge_time * share < MIN_STACK_TIME:
+                continue
+            walk(callee, path, share * edge_time / callee_total)
+
+    for func, (_, _, _, _, callers) in entries.items():
+        # The profiler switching itself off is a root too
+        if not callers and "_lsprof.Profiler" not in func[2]:
+            walk(func, (), 1.0)
+    return stacks
+
+
+def write_collapsed(stats: pstats.Stats, path: str) -> int:
+    """Write the collapsed stacks in microseconds, as flamegraph tools read them. Returns the number of stacks."""
+    stacks = collapsed_stacks(stats)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, seconds in sorted(stacks.items()):
+            f.write(f"{stack} {max(int(round(seconds * 1e6)), 1)}\n")
+    return len(stacks)
+
+
+def profile_call(func: Callable, *args, prefix: str = PROFILE_PREFIX, top: int = PROFILE_TOP,
+                 out: TextIO = sys.stderr, **kwargs):
+    """
+    Call func(*args, **kwargs) under cProfile and return its result.
+
+    Writes PREFIX.pstats and PREFIX.folded and prints the top functions by own time to out.
+    """
+    profiler = cProfile.Profile()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+    finally:
+        stats = pstats.Stats(profiler, stream=out)
+        stats.dump_stats(f"{prefix}.pstats")
+        write_collapsed(stats, f"{prefix}.folded")
+        out.write(f"\nProfile written to {prefix}.pstats and {prefix}.folded\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+    return result
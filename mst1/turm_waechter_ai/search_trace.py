@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Search tree trace for Turm & Wächter.
+
+TracingSearch is an AlphaBetaSearch that writes one line of JSON (NDJSON)
+for every node it searches. Tracing lives in a subclass instead of behind
+a flag in the search, so an ordinary search pays nothing for it.
+
+The first line describes the search:
+    {"fen": ..., "algorithm": ...}
+Every other line is a node, written when its search returns (children
+before their parents):
+    k     kind of node: "ab" (alpha_beta), "pvs" or "q" (quiescence)
+    p     ply
+    d     remaining depth (0 for quiescence nodes)
+    m     move that led to the node, "null" for a null move, "" for the root
+    a, b  window the node was searched with
+    s     score returned (Red-centric for "ab", side to move for "pvs" and "q")
+Infinite bounds are written as +-INFINITY. A node aborted by the clock is
+not written.
+"""
+import json
+import math
+from typing import TextIO
+
+from core.bitboard_rules import BitboardRules
+from core.move import encode_move, move_to_str
+from alpha_beta_ki import AlphaBetaSearch, INFINITY
+
+
+def _finite(value: float) -> float:
+    """JSON has no infinity, and no score is beyond INFINITY"""
+    if math.isinf(value):
+        return INFINITY if value > 0 else -INFINITY
+    return value
+
+
+class TracingSearch(AlphaBetaSearch):
+    """AlphaBetaSearch that logs every searched node to a text file"""
+
+    def __init__(self, rules: BitboardRules, trace: TextIO, **kwargs):
+        super().__init__(rules, **kwargs)
+        self.trace = trace
+        self.trace.write(json.dumps({"fen": rules.board.to_fen(rules.current_player),
+                                     "algorithm": self.algorithm}) + "\n")
+        self._root_moves = len(rules.undo_stack)
+
+    def _last_move(self) -> str:
+        undo_stack = self.rules.undo_stack
+        if len(undo_stack) <= self._root_moves:
+            return ""
+        undo = undo_stack[-1]
+        if not undo.height:
+            return "null"
+        return move_to_str(encode_move(undo.from_sq, undo.to_sq, undo.height))
+
+    def _write(self, kind: str, ply: int, depth: int, alpha: float, beta: float, score: float) -> None:
+        self.trace.write(json.dumps({"k": kind, "p": ply, "d": depth, "m": self._last_move(),
+                                     "a": _finite(alpha), "b": _finite(beta), "s": _finite(score)},
+                                    separators=(",", ":")) + "\n")
+
+    def alpha_beta(self, depth: int, alpha: float, beta: float, maximizing: bool, ply=0) -> float:
+        score = super().alpha_beta(depth, alpha, beta, maximizing, ply)
+        self._write("ab", ply, depth, alpha, beta, score)
+        return score
+
+    def pvs(self, depth: int, alpha: int, beta: int, ply: int = 0, allow_null: bool = True) -> int:
+        score = super().pvs(depth, alpha, beta, ply, allow_null)
+        self._write("pvs", ply, depth, alpha, beta, score)
+        return score
+
+    def quiesce(self, alpha: float, beta: float, ply: int) -> float:
+        score = super().quiesce(alpha, beta, ply)
+        self._write("q", ply, 0, alpha, beta, score)
+        return score
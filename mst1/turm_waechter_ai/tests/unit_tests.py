@@ -4,9 +4,18 @@ Unit tests for Turm & Wächter move generator.
 This script tests the move generator for specific game positions.
 """
 
+import math
+import random
+import sys
 import unittest
+from core.bitboard import BitboardBoard
 from core.fen import FenParser
-from core.bitboard_rules import BitboardRules
+from core.bitboard_rules import BitboardRules, BETWEEN, DEST_MASKS, MOVE_TARGETS, attack_map
+from core.move import (MOVE_CAPTURE, MOVE_STACK, MOVE_GUARDIAN, encode_move, move_from, move_to,
+                       move_height, move_to_tuple, move_to_str, new_move_buffer)
+from alpha_beta_ki import AlphaBetaSearch, SearchParams, choose_best_move, INFINITY
+from evaluate import evaluate, evaluate_board, w_win
+from transposition_table import TranspositionTable, SharedTranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
 
 class TestMoveGenerator(unittest.TestCase):
     """Unit tests for the move generator"""
@@ -446,11 +455,1235 @@ class TestMoveGenerator(unittest.TestCase):
             self.assertEqual(len(moves), expected_count, 
                             f"Position {fen_str} should have {expected_count} moves, got {len(moves)}")
 
+class TestMakeUnmake(unittest.TestCase):
+    """Unit tests for the reversible make/unmake API"""
+
+    POSITIONS = [
+        "r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r",
+        "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b",
+        "r14r21/1r1r1RG3/4r12/7/2b1r1b12/1b22b22/3BG3 r",
+        "RG6/3b3r32/3r21b21/7/4r22/7/6BG r",
+        "2RG2b41/7/7/3r41r3b3/7/7/3BG3 b",
+        "RGBG5/7/7/7/7/7/7 r",
+    ]
+
+    def test_make_matches_make_move_and_unmake_restores(self):
+        """
+        Every legal move played with make() must give the same position as make_move(),
+        and unmake() must bring back the original position and game state.
+        """
+        parser = FenParser()
+        for fen_str in self.POSITIONS:
+            board, current_player = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            rules.current_player = current_player
+            start_fen = board.to_fen(current_player)
+
+            for from_pos, to_pos, height in rules.get_legal_moves(current_player):
+                # Reference: the validating make_move on a fresh board
+                ref_board, _ = parser.parse_fen(fen_str)
+                ref_rules = BitboardRules(ref_board)
+                ref_rules.current_player = current_player
+                self.assertTrue(ref_rules.make_move(from_pos, to_pos, height))
+
+                undo = rules.make(from_pos, to_pos, height)
+                self.assertEqual(board.to_fen(rules.current_player), ref_board.to_fen(ref_rules.current_player))
+                self.assertEqual(rules.game_over, ref_rules.game_over)
+                self.assertEqual(rules.winner, ref_rules.winner)
+
+                rules.unmake(undo)
+                self.assertEqual(board.to_fen(rules.current_player), start_fen)
+                self.assertFalse(rules.game_over)
+                self.assertIsNone(rules.winner)
+                self.assertEqual(rules.undo_stack, [])
+
+    def test_guardian_capture_sets_and_restores_game_over(self):
+        """Capturing the Watcher ends the game, and unmake reverts that"""
+        parser = FenParser()
+        board, current_player = parser.parse_fen("RGBG5/7/7/7/7/7/7 r")
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+
+        undo = rules.make((0, 0), (1, 0), 1)
+        self.assertTrue(rules.is_game_over())
+        self.assertEqual(rules.get_winner(), 1)
+        self.assertEqual(undo.captured_player, 2)
+        self.assertEqual(undo.captured_code, 0)
+
+        rules.unmake(undo)
+        self.assertFalse(rules.is_game_over())
+        self.assertEqual(board.to_fen(rules.current_player), "RGBG5/7/7/7/7/7/7 r")
+
+    def test_null_move(self):
+        board, current_player = FenParser().parse_fen(self.POSITIONS[0])
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+        fen_before = board.to_fen(current_player)
+        undo = rules.make_null()
+        self.assertEqual(rules.current_player, 3 - current_player)
+        self.assertEqual(board.to_fen(rules.current_player), fen_before[:-1] + ('b' if current_player == 1 else 'r'))
+        self.assertTrue(rules.verify_hash())
+        rules.unmake(undo)
+        self.assertEqual(board.to_fen(rules.current_player), fen_before)
+        self.assertTrue(rules.verify_hash())
+
+    def test_nested_split_and_merge(self):
+        """A split onto an own stack followed by a capture unwinds in reverse order"""
+        parser = FenParser()
+        fen_str = "3RG3/7/7/r31r12b11/7/7/3BG3 r"
+        board, current_player = parser.parse_fen(fen_str)
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+
+        # Split two pieces off the A4 stack onto the C4 tower, making a C4 stack of height 3
+        first = rules.make((0, 3), (2, 3), 2)
+        self.assertEqual(first.source_code, 3)
+        self.assertEqual(first.dest_height, 1)
+        self.assertEqual(board.get_stack_height(0, 3), 1)
+        self.assertEqual(board.get_stack_height(2, 3), 3)
+
+        rules.current_player = 1
+        # The merged stack moves 3 and captures the Blue tower on F4
+        second = rules.make((2, 3), (5, 3), 3)
+        self.assertEqual(second.captured_player, 2)
+        self.assertEqual(second.captured_code, 1)
+
+        rules.unmake(second)
+        rules.unmake(first)
+        self.assertEqual(board.to_fen(current_player), fen_str)
+
+
+class TestZobristHash(unittest.TestCase):
+    """Unit tests for the incrementally maintained Zobrist key"""
+
+    def test_parsed_positions_match_full_recompute(self):
+        """parse_fen and setup_starting_position produce the same key as compute_hash"""
+        parser = FenParser()
+        for fen_str in TestMakeUnmake.POSITIONS:
+            board, current_player = parser.parse_fen(fen_str)
+            self.assertEqual(board.hash, board.compute_hash(current_player), fen_str)
+
+        start = BitboardBoard()
+        parsed, _ = parser.parse_fen("r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r")
+        self.assertEqual(start.hash, parsed.hash)
+        self.assertNotEqual(start.hash, start.compute_hash(2), "Side to move must change the key")
+
+    def test_random_walk_keeps_key_in_sync(self):
+        """The key stays correct through make/unmake and returns to its start value"""
+        parser = FenParser()
+        rng = random.Random(7)
+        for fen_str in TestMakeUnmake.POSITIONS:
+            board, current_player = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            rules.current_player = current_player
+            start_hash = board.hash
+            played = []
+            for _ in range(12):
+                moves = rules.get_legal_moves(rules.current_player)
+                if not moves or rules.is_game_over():
+                    break
+                played.append(rules.make(*rng.choice(moves)))
+                self.assertTrue(rules.verify_hash())
+            for undo in reversed(played):
+                rules.unmake(undo)
+                self.assertTrue(rules.verify_hash())
+            self.assertEqual(board.hash, start_hash)
+
+    def test_transposition_gives_same_key(self):
+        """Two move orders reaching the same position have the same key"""
+        parser = FenParser()
+        board_a, player = parser.parse_fen("r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r")
+        board_b, _ = parser.parse_fen("r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r")
+        rules_a = BitboardRules(board_a)
+        rules_b = BitboardRules(board_b)
+        rules_a.current_player = rules_b.current_player = player
+
+        for from_pos, to_pos in [((0, 0), (0, 1)), ((0, 6), (0, 5)), ((6, 0), (6, 1)), ((6, 6), (6, 5))]:
+            rules_a.make(from_pos, to_pos, 1)
+        for from_pos, to_pos in [((6, 0), (6, 1)), ((6, 6), (6, 5)), ((0, 0), (0, 1)), ((0, 6), (0, 5))]:
+            rules_b.make(from_pos, to_pos, 1)
+
+        self.assertEqual(board_a.to_fen(rules_a.current_player), board_b.to_fen(rules_b.current_player))
+        self.assertEqual(board_a.hash, board_b.hash)
+
+    def test_move_stack_and_capture_piece_update_key(self):
+        """The older move_stack/capture_piece helpers keep the key in sync as well"""
+        board = BitboardBoard()
+        board.move_stack((0, 0), (1, 0), 1)  # A7 onto B7, making a stack of 2
+        self.assertEqual(board.hash, board.compute_hash(1))
+        board.capture_piece((3, 4))
+        self.assertEqual(board.hash, board.compute_hash(1))
+
+
+def _store_in_shared_table(name, num_buckets):
+    """Worker process for TestTranspositionTable.test_shared_table_between_processes"""
+    tt = SharedTranspositionTable(name=name, num_buckets=num_buckets)
+    tt.store(0xBEEF, 6, 1000, BOUND_EXACT, 5)
+    tt.close()
+
+
+class TestTranspositionTable(unittest.TestCase):
+    """Unit tests for the transposition table and its use in the search"""
+
+    def test_store_and_probe(self):
+        """Entries come back exactly as stored, including negative scores"""
+        tt = TranspositionTable(1)
+        key = 0x1234_5678_9ABC_DEF0
+        tt.store(key, 3, -1_000_000, BOUND_LOWER, 0x2ABCD)
+        self.assertEqual(tt.probe(key), (3, -1_000_000, BOUND_LOWER, 0x2ABCD))
+        self.assertIsNone(tt.probe(key ^ 1))
+
+    def test_memory_budget(self):
+        """The table never uses more than its budget and is allocated up front"""
+        for size_mb in (1, 3, 16):
+            tt = TranspositionTable(size_mb)
+            self.assertLessEqual(tt.size_bytes, size_mb * 1024 * 1024)
+            self.assertGreater(tt.size_bytes, size_mb * 1024 * 1024 // 2)
+            self.assertEqual(len(tt._table) * tt._table.itemsize, tt.size_bytes)
+
+    def test_depth_preferred_and_always_replace(self):
+        """A shallow result does not evict a deep one from the same bucket"""
+        tt = TranspositionTable(1)
+        deep_key = 5
+        shallow_key = deep_key + tt.num_buckets  # Same bucket, different key
+        newer_key = deep_key + 2 * tt.num_buckets
+        tt.store(deep_key, 6, 10, BOUND_EXACT, 1)
+        tt.store(shallow_key, 2, 20, BOUND_EXACT, 2)
+        self.assertEqual(tt.probe(deep_key)[0], 6)
+        self.assertEqual(tt.probe(shallow_key)[0], 2)
+
+        # The always-replace slot takes the next shallow result
+        tt.store(newer_key, 1, 30, BOUND_UPPER, 3)
+        self.assertIsNotNone(tt.probe(deep_key))
+        self.assertIsNone(tt.probe(shallow_key))
+        self.assertEqual(tt.probe(newer_key), (1, 30, BOUND_UPPER, 3))
+
+        # Entries of an older search can be replaced by anything
+        tt.new_search()
+        tt.store(shallow_key, 1, 40, BOUND_EXACT, 4)
+        self.assertIsNone(tt.probe(deep_key))
+
+    def test_shared_table_between_processes(self):
+        import multiprocessing
+        with SharedTranspositionTable(1) as tt:
+            self.assertEqual(tt.num_buckets, TranspositionTable(1).num_buckets)
+            tt.store(0x1234, 4, -250, BOUND_LOWER, 77)
+
+            # Another handle on the same block sees the entry and can add its own
+            other = SharedTranspositionTable(name=tt.name, num_buckets=tt.num_buckets)
+            self.assertEqual(other.probe(0x1234), (4, -250, BOUND_LOWER, 77))
+            other.close()
+            with self.assertRaises(ValueError):
+                SharedTranspositionTable(name=tt.name)
+
+            process = multiprocessing.Process(target=_store_in_shared_table, args=(tt.name, tt.num_buckets))
+            process.start()
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+            self.assertEqual(tt.probe(0xBEEF), (6, 1000, BOUND_EXACT, 5))
+
+            tt.clear()
+            self.assertIsNone(tt.probe(0x1234))
+
+    def test_search_with_table_matches_plain_minimax(self):
+        """The table must not change the root score of the search"""
+        parser = FenParser()
+
+        def minimax(rules, depth):
+            if rules.game_over:
+                return w_win if rules.winner == 1 else -w_win
+            moves = rules.get_legal_moves(rules.current_player)
+            if depth == 0 or not moves:
+                score = evaluate(rules.board.to_fen(rules.current_player))
+                return score if rules.current_player == 1 else -score
+            scores = []
+            for move in moves:
+                undo = rules.make(*move)
+                scores.append(minimax(rules, depth - 1))
+                rules.unmake(undo)
+            return max(scores) if rules.current_player == 1 else min(scores)
+
+        for fen_str in ["7/7/7/2r34/1RG5/2b24/1b1BG4 b", "RGBG5/7/7/7/7/7/7 r", "7/3RG3/7/3r23/3b13/3BG3/7 r"]:
+            board, current_player = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            rules.current_player = current_player
+            expected = minimax(rules, 2)
+            _, score = AlphaBetaSearch(rules, quiescence=False).choose_move(2)
+            self.assertEqual(score, expected, fen_str)
+            self.assertEqual(board.to_fen(rules.current_player), fen_str)
+
+
+class TestIterativeDeepening(unittest.TestCase):
+    """Unit tests for the time-limited iterative deepening search"""
+
+    MIDGAME = "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b"
+
+    def _rules(self, fen_str):
+        board, current_player = FenParser().parse_fen(fen_str)
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+        return rules
+
+    def test_matches_fixed_depth_search(self):
+        """The last iteration finds the same score as a single search to that depth"""
+        for fen_str in [self.MIDGAME, "7/3RG3/7/3r23/3b13/3BG3/7 r"]:
+            _, expected = AlphaBetaSearch(self._rules(fen_str)).choose_move(3)
+            rules = self._rules(fen_str)
+            move, score, depth = AlphaBetaSearch(rules).iterative_deepening(3)
+            self.assertEqual(depth, 3)
+            self.assertEqual(score, expected, fen_str)
+            self.assertIn(move_to_tuple(move), rules.get_legal_moves(rules.current_player))
+
+    def test_time_budget_aborts_and_restores_board(self):
+        rules = self._rules(self.MIDGAME)
+        search = AlphaBetaSearch(rules)
+        move, _, depth = search.iterative_deepening(time_budget=0.05)
+        self.assertIsNotNone(move)
+        self.assertGreaterEqual(depth, 1)
+        self.assertLess(depth, 10)
+        self.assertEqual(rules.board.to_fen(rules.current_player), self.MIDGAME)
+        self.assertEqual(rules.undo_stack, [])
+        self.assertTrue(rules.verify_hash())
+
+    def test_principal_variation(self):
+        rules = self._rules(self.MIDGAME)
+        search = AlphaBetaSearch(rules)
+        move, _, _ = search.iterative_deepening(3)
+        self.assertEqual(search.pv[0], move)
+        self.assertLessEqual(len(search.pv), 3)
+        self.assertEqual(rules.board.to_fen(rules.current_player), self.MIDGAME)
+
+    def test_winning_move_stops_early(self):
+        rules = self._rules("7/3RG3/3b13/7/7/3BG3/7 b")
+        move, score, depth = AlphaBetaSearch(rules).iterative_deepening(time_budget=5)
+        self.assertEqual(move_to_str(move), "D5-D6-1")  # Captures the Red Guardian
+        self.assertEqual(score, -w_win)
+        self.assertEqual(depth, 1)
+
+    def test_choose_best_move_with_time_budget(self):
+        self.assertEqual(choose_best_move("7/3RG3/7/7/3BG3/7/7 b", time_budget=0.5), "D3-D4-1")
+
+
+class TestMoveOrdering(unittest.TestCase):
+    """Unit tests for the move ordering of the search"""
+
+    def _search(self, fen_str):
+        board, current_player = FenParser().parse_fen(fen_str)
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+        return AlphaBetaSearch(rules)
+
+    def _ordered(self, search, ply=0, hash_move=0):
+        count = search._generate(ply, hash_move)
+        return [move_to_str(m) for m in search.move_buffers[ply][:count]]
+
+    def test_winning_moves_then_captures_by_victim(self):
+        # The Red Guardian on C4 can capture the Blue Guardian on C3 or step onto D4,
+        # the Red tower on F2 can capture the 2 on F4 or the 1 on F1
+        search = self._search("7/7/7/2RG2b21/2BG4/5r21/5b11 r")
+        moves = self._ordered(search)
+        self.assertEqual(set(moves[:2]), {"C4-C3-1", "C4-D4-1"})
+        self.assertEqual(moves[2:4], ["F2-F4-2", "F2-F1-1"])
+
+    def test_guardian_capture_on_the_center_wins(self):
+        # The Red Guardian wins by capturing the 1 on D4, ahead of the tower on A2 capturing the 3 on D2
+        search = self._search("7/7/7/2RGb13/7/r32b33/3BG3 r")
+        moves = self._ordered(search)
+        self.assertEqual(moves[:2], ["C4-D4-1", "A2-D2-3"])
+
+    def test_hash_move_killers_and_history(self):
+        search = self._search("3RG3/7/7/7/7/7/3BG2b1 b")
+        moves = self._ordered(search)
+        hash_move, killer, quiet = (search.move_buffers[0][i] for i in (3, 2, 1))
+        search.killers[0] = [killer, 0]
+        search.history[quiet & 0xFFF] = 100
+        moves = self._ordered(search, hash_move=hash_move)
+        self.assertEqual(moves[:3], [move_to_str(hash_move), move_to_str(killer), move_to_str(quiet)])
+
+    def test_cutoff_updates_killers_and_history(self):
+        search = self._search("3RG3/7/7/7/7/7/3BG2b1 b")
+        count = search._generate(0, 0)
+        first, second = search.move_buffers[0][0], search.move_buffers[0][1]
+        search._cutoff(first, 0, 3, 2)
+        search._cutoff(second, 1, 2, 2)
+        self.assertEqual(search.killers[2], [second, first])
+        self.assertEqual(search.history[first & 0xFFF], 9)
+        self.assertEqual(search.beta_cutoffs, 2)
+        self.assertEqual(search.first_move_cutoff_rate, 0.5)
+
+    def test_ordering_keeps_the_score_and_saves_nodes(self):
+        search = self._search("3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b")
+        _, score, _ = search.iterative_deepening(3)
+        self.assertEqual(score, 5)
+        self.assertGreater(search.first_move_cutoff_rate, 0.5)
+
+
+class TestQuiescence(unittest.TestCase):
+    """Unit tests for the quiescence search and the moves it searches"""
+
+    def _rules(self, fen_str):
+        board, current_player = FenParser().parse_fen(fen_str)
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+        return rules
+
+    def test_tactical_moves(self):
+        buffer = new_move_buffer()
+        for fen_str in TestMakeUnmake.POSITIONS + ["7/7/2RG4/7/7/3BG3/7 r", "7/7/7/2RG1b13/7/3BG3/7 r"]:
+            rules = self._rules(fen_str)
+            player = rules.current_player
+            count = rules.generate_captures(player, buffer)
+            expected = set(buffer[:count])
+            count = rules.generate_moves(player, buffer)
+            expected |= {m for m in buffer[:count] if m & MOVE_GUARDIAN and move_to(m) == 24}
+            count = rules.generate_tactical(player, buffer)
+            self.assertEqual(sorted(buffer[:count]), sorted(expected), fen_str)
+
+    def test_quiet_position_stands_pat(self):
+        rules = self._rules("3RG3/7/7/7/7/7/3BG2b1 b")
+        search = AlphaBetaSearch(rules)
+        self.assertEqual(search.quiesce(-w_win, w_win, 0), evaluate_board(rules.board, 2))
+
+    def test_matches_full_capture_search(self):
+        """Without delta pruning the result equals a plain negamax over the tactical moves"""
+        import alpha_beta_ki
+        buffer = new_move_buffer()
+
+        def reference(rules):
+            if rules.game_over:
+                return -w_win
+            best = evaluate_board(rules.board, rules.current_player)
+            count = rules.generate_tactical(rules.current_player, buffer)
+            for move in list(buffer[:count]):
+                undo = rules.make_encoded(move)
+                best = max(best, -reference(rules))
+                rules.unmake(undo)
+            return best
+
+        margin = alpha_beta_ki.DELTA_MARGIN
+        alpha_beta_ki.DELTA_MARGIN = 10 * w_win
+        try:
+            for fen_str in TestMakeUnmake.POSITIONS + ["3RG3/7/4r12/4b12/7/7/3BG3 r"]:
+                rules = self._rules(fen_str)
+                score = AlphaBetaSearch(rules).quiesce(-w_win, w_win, 0)
+                self.assertEqual(score, reference(rules), fen_str)
+                self.assertEqual(rules.board.to_fen(rules.current_player), fen_str)
+        finally:
+            alpha_beta_ki.DELTA_MARGIN = margin
+
+    def test_guardian_win_is_found(self):
+        rules = self._rules("7/7/7/2RG4/7/7/3BG3 r")
+        self.assertEqual(AlphaBetaSearch(rules).quiesce(-w_win, w_win, 0), w_win)
+
+    def test_winning_captures_are_not_delta_pruned(self):
+        # Far below alpha, the Blue Guardian still wins by capturing the 1 on D4
+        rules = self._rules("r1r11RG1r1r1/7/7/3r13/3BG3/7/b1b13b1 b")
+        self.assertEqual(AlphaBetaSearch(rules).quiesce(500, 501, 1), w_win)
+        rules = self._rules("r11r1RG2r1/2r1r11r11/1r15/7/b11b12b11/2b2BG2b1/5b11 r")
+        self.assertEqual(AlphaBetaSearch(rules, algorithm='pvs').pvs_root(3)[1], -w_win)
+
+    def test_depth_zero_search_uses_quiescence(self):
+        rules = self._rules("3RG3/7/4r12/4b12/7/7/3BG3 r")
+        search = AlphaBetaSearch(rules)
+        self.assertEqual(search.alpha_beta(0, -w_win, w_win, True),
+                         search.quiesce(-w_win, w_win, 0))
+        plain = AlphaBetaSearch(rules, quiescence=False)
+        self.assertEqual(plain.alpha_beta(0, -w_win, w_win, True), evaluate_board(rules.board, 1))
+
+
+class TestPrincipalVariationSearch(unittest.TestCase):
+    """Unit tests for the negamax principal variation search"""
+
+    POSITIONS = [
+        "r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r",
+        "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b",
+        "2RG4/1r21r13/7/3b23/r21b14/7/3BG3 b",
+        "7/3RG3/7/3r23/3b13/3BG3/7 r",
+    ]
+
+    def _search(self, fen_str, algorithm, params=None):
+        board, current_player = FenParser().parse_fen(fen_str)
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+        if params is None:
+            params = SearchParams(null_move=False, lmr=False)
+        return AlphaBetaSearch(rules, algorithm=algorithm, params=params)
+
+    def test_same_score_as_alpha_beta(self):
+        for fen_str in self.POSITIONS:
+            _, expected = self._search(fen_str, 'alphabeta').choose_move(3)
+            search = self._search(fen_str, 'pvs')
+            _, score = search.choose_move_pvs(3)
+            self.assertEqual(score, expected, fen_str)
+            self.assertEqual(search.rules.board.to_fen(search.rules.current_player), fen_str)
+
+    def test_aspiration_windows_keep_the_score(self):
+        import alpha_beta_ki
+        window = alpha_beta_ki.ASPIRATION_WINDOW
+        alpha_beta_ki.ASPIRATION_WINDOW = 10  # Force failing windows
+        try:
+            for fen_str in self.POSITIONS:
+                _, expected, _ = self._search(fen_str, 'alphabeta').iterative_deepening(4)
+                search = self._search(fen_str, 'pvs')
+                _, score, depth = search.iterative_deepening(4)
+                self.assertEqual((score, depth), (expected, 4), fen_str)
+        finally:
+            alpha_beta_ki.ASPIRATION_WINDOW = window
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            self._search(self.POSITIONS[0], 'mtdf')
+
+    def test_choose_best_move(self):
+        self.assertEqual(choose_best_move("7/3RG3/7/7/3BG3/7/7 b", algorithm='pvs'), "D3-D4-1")
+
+    def test_null_move_and_lmr(self):
+        search = self._search(self.POSITIONS[0], 'pvs', SearchParams())
+        move, _, depth = search.iterative_deepening(5)
+        self.assertEqual(depth, 5)
+        self.assertGreater(search.null_move_cutoffs, 0)
+        self.assertIn(move_to_tuple(move), search.rules.get_legal_moves(search.rules.current_player))
+        self.assertEqual(search.rules.board.to_fen(search.rules.current_player), self.POSITIONS[0])
+
+        # Pruning must not hide a forced win
+        search = self._search("7/3RG3/7/7/3BG3/7/7 b", 'pvs', SearchParams())
+        self.assertEqual(search.iterative_deepening(5)[1], -w_win)
+
+    def test_no_null_move_with_guardians_only(self):
+        search = self._search("RG6/7/7/7/7/7/5BG1 r", 'pvs', SearchParams())
+        search.iterative_deepening(5)
+        self.assertEqual(search.null_move_cutoffs, 0)
+
+    def test_timeout_restores_board(self):
+        search = self._search(self.POSITIONS[1], 'pvs', SearchParams())
+        rules = search.rules
+        move, _, _ = search.iterative_deepening(time_budget=0.05)
+        self.assertIsNotNone(move)
+        self.assertEqual(rules.board.to_fen(rules.current_player), self.POSITIONS[1])
+        self.assertEqual(rules.undo_stack, [])
+        self.assertTrue(rules.verify_hash())
+
+
+class TestSearchStats(unittest.TestCase):
+    """Unit tests for the search statistics and the search trace"""
+
+    MIDGAME = "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b"
+
+    def test_counters(self):
+        from alpha_beta_ki import search_position
+        for algorithm in ('alphabeta', 'pvs'):
+            move, _, stats = search_position(self.MIDGAME, 3, algorithm=algorithm)
+            self.assertEqual(move_to_str(move), choose_best_move(self.MIDGAME, depth=3, algorithm=algorithm))
+            self.assertGreater(stats.qnodes, 0)
+            self.assertLess(stats.qnodes, stats.nodes)
+            self.assertGreater(stats.leaf_evals, 0)
+            self.assertGreater(stats.movegen_calls, 0)
+            self.assertLessEqual(stats.tt_hits, stats.tt_probes)
+            self.assertLessEqual(stats.first_move_cutoffs, stats.beta_cutoffs)
+            self.assertEqual(stats.depth_times[-1][0], 3)
+            self.assertAlmostEqual(stats.time, sum(t for _, t in stats.depth_times))
+            self.assertEqual(set(stats.as_dict()), set(stats.__slots__))
+
+    def test_no_output_while_searching(self):
+        import contextlib
+        import io
+        board, player = FenParser().parse_fen(self.MIDGAME)
+        rules = BitboardRules(board)
+        rules.current_player = player
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            AlphaBetaSearch(rules, verbose=True).choose_move(3)
+            AlphaBetaSearch(rules, verbose=True, algorithm='pvs').choose_move_pvs(3)
+        self.assertEqual(output.getvalue(), "")
+
+    def test_trace(self):
+        import io
+        import json
+        from alpha_beta_ki import search_position
+        for algorithm in ('alphabeta', 'pvs'):
+            trace = io.StringIO()
+            move, score, stats = search_position(self.MIDGAME, 3, algorithm=algorithm, trace=trace)
+            self.assertEqual((move, score, stats.nodes), search_position(self.MIDGAME, 3, algorithm=algorithm)[:2]
+                             + (stats.nodes,))
+            lines = [json.loads(line) for line in trace.getvalue().splitlines()]
+            self.assertEqual(lines[0], {"fen": self.MIDGAME, "algorithm": algorithm})
+            self.assertEqual(len(lines) - 1, stats.nodes)
+            self.assertEqual(sum(line["k"] == "q" for line in lines[1:]), stats.qnodes)
+            self.assertTrue(all(line["m"] and line["p"] >= 1 for line in lines[1:]))
+        with self.assertRaises(ValueError):
+            choose_best_move(self.MIDGAME, depth=1, threads=2, trace=io.StringIO())
+
+
+class TestProfiling(unittest.TestCase):
+    """Unit tests for the --profile support in profiling.py"""
+
+    def test_profile_call(self):
+        import io
+        import os
+        import pstats
+        import tempfile
+        from perft import perft, rules_from_fen
+        from profiling import profile_call
+        rules = rules_from_fen("r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r")
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, "perft")
+            out = io.StringIO()
+            self.assertEqual(profile_call(perft, rules, 2, prefix=prefix, top=5, out=out), 625)
+            self.assertIn("_perft", out.getvalue())
+
+            stats = pstats.Stats(prefix + ".pstats")
+            with open(prefix + ".folded", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, micros = line.rsplit(" ", 1)
+            self.assertGreater(int(micros), 0)
+            self.assertTrue(stack.startswith("perft (perft.py:"), stack)
+        self.assertTrue(any("_perft (perft.py:" in line and "generate_moves" in line for line in lines))
+        # All own time ends up in some stack
+        total = sum(entry[2] for entry in stats.stats.values())
+        self.assertAlmostEqual(sum(int(line.rsplit(" ", 1)[1]) for line in lines) / 1e6, total, delta=0.01)
+
+    def test_zuggenerator_profile(self):
+        import os
+        import subprocess
+        import tempfile
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, "zug")
+            result = subprocess.run([sys.executable, os.path.join(root, "zuggenerator.py"),
+                                     "b36/3b12r3/7/7/1r2RG4/2/BG4/6r1 b", "--profile", prefix, "--repeat", "3"],
+                                    capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertTrue(result.stdout.endswith("Total: 12 legal moves\n"))
+            self.assertIn("get_move_descriptions", result.stderr)
+            self.assertTrue(os.path.exists(prefix + ".pstats"))
+            self.assertTrue(os.path.exists(prefix + ".folded"))
+
+
+class TestBench(unittest.TestCase):
+    """Unit tests for the bench command of alpha_beta_ki"""
+
+    def test_signature_is_reproducible(self):
+        from alpha_beta_ki import bench
+        for algorithm in ('alphabeta', 'pvs'):
+            results, elapsed, signature = bench(2, algorithm)
+            self.assertEqual(bench(2, algorithm)[::2], (results, signature))
+            self.assertGreater(elapsed, 0)
+            self.assertTrue(all(move is not None and nodes > 0 for move, nodes in results))
+
+    def test_matches_choose_best_move(self):
+        from alpha_beta_ki import bench, BENCH_POSITIONS
+        results, _, _ = bench(2, positions=BENCH_POSITIONS[:3])
+        for fen_str, (move, _) in zip(BENCH_POSITIONS, results):
+            self.assertEqual(move_to_str(move), choose_best_move(fen_str, depth=2))
+
+    def test_signature_changes_with_the_search(self):
+        from alpha_beta_ki import bench
+        self.assertNotEqual(bench(2)[2], bench(3)[2])
+
+
+class TestParallelSearch(unittest.TestCase):
+    """Unit tests for the root-parallel search"""
+
+    NO_PRUNING = SearchParams(null_move=False, lmr=False)
+
+    def test_same_score_as_sequential_search(self):
+        from parallel_search import ParallelSearch
+        with ParallelSearch(2, tt_size_mb=1, params=self.NO_PRUNING) as search:
+            for fen_str in TestPrincipalVariationSearch.POSITIONS[:3]:
+                board, current_player = FenParser().parse_fen(fen_str)
+                rules = BitboardRules(board)
+                rules.current_player = current_player
+                _, expected, _ = AlphaBetaSearch(rules, params=self.NO_PRUNING).iterative_deepening(3)
+                move, score, depth = search.search(fen_str, 3)
+                self.assertEqual((score, depth), (expected, 3), fen_str)
+                self.assertIn(move_to_tuple(move), rules.get_legal_moves(current_player))
+
+    def test_same_move_as_pvs_root(self):
+        from benchmarks.benchmark import load_positions, rules_from_fen
+        from parallel_search import ParallelSearch
+        depth = 3
+        with ParallelSearch(2, tt_size_mb=1, params=self.NO_PRUNING) as search:
+            for _, fen_str in load_positions()[::3]:
+                rules = rules_from_fen(fen_str)
+                sign = 1 if rules.current_player == 1 else -1
+                _, expected = AlphaBetaSearch(rules, params=self.NO_PRUNING).pvs_root(depth)
+                move, score, _ = search.search(fen_str, depth)
+                self.assertEqual(score, sign * expected, fen_str)
+                # The move must be worth the score, not just bounded by it
+                rules = rules_from_fen(fen_str)
+                rules.make_encoded(move)
+                value = -AlphaBetaSearch(rules, params=self.NO_PRUNING).pvs(depth - 1, -INFINITY, INFINITY, 1)
+                self.assertEqual(value, expected, fen_str)
+
+    def test_one_thread_is_deterministic(self):
+        from parallel_search import ParallelSearch
+        fen_str = TestPrincipalVariationSearch.POSITIONS[1]
+        with ParallelSearch(1, tt_size_mb=1) as search:
+            first = search.search(fen_str, 4)
+            second = search.search(fen_str, 4)
+        self.assertEqual(first, second)
+
+    def test_thread_count(self):
+        from parallel_search import ParallelSearch
+        with self.assertRaises(ValueError):
+            ParallelSearch(0)
+
+
+class TestEngine(unittest.TestCase):
+    """Unit tests for the line protocol of engine.py"""
+
+    def _run(self, engine, *lines):
+        import io
+        engine.out = io.StringIO()
+        for line in lines:
+            engine.handle(line)
+        return engine.out.getvalue().splitlines()
+
+    def test_position_and_queries(self):
+        from engine import Engine
+        engine = Engine()
+        output = self._run(engine, "isready", "position startpos moves D7-D6-1 D1-D2-1", "fen", "legalmoves")
+        self.assertEqual(output[0], "readyok")
+        self.assertEqual(output[1], "fen r1r13r1r1/2r1RGr12/3r13/7/3b13/2b1BGb12/b1b13b1b1 r")
+        moves = output[2].split()[1:]
+        self.assertEqual(sorted(moves), sorted(FenParser().get_move_descriptions(output[1][4:])))
+
+    def test_continued_position_only_plays_new_moves(self):
+        from engine import Engine
+        engine = Engine()
+        self._run(engine, "position startpos moves D7-D6-1")
+        rules = engine.rules
+        self._run(engine, "position startpos moves D7-D6-1 D1-D2-1")
+        self.assertIs(engine.rules, rules)
+        self.assertEqual(len(rules.undo_stack), 2)
+        self._run(engine, "position startpos moves A7-A6-1")
+        self.assertIsNot(engine.rules, rules)
+
+    def test_go(self):
+        from engine import Engine
+        engine = Engine()
+        output = self._run(engine, "position fen 7/3RG3/7/7/3BG3/7/7 b", "go depth 2")
+        self.assertEqual(output[-1], "bestmove D3-D4-1")
+        output = self._run(engine, "result", "position fen 7/3RG3/7/7/3BG3/7/7 b moves D3-D4-1", "go movetime 50",
+                           "legalmoves", "result")
+        self.assertEqual(output, ["result none", "bestmove none", "legalmoves", "result blue"])
+
+    def test_errors(self):
+        from engine import Engine
+        engine = Engine()
+        output = self._run(engine, "position startpos moves D7-D5-1", "bogus", "setoption name Threads value 4")
+        self.assertEqual(output, ["info string illegal move: D7-D5-1",
+                                  "info string unknown command: bogus",
+                                  "info string unsupported option: Threads 4"])
+
+    def test_malformed_numbers(self):
+        from engine import Engine
+        engine = Engine()
+        tt = engine.tt
+        output = self._run(engine, "go depth x", "go movetime -5", "go depth 0", "go depth 1000",
+                           "setoption name Hash value big", "setoption name Hash value 0",
+                           "setoption name Hash value nan", "setoption name Hash value 0.00001", "isready")
+        self.assertEqual(len(output), 9)
+        self.assertTrue(all(line.startswith("info string") for line in output[:8]), output)
+        self.assertEqual(output[8], "readyok")
+        self.assertIs(engine.tt, tt)
+
+    def test_ucinewgame_clears_the_table(self):
+        from engine import Engine
+        engine = Engine()
+        self._run(engine, "position startpos", "go depth 2")
+        key = engine.rules.board.hash
+        self.assertIsNotNone(engine.tt.probe(key))
+        self._run(engine, "ucinewgame")
+        self.assertIsNone(engine.tt.probe(key))
+
+    def test_client(self):
+        from engine import EngineClient
+        with EngineClient() as engine:
+            engine.position("7/3RG3/7/7/3BG3/7/7 b")
+            self.assertIn("D3-D4-1", engine.legal_moves())
+            self.assertEqual(engine.go(depth=2), "D3-D4-1")
+            engine.position("7/3RG3/7/7/3BG3/7/7 b", ["D3-D4-1"])
+            self.assertEqual(engine.fen(), "7/3RG3/7/3BG3/7/7/7 r")
+            self.assertEqual(engine.result(), "blue")
+            self.assertIsNone(engine.go(movetime=50))
+            with self.assertRaises(ValueError):
+                engine.position(None, ["A1-A2-7"])
+
+
+class TestMatchRunner(unittest.TestCase):
+    """Unit tests for the self-play match runner and its statistics"""
+
+    def test_random_opening(self):
+        from match_runner import random_opening
+        self.assertEqual(random_opening(7, 6), random_opening(7, 6))
+        self.assertNotEqual(random_opening(1, 6), random_opening(2, 6))
+        for seed in range(20):
+            rules = BitboardRules(BitboardBoard())
+            for move in random_opening(seed, 8):
+                rules.make_encoded(move)
+            self.assertFalse(rules.game_over)
+
+    def test_play_game(self):
+        from match_runner import EngineConfig, play_game
+        strong = EngineConfig("strong", depth=2)
+        weak = EngineConfig("weak", depth=1)
+        result, plies = play_game(strong, weak, [], max_moves=100)
+        self.assertIn(result, (-1, 0, 1))
+        self.assertLessEqual(plies, 100)
+        self.assertEqual(play_game(strong, weak, [], max_moves=0), (0, 0))
+
+    def test_depth_defaults(self):
+        from match_runner import EngineConfig
+        from alpha_beta_ki import MAX_DEPTH
+        self.assertEqual(EngineConfig("fixed").depth, MAX_DEPTH)
+        # A movetime alone must not be capped at the fixed-depth default
+        self.assertIsNone(EngineConfig("timed", movetime=100).depth)
+        self.assertEqual(EngineConfig("capped", depth=6, movetime=100).depth, 6)
+
+    def test_elo_and_sprt(self):
+        from match_runner import elo_estimate, sprt_bounds, sprt_llr
+        elo, margin = elo_estimate(60, 20, 20)
+        self.assertAlmostEqual(elo, 400 * math.log10(0.7 / 0.3))
+        self.assertGreater(margin, 0)
+        self.assertEqual(elo_estimate(10, 10, 10)[0], 0.0)
+        lower, upper = sprt_bounds(0.05, 0.05)
+        self.assertAlmostEqual(lower, -upper)
+        self.assertGreater(sprt_llr(600, 200, 200, 0, 20), upper)
+        self.assertLess(sprt_llr(200, 200, 600, 0, 20), lower)
+        self.assertEqual(sprt_llr(0, 10, 0, 0, 20), 0.0)
+
+    def test_sprt_stops_early(self):
+        from match_runner import EngineConfig, run_match
+        strong = EngineConfig("strong", depth=2)
+        weak = EngineConfig("weak", depth=1)
+        result = run_match(strong, weak, games=40, max_moves=60, sprt=(0, 20, 0.5, 0.5), verbose=False)
+        self.assertLess(result.games, 40)
+
+
+class TestPerft(unittest.TestCase):
+    """Reference leaf counts for the README positions (checked against get_legal_moves_turbo)"""
+
+    REFERENCE = {
+        "r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r": [1, 25, 625, 14896, 354946],
+        "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b": [1, 21, 413, 8368, 167691],
+        "RGBG5/7/7/7/7/7/7 r": [1, 2, 3, 9, 21],
+    }
+
+    def test_reference_counts(self):
+        from perft import perft, rules_from_fen
+        for fen_str, counts in self.REFERENCE.items():
+            rules = rules_from_fen(fen_str)
+            for depth, expected in enumerate(counts):
+                self.assertEqual(perft(rules, depth), expected, f"{fen_str} depth {depth}")
+            self.assertEqual(rules.board.to_fen(rules.current_player), fen_str)
+
+    def test_bulk_counting(self):
+        from perft import perft, rules_from_fen
+        for fen_str, counts in self.REFERENCE.items():
+            rules = rules_from_fen(fen_str)
+            self.assertEqual(perft(rules, 3, bulk=False), counts[3])
+            self.assertEqual(rules.count_moves(rules.current_player), len(rules.get_legal_moves(rules.current_player)))
+
+    def test_divide(self):
+        from perft import divide, rules_from_fen
+        fen_str = "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b"
+        moves = divide(rules_from_fen(fen_str), 3)
+        self.assertEqual([move for move, _ in moves], sorted(FenParser().get_move_descriptions(fen_str)))
+        self.assertEqual(sum(nodes for _, nodes in moves), self.REFERENCE[fen_str][3])
+
+    def test_won_position_has_no_children(self):
+        from perft import perft, rules_from_fen
+        rules = rules_from_fen("7/3RG3/7/7/3BG3/7/7 b")
+        rules.make((3, 4), (3, 3), 1)
+        self.assertTrue(rules.game_over)
+        self.assertEqual(perft(rules, 2), 0)
+        self.assertEqual(perft(rules, 0), 1)
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    """Unit tests for the statistics and the position corpus of benchmarks/benchmark.py"""
+
+    def test_position_corpus(self):
+        from benchmarks.benchmark import load_positions, rules_from_fen
+        positions = load_positions()
+        self.assertEqual({phase for phase, _ in positions}, {"opening", "middlegame", "endgame"})
+        self.assertEqual(len({fen for _, fen in positions}), len(positions))
+        for _, fen in positions:
+            rules = rules_from_fen(fen)
+            self.assertEqual(rules.board.to_fen(rules.current_player), fen)
+            self.assertTrue(rules.get_legal_moves(rules.current_player), fen)
+
+    def test_summarize(self):
+        from benchmarks.benchmark import summarize
+        summary = summarize([5.0, 1.0, 3.0, 2.0, 4.0], "moves/s")
+        self.assertEqual(summary["median"], 3.0)
+        self.assertEqual((summary["q1"], summary["q3"], summary["iqr"]), (2.0, 4.0, 2.0))
+        self.assertLessEqual(summary["ci_low"], summary["median"])
+        self.assertGreaterEqual(summary["ci_high"], summary["median"])
+        self.assertEqual(summarize([7.0], "nodes/s")["iqr"], 0.0)
+
+    def test_compare_results(self):
+        from benchmarks.benchmark import compare_results
+        baseline = {"metrics": {"movegen": {"median": 100.0}, "search": {"median": 100.0},
+                                "memory": {"median": 100.0}}}
+        results = {"metrics": {"movegen": {"median": 90.0, "higher_is_better": True},
+                               "search": {"median": 97.0, "higher_is_better": True},
+                               "memory": {"median": 90.0, "higher_is_better": False},
+                               "eval": {"median": 50.0, "higher_is_better": True}}}
+        comparison = {name: regressed for name, _, _, _, regressed in compare_results(results, baseline, 0.05)}
+        self.assertEqual(comparison, {"movegen": True, "search": False, "memory": False})
+
+    def test_time_trials(self):
+        import gc
+        from benchmarks.benchmark import time_trials
+        calls = []
+        samples = time_trials(lambda: calls.append(1) or 1000, trials=3, warmup=2)
+        self.assertEqual(len(samples), 3)
+        self.assertEqual(len(calls), 5)
+        self.assertTrue(all(sample > 0 for sample in samples))
+        self.assertTrue(gc.isenabled())
+
+class TestMemoryBenchmark(unittest.TestCase):
+    """Unit tests for benchmarks/memory_benchmark.py"""
+
+    def test_measure_objects(self):
+        import tracemalloc
+        from benchmarks.benchmark import load_positions
+        from benchmarks.memory_benchmark import measure_objects
+        tracemalloc.start()
+        try:
+            sizes = measure_objects(load_positions()[:3], copies=5)
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(set(sizes), {"board_bytes", "rules_bytes", "move_bytes", "move_buffer_bytes"})
+        self.assertTrue(all(size > 0 for size in sizes.values()), sizes)
+        # A buffer holds MAX_MOVES packed moves of 4 bytes each
+        self.assertGreaterEqual(sizes["move_buffer_bytes"], len(new_move_buffer()) * 4)
+
+    def test_memory_growth_is_a_regression(self):
+        from benchmarks.benchmark import compare_results, summarize
+        baseline = {"metrics": {"board_bytes": summarize([900.0], "bytes", higher_is_better=False)}}
+        grown = {"metrics": {"board_bytes": summarize([1000.0], "bytes", higher_is_better=False)}}
+        shrunk = {"metrics": {"board_bytes": summarize([800.0], "bytes", higher_is_better=False)}}
+        self.assertTrue(compare_results(grown, baseline, 0.05)[0][4])
+        self.assertFalse(compare_results(shrunk, baseline, 0.05)[0][4])
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "peak RSS is read from /proc")
+    def test_search_rss(self):
+        from benchmarks.memory_benchmark import measure_search_rss
+        rss = measure_search_rss(depth=1)
+        self.assertGreater(rss["rss_idle"], 0)
+        self.assertGreaterEqual(rss["rss_search_peak"], rss["rss_idle"])
+
+
+class TestLookupTables(unittest.TestCase):
+    """Unit tests for the shared move/path bitmask tables"""
+
+    def test_between_masks(self):
+        """BETWEEN holds exactly the squares strictly between two squares on a line"""
+        sq = lambda x, y: y * 7 + x
+        self.assertEqual(BETWEEN[sq(0, 3)][sq(3, 3)], (1 << sq(1, 3)) | (1 << sq(2, 3)))
+        self.assertEqual(BETWEEN[sq(3, 6)][sq(3, 4)], 1 << sq(3, 5))
+        self.assertEqual(BETWEEN[sq(3, 3)][sq(3, 4)], 0)  # Neighbors
+        self.assertEqual(BETWEEN[sq(0, 0)][sq(2, 2)], 0)  # Diagonal
+        for a in range(49):
+            for b in range(49):
+                self.assertEqual(BETWEEN[a][b], BETWEEN[b][a])
+
+    def test_destination_masks_stay_on_board(self):
+        """Destinations never wrap around the edge of the board"""
+        for sq in range(49):
+            x, y = sq % 7, sq // 7
+            for dist in range(1, 8):
+                targets = {to_sq for to_sq, _ in MOVE_TARGETS[sq][dist]}
+                expected = {ny * 7 + nx for nx, ny in [(x, y + dist), (x + dist, y), (x, y - dist), (x - dist, y)]
+                            if 0 <= nx < 7 and 0 <= ny < 7}
+                self.assertEqual(targets, expected)
+                masks = 0
+                for mask in DEST_MASKS[sq][dist]:
+                    masks |= mask
+                self.assertEqual(masks, sum(1 << t for t in expected))
+
+    def test_rules_hold_no_per_instance_tables(self):
+        """Constructing a rules engine builds no lookup tables"""
+        rules = BitboardRules(BitboardBoard())
+        self.assertFalse(hasattr(rules, "_move_lookup"))
+        self.assertFalse(hasattr(rules, "_path_lookup"))
+
+
+class TestBitParallelGenerator(unittest.TestCase):
+    """The bit-parallel generator must produce exactly the turbo generator's moves"""
+
+    POSITIONS = [
+        "3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b",
+        "6r1/3BG3/1r15/5RG1/1b25/7/7 b",
+        "7/3RG3/7/3r23/3b13/3BG3/7 r",
+        "r14r21/1r1r1RG3/4r12/7/2b1r1b12/1b22b22/3BG3 r",
+        "7/7/7/2r34/1RG5/2b24/1b1BG4 b",
+        "RG6/3b3r32/3r21b21/7/4r22/7/6BG r",
+        "2RG2b41/7/7/3r41r3b3/7/7/3BG3 b",
+        "RGBG5/7/7/7/7/7/7 r",
+        "RGr2b24/r2b35/b21BG4/7/7/7/7 r",
+    ]
+
+    def test_same_moves_on_unit_test_positions(self):
+        parser = FenParser()
+        for fen_str in self.POSITIONS:
+            board, current_player = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            for player in (1, 2):
+                self.assertEqual(sorted(rules.get_legal_moves_bitparallel(player)),
+                                 sorted(rules.get_legal_moves_turbo(player)),
+                                 f"{fen_str} player {player}")
+
+    def test_same_moves_on_random_games(self):
+        parser = FenParser()
+        rng = random.Random(11)
+        for _ in range(20):
+            board, current_player = parser.parse_fen("r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r")
+            rules = BitboardRules(board)
+            rules.current_player = current_player
+            for _ in range(40):
+                moves = rules.get_legal_moves_turbo(rules.current_player)
+                self.assertEqual(sorted(rules.get_legal_moves_bitparallel(rules.current_player)), sorted(moves),
+                                 board.to_fen(rules.current_player))
+                if not moves or rules.is_game_over():
+                    break
+                rules.make(*rng.choice(moves))
+
+    def test_oversized_positions(self):
+        # More pieces than a game can have, and more than 64 moves
+        parser = FenParser()
+        for fen_str in ("r7r7r7r7r7r7r7/7/r7r7r7r7r7r7r7/7/r7r7r7r7r7r7r7/7/r7r7r7RGr7r7r7 r",
+                        "/".join(["r7" * 7] * 7) + " r"):
+            board, current_player = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            moves = rules.get_legal_moves_bitparallel(current_player)
+            self.assertGreater(len(moves), 64)
+            self.assertEqual(sorted(moves), sorted(rules.get_legal_moves_turbo(current_player)), fen_str)
+            self.assertEqual(rules.count_moves(current_player), len(moves))
+
+    def test_several_guardians(self):
+        # A FEN may give a side more than one Guardian; every one of them moves
+        buffer = new_move_buffer()
+        for fen_str in ("RG5RG/7/7/7/7/7/BG5BG r", "7/7/3RG3/2RG1RG2/3RG3/7/BG6 r"):
+            board, current_player = FenParser().parse_fen(fen_str)
+            rules = BitboardRules(board)
+            moves = rules.get_legal_moves_bitparallel(current_player)
+            self.assertEqual(sorted(moves), sorted(rules.get_legal_moves_turbo(current_player)), fen_str)
+            self.assertEqual(rules.count_moves(current_player), len(moves))
+        count = rules.generate_tactical(current_player, buffer)
+        self.assertEqual(sorted(move_to_str(m) for m in buffer[:count]), ["C4-D4-1", "D3-D4-1", "D5-D4-1", "E4-D4-1"])
+
+    def test_generator_selection(self):
+        board = BitboardBoard()
+        self.assertEqual(BitboardRules(board, generator="turbo").generator, "turbo")
+        self.assertEqual(sorted(BitboardRules(board, generator="turbo").get_legal_moves(1)),
+                         sorted(BitboardRules(board, generator="bitparallel").get_legal_moves(1)))
+        with self.assertRaises(ValueError):
+            BitboardRules(board, generator="magic")
+
+
+class TestMoveEncoding(unittest.TestCase):
+    """Unit tests for packed int moves and move buffers"""
+
+    def test_encode_decode(self):
+        move = encode_move(3 * 7 + 2, 3 * 7 + 5, 3, MOVE_CAPTURE)
+        self.assertEqual(move_from(move), 23)
+        self.assertEqual(move_to(move), 26)
+        self.assertEqual(move_height(move), 3)
+        self.assertEqual(move_to_tuple(move), ((2, 3), (5, 3), 3))
+        self.assertEqual(move_to_str(move), "C4-F4-3")
+        self.assertLess(encode_move(48, 48, 7, MOVE_CAPTURE | MOVE_STACK | MOVE_GUARDIAN), 1 << 18)
+
+    def test_generated_moves_and_flags(self):
+        """Packed moves match the tuple generator and carry the right flags"""
+        parser = FenParser()
+        buffer = new_move_buffer()
+        for fen_str in TestBitParallelGenerator.POSITIONS:
+            board, current_player = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            count = rules.generate_moves(current_player, buffer)
+            moves = buffer[:count]
+            self.assertEqual(sorted(move_to_tuple(m) for m in moves),
+                             sorted(rules.get_legal_moves_turbo(current_player)))
+            self.assertEqual(sorted(move_to_str(m) for m in moves),
+                             sorted(parser.get_move_descriptions(fen_str)))
+            for move in moves:
+                (fx, fy), (tx, ty), _ = move_to_tuple(move)
+                target_owner = board.get_stack_owner(tx, ty)
+                self.assertEqual(bool(move & MOVE_CAPTURE), target_owner == 3 - current_player)
+                self.assertEqual(bool(move & MOVE_STACK), target_owner == current_player)
+                self.assertEqual(bool(move & MOVE_GUARDIAN), board.get_top_piece_type(fx, fy).value == 'W')
+
+    def test_make_encoded_matches_make(self):
+        parser = FenParser()
+        buffer = new_move_buffer()
+        fen_str = "r14r21/1r1r1RG3/4r12/7/2b1r1b12/1b22b22/3BG3 r"
+        board, current_player = parser.parse_fen(fen_str)
+        rules = BitboardRules(board)
+        rules.current_player = current_player
+        count = rules.generate_moves(current_player, buffer)
+        for move in buffer[:count]:
+            undo = rules.make_encoded(move)
+            after_encoded = board.to_fen(rules.current_player)
+            rules.unmake(undo)
+            undo = rules.make(*move_to_tuple(move))
+            self.assertEqual(board.to_fen(rules.current_player), after_encoded)
+            rules.unmake(undo)
+        self.assertEqual(board.to_fen(rules.current_player), fen_str)
+
+
+class TestCaptureAndQuietGenerators(unittest.TestCase):
+    """Unit tests for generate_captures and generate_quiets"""
+
+    def test_split_of_all_moves(self):
+        """Captures and quiets are disjoint and together make up all legal moves"""
+        parser = FenParser()
+        buffer = new_move_buffer()
+        for fen_str in TestBitParallelGenerator.POSITIONS:
+            board, _ = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            for player in (1, 2):
+                all_moves = buffer[:rules.generate_moves(player, buffer)]
+                captures = buffer[:rules.generate_captures(player, buffer)]
+                quiets = buffer[:rules.generate_quiets(player, buffer)]
+                self.assertEqual(sorted(captures + quiets), sorted(all_moves), fen_str)
+                self.assertTrue(all(m & MOVE_CAPTURE for m in captures))
+                self.assertFalse(any(m & MOVE_CAPTURE for m in quiets))
+
+    def test_captures_match_is_valid_capture(self):
+        """The capture generator finds exactly the legal moves is_valid_capture accepts"""
+        parser = FenParser()
+        buffer = new_move_buffer()
+        for fen_str in TestBitParallelGenerator.POSITIONS:
+            board, current_player = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            rules.current_player = current_player
+            expected = sorted(move for move in rules.get_legal_moves_turbo(current_player)
+                              if rules.is_valid_capture(*move))
+            captures = sorted(move_to_tuple(m) for m in buffer[:rules.generate_captures(current_player, buffer)])
+            self.assertEqual(captures, expected, fen_str)
+
+    def test_no_enemy_pieces(self):
+        parser = FenParser()
+        board, _ = parser.parse_fen("3RG3/7/7/r36/7/7/7 r")
+        rules = BitboardRules(board)
+        buffer = new_move_buffer()
+        self.assertEqual(rules.generate_captures(1, buffer), 0)
+        self.assertEqual(rules.generate_quiets(1, buffer), rules.generate_moves(1, buffer))
+
+
+class TestAttackMap(unittest.TestCase):
+    """Unit tests for the whole-board attack map and the evaluation terms built on it"""
+
+    # Scores of the original evaluate() (per-square is_threatened) on the unit test positions
+    EVALUATIONS = [
+        ("r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 r", 180),
+        ("r1r11RG1r1r1/2r11r12/3r13/7/3b13/2b11b12/b1b11BG1b1b1 b", 180),
+        ("3RG1r11/3r33/r36/7/b32b33/7/3BG2b1 b", 180),
+        ("6r1/3BG3/1r15/5RG1/1b25/7/7 b", 175),
+        ("7/3RG3/7/3r23/3b13/3BG3/7 r", 210),
+        ("r14r21/1r1r1RG3/4r12/7/2b1r1b12/1b22b22/3BG3 r", 285),
+        ("7/7/7/2r34/1RG5/2b24/1b1BG4 b", 115),
+        ("RG6/3b3r32/3r21b21/7/4r22/7/6BG r", 35),
+        ("2RG2b41/7/7/3r41r3b3/7/7/3BG3 b", -15),
+        ("RGBG5/7/7/7/7/7/7 r", -240),
+        ("RGr2b24/r2b35/b21BG4/7/7/7/7 r", -70),
+    ]
+
+    def test_captures_match_capture_generator(self):
+        """The capture mask holds exactly the squares generate_captures lands on"""
+        parser = FenParser()
+        buffer = new_move_buffer()
+        for fen_str in TestBitParallelGenerator.POSITIONS:
+            board, _ = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            for player in (1, 2):
+                expected = 0
+                for move in buffer[:rules.generate_captures(player, buffer)]:
+                    expected |= 1 << move_to(move)
+                self.assertEqual(attack_map(board, player).captures, expected, f"{fen_str} player {player}")
+
+    def test_max_height(self):
+        """max_height is the largest tower move over a clear path onto each square"""
+        parser = FenParser()
+        for fen_str in TestBitParallelGenerator.POSITIONS:
+            board, _ = parser.parse_fen(fen_str)
+            occupied = board.occupied()
+            for player in (1, 2):
+                towers = board.red_towers if player == 1 else board.blue_towers
+                expected = [0] * 49
+                for h in range(1, 8):
+                    for sq in range(49):
+                        if towers[h] & (1 << sq):
+                            for s in range(1, h + 1):
+                                for to_sq, path in MOVE_TARGETS[sq][s]:
+                                    if not occupied & path:
+                                        expected[to_sq] = max(expected[to_sq], s)
+                attacks = attack_map(board, player)
+                self.assertEqual([attacks.max_height(sq) for sq in range(49)], expected, fen_str)
+
+    def test_evaluate_unchanged(self):
+        for fen_str, expected in self.EVALUATIONS:
+            self.assertEqual(evaluate(fen_str), expected, fen_str)
+
+
+class TestEvaluateBoard(unittest.TestCase):
+    """Unit tests for evaluating a board object directly"""
+
+    def test_matches_fen_evaluation(self):
+        parser = FenParser()
+        for fen_str, expected in TestAttackMap.EVALUATIONS:
+            board, player = parser.parse_fen(fen_str)
+            self.assertEqual(evaluate_board(board, player), expected, fen_str)
+
+    def test_missing_guardian_is_terminal(self):
+        parser = FenParser()
+        board, _ = parser.parse_fen("RG6/7/7/7/7/7/6b1 r")
+        self.assertEqual(evaluate_board(board, 1), w_win)
+        self.assertEqual(evaluate_board(board, 2), -w_win)
+
+    def test_eval_terms_stay_in_sync(self):
+        """The incrementally updated terms match a full recompute through make/unmake"""
+        parser = FenParser()
+        rng = random.Random(11)
+        for fen_str in TestMakeUnmake.POSITIONS:
+            board, current_player = parser.parse_fen(fen_str)
+            rules = BitboardRules(board)
+            rules.current_player = current_player
+            start_terms = board.compute_eval_terms()
+            self.assertEqual((board.stack_count, board.tower_height, board.intruders, board.center_bonus),
+                             start_terms, fen_str)
+            played = []
+            for _ in range(12):
+                moves = rules.get_legal_moves(rules.current_player)
+                if not moves or rules.is_game_over():
+                    break
+                played.append(rules.make(*rng.choice(moves)))
+                self.assertEqual((board.stack_count, board.tower_height, board.intruders, board.center_bonus),
+                                 board.compute_eval_terms())
+            for undo in reversed(played):
+                rules.unmake(undo)
+            self.assertEqual((board.stack_count, board.tower_height, board.intruders, board.center_bonus),
+                             start_terms)
+
+    def test_starting_position_terms(self):
+        board = BitboardBoard()
+        self.assertEqual(board.stack_count, [0, 8, 8])
+        self.assertEqual(board.tower_height, [0, 7, 7])
+        self.assertEqual(board.intruders, [0, 0, 0])
+        self.assertEqual(board.center_bonus, [0, 3, 3])
+
+
 def run_tests():
     """Run all unit tests with detailed output"""
     print("\nRunning Move Generator Tests for Turm & Wächter")
     print("=============================================\n")
-    test_suite = unittest.TestLoader().loadTestsFromTestCase(TestMoveGenerator)
+    test_suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
     unittest.TextTestRunner(verbosity=2).run(test_suite)
 
 if __name__ == "__main__":
@@ -7,26 +7,18 @@ Usage:
 """
 from core.bitboard import BitboardBoard
 from core.fen import FenParser
-from core.bitboard_rules import BitboardRules
+from core.bitboard_rules import attack_map
 
 
 def is_threatened(board: BitboardBoard, pos: tuple, player: int) -> bool:
     """
     Check if the piece owned by `player` at `pos` is threatened by any opponent move.
-    """
-    rules = BitboardRules(board)
-    opponent = 3 - player
-    rules.current_player = opponent
-
-    # Generate all opponent legal moves
-    opponent_moves = rules.get_legal_moves(opponent)
 
-    for from_pos, to_pos, height in opponent_moves:
-        if to_pos == pos:
-            # If it's a capturing move, pos was occupied by us
-            if rules.is_valid_capture(from_pos, to_pos, height):
-                return True
-    return False
+    When checking several squares, compute attack_map(board, opponent) once instead.
+    """
+    # Squares the opponent can capture on, for the whole board in one pass
+    threatened = attack_map(board, 3 - player).captures
+    return bool(threatened & (1 << (pos[1] * board.SIZE + pos[0])))
 
 
 def pos_from_alg(alg: str) -> tuple:
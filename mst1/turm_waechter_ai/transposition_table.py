@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Transposition table for the alpha-beta search in Turm & Wächter.
+
+The table is a preallocated array of 64-bit words instead of a dict of
+objects, so its memory use is fixed by the budget given in MB and does not
+grow during a search. Positions are looked up by their Zobrist key
+(BitboardBoard.hash).
+
+Layout:
+    The table is split into buckets of two entries. Each entry is two words:
+    the verification word (key XOR data) and the data word. Slot 0 of a
+    bucket is depth-preferred, slot 1 is always-replace.
+
+    Data word bits:
+        0-23   score + SCORE_BIAS
+        24-31  search depth
+        32-33  bound type (BOUND_EXACT / BOUND_LOWER / BOUND_UPPER)
+        34-41  search generation (for replacing stale entries)
+        42-63  best move (0 = none)
+
+Storing key XOR data instead of the key means an entry whose two words
+do not belong together (e.g. half-written) simply fails verification.
+That is also what lets SharedTranspositionTable be written by several
+processes at once without locks: a torn entry is just a miss.
+"""
+from array import array
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+# Bound types
+BOUND_NONE = 0   # Empty entry
+BOUND_EXACT = 1  # Score is exact
+BOUND_LOWER = 2  # Score is a lower bound (search failed high)
+BOUND_UPPER = 3  # Score is an upper bound (search failed low)
+
+SCORE_BIAS = 1 << 23
+MAX_DEPTH = 255
+
+ENTRY_BYTES = 16   # Two 64-bit words
+BUCKET_WORDS = 4   # Two entries per bucket
+
+
+def _num_buckets(size_mb: float) -> int:
+    """Largest power of two number of buckets that fits into size_mb"""
+    max_buckets = int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES)
+    if max_buckets < 1:
+        raise ValueError(f"Transposition table size {size_mb} MB is too small")
+    return 1 << (max_buckets.bit_length() - 1)
+
+
+class TranspositionTable:
+    """Fixed-size, array-backed transposition table with a two-slot bucket replacement scheme."""
+
+    def __init__(self, size_mb: float = 16):
+        self.num_buckets = _num_buckets(size_mb)
+        self._mask = self.num_buckets - 1
+        self._table = array('Q', bytes(self.num_buckets * BUCKET_WORDS * 8))
+        self.generation = 0
+
+    @property
+    def size_bytes(self) -> int:
+        """Memory used by the entries"""
+        return self.num_buckets * 2 * ENTRY_BYTES
+
+    def new_search(self) -> None:
+        """Start a new search generation so entries of older searches get replaced first"""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        table = self._table
+        table[:] = array('Q', bytes(len(table) * 8))
+        self.generation = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Look up a position.
+
+        Returns:
+            (depth, score, bound, move) or None if the position is not stored
+        """
+        table = self._table
+        i = (key & self._mask) * BUCKET_WORDS
+        data = table[i + 1]
+        if not (data and table[i] ^ data == key):
+            i += 2
+            data = table[i + 1]
+            if not (data and table[i] ^ data == key):
+                return None
+        return ((data >> 24) & 0xFF,
+                (data & 0xFFFFFF) - SCORE_BIAS,
+                (data >> 32) & 0x3,
+                data >> 42)
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int = 0) -> None:
+        """
+        Store a search result.
+
+        Slot 0 of the bucket keeps the deepest result of the current search,
+        everything else goes to slot 1.
+        """
+        depth = min(max(depth, 0), MAX_DEPTH)
+        generation = self.generation
+        data = ((int(score) + SCORE_BIAS) & 0xFFFFFF) | (depth << 24) | (bound << 32) | (generation << 34) | (move << 42)
+
+        table = self._table
+        i = (key & self._mask) * BUCKET_WORDS
+        old = table[i + 1]
+        if (not old
+                or table[i] ^ old == key
+                or (old >> 34) & 0xFF != generation
+                or depth >= (old >> 24) & 0xFF):
+            # Keep the move of a previous result for the same position if we have none
+            if not move and old and table[i] ^ old == key:
+                data |= (old >> 42) << 42
+            i_write = i
+        else:
+            i_write = i + 2
+        table[i_write] = key ^ data
+        table[i_write + 1] = data
+
+    def hashfull(self) -> int:
+        """Permille of the first 1000 buckets' slots that are used in the current generation"""
+        table = self._table
+        generation = self.generation
+        sample = min(1000, self.num_buckets)
+        used = 0
+        for b in range(sample):
+            for i in (b * BUCKET_WORDS + 1, b * BUCKET_WORDS + 3):
+                data = table[i]
+                if data and (data >> 34) & 0xFF == generation:
+                    used += 1
+        return used * 1000 // (2 * sample)
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    Transposition table in a multiprocessing.shared_memory block.
+
+    The creating process passes no name and owns the block; other processes attach
+    to it with SharedTranspositionTable(name=table.name, num_buckets=table.num_buckets)
+    and see every entry the others store, without pickling anything. The bucket
+    count is passed along because some platforms round the block size up to a
+    whole page, so it cannot be read back from the block. Entries are written without locks
+    (see the module docstring). The search generation is per process, so the
+    owner should hand its generation to the workers along with their tasks.
+
+    Call close() in every process when done; the owner also removes the block.
+    """
+
+    def __init__(self, size_mb: float = 16, name: Optional[str] = None, num_buckets: Optional[int] = None):
+        if name is None:
+            self.num_buckets = _num_buckets(size_mb)
+            # New blocks are zero-filled, which is an empty table
+            self._shm = shared_memory.SharedMemory(create=True, size=self.num_buckets * BUCKET_WORDS * 8)
+            self.owner = True
+        else:
+            if num_buckets is None:
+                raise ValueError("Attaching to a shared table needs the num_buckets of its owner")
+            self._shm = _attach(name)
+            self.num_buckets = num_buckets
+            self.owner = False
+        self._mask = self.num_buckets - 1
+        # Only the table itself, not the padding a platform may add to the block
+        self._table = self._shm.buf[:self.num_buckets * BUCKET_WORDS * 8].cast('Q')
+        self.generation = 0
+
+    @property
+    def name(self) -> str:
+        """Name other processes attach with"""
+        return self._shm.name
+
+    def close(self) -> None:
+        """Detach from the block (and remove it if this process created it)"""
+        if self._table is None:
+            return
+        self._table.release()
+        self._table = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self) -> 'SharedTranspositionTable':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block without making this process responsible for removing it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
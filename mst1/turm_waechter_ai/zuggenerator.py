@@ -3,9 +3,14 @@
 Simplified move generator for Turm & Wächter.
 
 Usage:
-    python zuggenerator.py "b36/3b12r3/7/7/1r2RG4/2/BG4/6r1 b"
+    python zuggenerator.py "b36/3b12r3/7/7/1r2RG4/2/BG4/6r1 b" [--profile [PREFIX]] [--repeat N]
+
+--profile runs the move generation under cProfile, writes PREFIX.pstats and
+PREFIX.folded (see profiling.py) and prints the hottest functions to stderr.
+--repeat generates the moves N times, so short runs give a usable profile.
 """
 
+import argparse
 import sys
 import os
 
@@ -13,17 +18,32 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from core.fen import FenParser
 
+def generate(fen_str: str, repeat: int = 1):
+    """Legal moves of a position in algebraic notation, generated repeat times"""
+    parser = FenParser()
+    for _ in range(repeat):
+        moves = parser.get_move_descriptions(fen_str)
+    return moves
+
 def main():
     if len(sys.argv) < 2:
         print("Example: python zuggenerator.py \"b36/3b12r3/7/7/1r2RG4/2/BG4/6r1 b\"")
         sys.exit(1)
         
-    fen_str = sys.argv[1]
-    parser = FenParser()
+    arg_parser = argparse.ArgumentParser(description="List the legal moves of a position")
+    arg_parser.add_argument("fen", help="Position in FEN notation")
+    arg_parser.add_argument("--profile", nargs="?", const="zuggenerator", metavar="PREFIX",
+                            help="Profile the move generation and write PREFIX.pstats and PREFIX.folded")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="Generate the moves N times")
+    args = arg_parser.parse_args()
     
     try:
         # Get moves in algebraic notation
-        moves = parser.get_move_descriptions(fen_str)
+        if args.profile:
+            from profiling import profile_call
+            moves = profile_call(generate, args.fen, max(args.repeat, 1), prefix=args.profile)
+        else:
+            moves = generate(args.fen, max(args.repeat, 1))
         moves.sort()  # Sort alphabetically for readability
         
         if moves:
@@ -39,4 +59,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()